@@ -6,12 +6,17 @@ import click
 from .utils import findFileInParents
 from os import walk
 from os.path import join, split, exists, splitext, basename
+from collections import OrderedDict
 from ..depparser.Pathmaker import Pathmaker
 from ..depparser.DepFileParser import DepFileParser
+from ..depparser.DepTreeCache import DepTreeCache
 
 # Constants
 kWorkAreaCfgFile = '.ipbbwork'
 kProjAreaCfgFile = '.ipbbproj'
+kProjDepCacheFile = '.ipbbdepcache'
+kProjVivadoSocket = '.ipbbvivado'
+kWorkDigestCacheFile = '.ipbbdigests'
 kSourceDir = 'src'
 kProjDir = 'proj'
 
@@ -28,6 +33,15 @@ class Environment(object):
 
     _verbosity = 0
 
+    # Threads used to read dep files in parallel
+    parseJobs = 1
+
+    # Cheapest parse mode satisfying each command, by command path. Other commands
+    # get the complete tree.
+    depParserModes = {
+        ('info',): 'counts',
+        ('dep', 'components'): 'structure',
+    }
 
 
     # ----------------------------------------------------------------------------
@@ -109,21 +123,131 @@ class Environment(object):
             self._depParser = DepFileParser(
                 self.currentproj.config['toolset'],
                 self.pathMaker,
-                aVerbosity=self._verbosity
+                aVerbosity=self._verbosity,
+                aJobs=self.parseJobs,
+                aMode=self._depParserMode()
             )
-
-            try:
-                self._depParser.parse(
-                    self.currentproj.config['topPkg'],
-                    self.currentproj.config['topCmp'],
-                    self.currentproj.config['topDep']
-                )
-            except OSError as e:
-                pass
+            self._loadOrParse(self._depParser, self.currentproj.path, self.currentproj.config)
 
         return self._depParser
     # -----------------------------------------------------------------------------
 
+    # -----------------------------------------------------------------------------
+    def _depParserMode(self):
+        '''Parse mode required by the command being run, 'full' if unknown'''
+        lCtx = click.get_current_context(silent=True)
+        lPath = []
+        while lCtx is not None and lCtx.parent is not None:
+            lPath.insert(0, lCtx.info_name)
+            lCtx = lCtx.parent
+        return self.depParserModes.get(tuple(lPath), 'full')
+    # -----------------------------------------------------------------------------
+
+    # -----------------------------------------------------------------------------
+    def _loadOrParse(self, aParser, aProjPath, aConfig):
+        lTop = (
+            aConfig['topPkg'],
+            aConfig['topCmp'],
+            aConfig['topDep']
+        )
+
+        # Reuse the results of the last parse, as long as none of its inputs has changed
+        lCache = DepTreeCache(join(aProjPath, kProjDepCacheFile), self._verbosity)
+        if lCache.load(aParser, *lTop):
+            return
+
+        try:
+            aParser.parse(*lTop)
+        except OSError:
+            # Partial results are not cached
+            return
+
+        lCache.save(aParser, *lTop)
+    # -----------------------------------------------------------------------------
+
+    # -----------------------------------------------------------------------------
+    def projectConfig(self, aProject):
+        import json
+        with open(join(self.projdir, aProject, kProjAreaCfgFile), 'r') as lProjectFile:
+            return json.load(lProjectFile)
+    # -----------------------------------------------------------------------------
+
+    # -----------------------------------------------------------------------------
+    def depParsers(self, aProjects=None):
+        '''Dependency trees of several projects of the work area
+
+        The projects share the records of the dep files they parse: a dep file included
+        by several projects is parsed once, and its results spliced into the others, as
+        long as the variables it uses have the same values.
+
+        Args:
+            aProjects (list): project names, all the projects of the work area by default
+
+        Returns:
+            OrderedDict: parsers by project name
+        '''
+        lMemo = {}
+        lParsers = OrderedDict()
+        for lProject in (aProjects if aProjects is not None else sorted(self.projects)):
+            if lProject == self.currentproj.name and self._depParser is not None and self._depParser.mode == 'full':
+                lParsers[lProject] = self._depParser
+                continue
+
+            lConfig = self.projectConfig(lProject)
+            lParser = DepFileParser(
+                lConfig['toolset'],
+                self.pathMaker,
+                aVerbosity=self._verbosity,
+                aJobs=self.parseJobs,
+                aMemo=lMemo
+            )
+            self._loadOrParse(lParser, join(self.projdir, lProject), lConfig)
+            lParsers[lProject] = lParser
+
+            if lProject == self.currentproj.name:
+                self._depParser = lParser
+
+        return lParsers
+    # -----------------------------------------------------------------------------
+
+    # -----------------------------------------------------------------------------
+    def depParserInBackground(self):
+        '''Starts loading or parsing the dependency tree on a separate thread
+
+        Lets slow tools start up while the dep files are parsed. The makers get the
+        whole tree: duplicated commands take the position of their last occurrence,
+        so no command is in its final place before the last dep file is read.
+
+        Returns:
+            callable: waits for the tree to be ready and returns the parser.
+                Parsing errors, including the SystemExit of malformed
+                directives, are raised by the call.
+        '''
+        import threading
+
+        lOutcome = {}
+
+        def lParse():
+            try:
+                lOutcome['parser'] = self.depParser
+            except BaseException as lExc:
+                lOutcome['error'] = lExc
+
+        lThread = threading.Thread(target=lParse, name='depparser')
+        lThread.daemon = True
+        lThread.start()
+
+        def lReady():
+            # A timeout keeps the wait interruptible by Ctrl-C on Python 2
+            while lThread.is_alive():
+                lThread.join(1e9)
+            if 'error' in lOutcome:
+                raise lOutcome['error']
+            return lOutcome['parser']
+
+        return lReady
+    # -----------------------------------------------------------------------------
+
     # -----------------------------------------------------------------------------
     @property
     def srcdir(self):
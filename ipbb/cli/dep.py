@@ -14,7 +14,9 @@ import re
 
 from os.path import join, split, exists, basename, abspath, splitext, relpath
 from ..tools.common import which, SmartOpen
-from .utils import DirSentry
+from ..tools.hashing import hashFiles, hashCommands, merkleTree, diffMerkleTrees, DigestCache, algorithm, algorithms, kDefaultAlgorithm
+from . import kWorkDigestCacheFile
+from .utils import DirSentry, validateComponent
 from click import echo, secho, style, confirm
 from texttable import Texttable
 
@@ -35,7 +37,8 @@ def dep(ctx, proj):
         ctx.invoke(cd, projname=lProj)
         return
     else:
-        if env.currentproj.name is None:
+        # report can run over all the projects of the work area
+        if env.currentproj.name is None and ctx.invoked_subcommand != 'report':
             raise click.ClickException('Project area not defined. Move into a project area and try again')
 
 # ------------------------------------------------------------------------------
@@ -45,8 +48,12 @@ def dep(ctx, proj):
 @dep.command()
 @click.pass_obj
 @click.option('-f', '--filter', 'filters', help='Select dep entries with regexes.', multiple=True)
-def report(env, filters):
-    '''Summarise the dependency tree of the current project'''
+@click.option('-a', '--all-projects', 'allProjects', is_flag=True, help='Report on all the projects of the work area.')
+def report(env, filters, allProjects):
+    '''Summarise the dependency tree of the current project, or of all projects
+
+    With --all-projects, the dep files shared by several projects are parsed once.
+    '''
 
     lCmdHeaders = ['path', 'flags', 'package', 'component', 'map', 'lib']
     
@@ -82,8 +89,28 @@ def report(env, filters):
     if lFieldNotFound:
         raise click.ClickException("Filter syntax errors: fields not found {}. Expected one of {}".format(', '.join("'"+s+"'" for s in lFieldNotFound), ', '.join(("'"+s+"'" for s in lCmdHeaders))))
 
-    # return
-    lParser = env.depParser
+    if not allProjects:
+        if env.currentproj.name is None:
+            raise click.ClickException('Project area not defined. Move into a project area and try again')
+        reportTree(env, env.depParser, lCmdHeaders, lFilters)
+        return
+
+    if env.work.path is None:
+        raise click.ClickException('Work area not defined. Move into a work area and try again')
+
+    for lProj, lParser in env.depParsers().iteritems():
+        echo()
+        lTitle = "Project '{}'".format(lProj)
+        secho('=' * len(lTitle), fg='green')
+        secho(lTitle, fg='green')
+        secho('=' * len(lTitle), fg='green')
+        reportTree(env, lParser, lCmdHeaders, lFilters)
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def reportTree(env, aParser, aCmdHeaders, aFilters):
+    '''Prints the commands, components and missing entries of a dependency tree'''
 
     # lTitle = Texttable(max_width=0)
     # lTitle.header(['Commands'])
@@ -95,17 +122,17 @@ def report(env, filters):
     secho('* Parsed commands', fg='blue')
 
     lPrepend = re.compile('(^|\n)')
-    for k in lParser.commands:
-        echo( '  + {0} ({1})' .format(k, len(lParser.commands[k])) )
-        if not lParser.commands[k]:
+    for k in aParser.commands:
+        echo( '  + {0} ({1})' .format(k, len(aParser.commands[k])) )
+        if not aParser.commands[k]:
             echo()
             continue
 
         lCmdTable = Texttable(max_width=0)
-        lCmdTable.header(lCmdHeaders)
+        lCmdTable.header(aCmdHeaders)
         lCmdTable.set_deco(Texttable.HEADER | Texttable.BORDER)
         lCmdTable.set_chars(['-', '|', '+', '-'])
-        for lCmd in lParser.commands[k]:
+        for lCmd in aParser.commands[k]:
             # print(lCmd)
             # lCmdTable.add_row([str(lCmd)])
             lRow = [
@@ -118,7 +145,7 @@ def report(env, filters):
 
             ]
 
-            if lFilters and not all([ rxp.match(lRow[i]) for i,rxp in lFilters ]):
+            if aFilters and not all([ rxp.match(lRow[i]) for i,rxp in aFilters ]):
                 continue
                 
             lCmdTable.add_row(lRow)           
@@ -131,25 +158,25 @@ def report(env, filters):
     string += '+----------------------------------+\n'
     string += '|  Resolved packages & components  |\n'
     string += '+----------------------------------+\n'
-    string += 'packages: ' + str(list(lParser.components.iterkeys())) + '\n'
+    string += 'packages: ' + str(list(aParser.components.iterkeys())) + '\n'
     string += 'components:\n'
-    for pkg in sorted(lParser.components):
-        string += '+ %s (%d)\n' % (pkg, len(lParser.components[pkg]))
-        for cmp in sorted(lParser.components[pkg]):
+    for pkg in sorted(aParser.components):
+        string += '+ %s (%d)\n' % (pkg, len(aParser.components[pkg]))
+        for cmp in sorted(aParser.components[pkg]):
             string += '  > ' + str(cmp) + '\n'
 
-    if lParser.missing:
+    if aParser.missing:
         string += '\n'
         string += '+----------------------------------------+\n'
         string += '|  Missing packages, components & files  |\n'
         string += '+----------------------------------------+\n'
 
-        if lParser.missingPackages:
+        if aParser.missingPackages:
             string += 'packages: ' + \
-                str(list(lParser.missingPackages)) + '\n'
+                str(list(aParser.missingPackages)) + '\n'
 
         # ------
-        lCNF = lParser.missingComponents
+        lCNF = aParser.missingComponents
         if lCNF:
             string += 'components: \n'
 
@@ -163,7 +190,7 @@ def report(env, filters):
         # ------
     echo(string)
         
-    lFNF = lParser.missingFiles
+    lFNF = aParser.missingFiles
 
     if lFNF:
 
@@ -222,6 +249,85 @@ def components(env, output):
 # ------------------------------------------------------------------------------
 
 
+# ------------------------------------------------------------------------------
+@dep.command('tree', short_help="Show the include tree, or the files pulled in by a component")
+@click.option('-d', '--depth', 'aDepth', default=None, type=int, help="Maximum include depth shown.")
+@click.option('-c', '--component', 'aComponent', default=None, callback=lambda ctx, param, value: None if value is None else validateComponent(ctx, param, value), help="List the files pulled in by the dep files of a component, <package>:<component>.")
+@click.option('-g', '--group', 'aGroup', default=None, type=click.Choice(['setup', 'src', 'addrtab', 'iprepo']), help="Restrict to one kind of files.")
+@click.option('-o', '--output', default=None, help="Destination of the command output. Default: stdout")
+@click.pass_obj
+def tree(env, aDepth, aComponent, aGroup, output):
+    '''Show the include tree of the current project
+
+    Every dep file is shown with the number of files, dep files and missing entries
+    it pulls in, itself and through the dep files it includes, and a digest of
+    the results of its subtree.
+    '''
+    lTree = env.depParser.tree
+
+    with SmartOpen(output) as lWriter:
+        if aComponent:
+            for lCmd in lTree.component(aComponent[0], aComponent[1], aGroup):
+                lWriter(relpath(lCmd.FilePath, env.srcdir))
+            return
+
+        for lNode, lDepth, _, _, _ in lTree.nodes:
+            if aDepth is not None and lDepth > aDepth:
+                continue
+            lCounts = lNode.counts
+            lKinds = [aGroup] if aGroup else sorted(k for k in lCounts if k not in ('include', 'missing'))
+            lWriter('{0}{1}:{2} {3} [{4}] {5}'.format(
+                '  ' * lDepth,
+                lNode.pkg,
+                lNode.cmp,
+                lNode.dep,
+                ', '.join('{0}: {1}'.format(k, lCounts.get(k, 0)) for k in lKinds + ['include', 'missing']),
+                lNode.digest[:8]
+            ))
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+@dep.command('why', short_help="Explain why a file is part of the project")
+@click.argument('path')
+@click.option('--json', 'asJson', is_flag=True, help="Print the answer in JSON format.")
+@click.option('-n', '--max-chains', default=20, help="Maximum number of include chains to show.")
+@click.pass_obj
+def why(env, path, asJson, max_chains):
+    '''Explain why a file or dep file is part of the project
+
+    Shows the dep files that pulled PATH in, the components it belongs to and the
+    chains of includes leading to it from the top dep file. PATH is relative to the
+    source area, or absolute.
+    '''
+    import json
+
+    lRevDeps = env.depParser.revDeps
+
+    # The dep command group moves into the project area, relative paths refer to the source area
+    lPath = os.path.normpath(join(env.srcdir, path))
+    lAnswer = lRevDeps.why(lPath, max_chains)
+    if lAnswer is None:
+        raise click.ClickException("'{}' is not part of the dependency tree of project {}".format(path, env.currentproj.name))
+
+    if asJson:
+        lAnswer['components'] = [':'.join(c) for c in lAnswer['components']]
+        echo(json.dumps(lAnswer, indent=2))
+        return
+
+    secho(relpath(lPath, env.srcdir), fg='blue')
+    echo('  components: ' + ', '.join(':'.join(c) for c in lAnswer['components']))
+    echo('  ' + ('included by:' if lPath in lRevDeps.depFiles else 'listed in:'))
+    for lDepFile in lAnswer['depfiles']:
+        echo('    ' + relpath(lDepFile, env.srcdir))
+    echo('  include chains:')
+    for lChain in lAnswer['chains']:
+        echo('    ' + '\n      -> '.join(relpath(d, env.srcdir) for d in lChain))
+    if len(lAnswer['chains']) == max_chains:
+        secho('  (showing the first {} chains only)'.format(max_chains), fg='yellow')
+# ------------------------------------------------------------------------------
+
+
 # ------------------------------------------------------------------------------
 
 @contextlib.contextmanager
@@ -249,70 +355,47 @@ def set_env(**environ):
 
 
 # ------------------------------------------------------------------------------
-# ----------------------------
-def hashAndUpdate(aFilePath, aChunkSize=0x10000, aUpdateHashes=None, aAlgo=hashlib.sha1):
-
-    # New instance of the selected algorithm
-    lHash = aAlgo()
-
-    # Loop ovet the file content
-    with open(aFilePath, "rb") as f:
-        for lChunk in iter(lambda: f.read(aChunkSize), b''):
-            lHash.update(lChunk)
-
-            # Also update other hashes
-            for lUpHash in aUpdateHashes:
-                lUpHash.update(lChunk)
-
-    return lHash
-# ----------------------------
-
-
 @dep.command()
 @click.pass_obj
 @click.option('-o', '--output', default=None, help="Destination of the command output. Default: stdout")
 @click.option('-v', '--verbose', count=True)
-def hash(env, output, verbose):
-
-    lAlgoName = 'sha1'
-
-    lAlgo = getattr(hashlib, lAlgoName, None)
+@click.option('-j', '--jobs', default=None, type=int, help="Number of files hashed in parallel. Default: one per CPU")
+@click.option('--verify', is_flag=True, help="Rehash all the files, ignoring the digests cached in the work area.")
+@click.option('-a', '--algorithm', 'aAlgoName', default=kDefaultAlgorithm, type=click.Choice(list(algorithms)), help="Hashing algorithm. crc32 and adler32 are fast, but only fit for change detection. Default: " + kDefaultAlgorithm)
+def hash(env, output, verbose, jobs, verify, aAlgoName):
+    '''Hash the files of the current project
+
+    File digests are cached in the work area, and reused as long as the files keep the
+    same inode, size and modification time.
+    '''
 
-    # Ensure that the selecte algorithm exists
-    if lAlgo is None:
-        raise AttributeError(
-            'Hashing algorithm {0} is not available'.format(lAlgoName)
-        )
+    lAlgo = algorithm(aAlgoName)
 
     with SmartOpen(output) as lWriter:
 
         if verbose:
             lTitle = "{0} hashes for project '{1}'".format(
-                lAlgoName, env.currentproj.name)
+                aAlgoName, env.currentproj.name)
             lWriter("# " + '=' * len(lTitle))
             lWriter("# " + lTitle)
             lWriter("# " + "=" * len(lTitle))
+            lWriter("# algorithm: " + aAlgoName)
             lWriter()
 
-        lProjHash = lAlgo()
-        lGrpHashes = collections.OrderedDict()
-        for lGrp, lCmds in env.depParser.commands.iteritems():
-            lGrpHash = lAlgo()
-            if verbose:
+        lCache = DigestCache(join(env.work.path, kWorkDigestCacheFile), env._verbosity, aRefresh=verify)
+        # Every file is hashed once, for both the flat hashes and the tree
+        lDigests = hashFiles([lCmd.FilePath for lCmds in env.depParser.commands.itervalues() for lCmd in lCmds], lAlgo, jobs, lCache)
+        lCache.save()
+        lProjHash, lGrpHashes, lCmdHashes = hashCommands(env.depParser.commands, lAlgo, aDigests=lDigests)
+        lTree = merkleTree(env.depParser.commands, env.srcdir, lAlgo, aDigests=lDigests) if verbose else None
+
+        if verbose:
+            for lGrp, lHashes in lCmdHashes.iteritems():
                 lWriter("#" + "-" * 79)
                 lWriter("# " + lGrp)
                 lWriter("#" + "-" * 79)
-            for lCmd in lCmds:
-                lCmdHash = hashAndUpdate(
-                    lCmd.FilePath, aUpdateHashes=[
-                        lProjHash, lGrpHash], aAlgo=lAlgo
-                ).hexdigest()
-                if verbose:
-                    lWriter(lCmdHash, lCmd.FilePath)
-
-            lGrpHashes[lGrp] = lGrpHash
-
-            if verbose:
+                for lCmdHash, lFilePath in lHashes:
+                    lWriter(lCmdHash, lFilePath)
                 lWriter()
 
         if verbose:
@@ -323,6 +406,21 @@ def hash(env, output, verbose):
                 lWriter(lHash.hexdigest(), lGrp)
             lWriter()
 
+            lWriter("#" + "-" * 79)
+            lWriter("# Per package and component hashes")
+            lWriter("#" + "-" * 79)
+            for lPkg, lNode in lTree['packages'].iteritems():
+                lWriter(lNode['digest'], lPkg)
+                for lCmp, lDigest in lNode['components'].iteritems():
+                    lWriter(lDigest, lPkg + ':' + lCmp)
+            lWriter()
+
+            lWriter("#" + "-" * 79)
+            lWriter("# Merkle hash for project '" + env.currentproj.name + "'")
+            lWriter("#" + "-" * 79)
+            lWriter(lTree['digest'], env.currentproj.name)
+            lWriter()
+
             lWriter("#" + "-" * 79)
             lWriter("# Global hash for project '" + env.currentproj.name + "'")
             lWriter("#" + "-" * 79)
@@ -331,7 +429,238 @@ def hash(env, output, verbose):
         if not verbose:
             lWriter(lProjHash.hexdigest())
 
-    return lProjHash
+    # Project hash and, in verbose mode, hash tree, for 'vivado package'
+    return lProjHash, lTree
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+@dep.command('diff', short_help="List the components changed since a packaged build")
+@click.argument('summary', type=click.Path(exists=True))
+@click.pass_obj
+def diff(env, summary):
+    '''List the components whose files changed since a build
+
+    SUMMARY is the summary.txt file of a package created by 'vivado package', or a
+    JSON file holding the hash tree alone. Relative paths refer to the project area,
+    e.g. package/src/summary.txt.
+    '''
+    import json
+
+    with open(summary) as lSummaryFile:
+        lOld = json.load(lSummaryFile)
+    lOld = lOld.get('merkle', lOld)
+    if 'packages' not in lOld:
+        raise click.ClickException('No hash tree found in ' + summary)
+
+    try:
+        lAlgo = algorithm(lOld['algorithm'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    lCache = DigestCache(join(env.work.path, kWorkDigestCacheFile), env._verbosity)
+    lNew = merkleTree(env.depParser.commands, env.srcdir, lAlgo, aCache=lCache)
+    lCache.save()
+
+    lAdded, lRemoved, lChanged = diffMerkleTrees(lOld, lNew)
+    if not (lAdded or lRemoved or lChanged):
+        secho('No changes since ' + summary, fg='green')
+        return
+
+    for lTitle, lComponents, lColor in [('Changed', lChanged, 'yellow'), ('Added', lAdded, 'green'), ('Removed', lRemoved, 'red')]:
+        if not lComponents:
+            continue
+        secho('{0} components ({1}):'.format(lTitle, len(lComponents)), fg=lColor)
+        for lPkg, lCmp in lComponents:
+            echo('  ' + lPkg + ':' + lCmp)
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+@dep.command('profile', short_help="Profile the parsing of the dependency tree")
+@click.option('-n', '--top', 'aTop', default=20, help="Number of dep files and file expressions to show.")
+@click.option('--json', 'aJson', default=None, help="Write the measurements of every dep file inclusion to a JSON file.")
+@click.option('--folded', 'aFolded', default=None, help="Write the include stacks in folded format, for flamegraph.pl.")
+@click.pass_obj
+def profile(env, aTop, aJson, aFolded):
+    '''Profile the parsing of the dependency tree of the current project
+
+    Parses the dep files from scratch, bypassing the dependency cache, and shows the dep
+    files, include depths and file expressions that take the most time.
+    '''
+    import json
+    import time
+    from ..depparser.DepFileParser import DepFileParser
+
+    lParser = DepFileParser(
+        env.currentproj.config['toolset'],
+        env.pathMaker,
+        aVerbosity=env._verbosity,
+        aJobs=env.parseJobs,
+        aProfile=True
+    )
+
+    lStart = time.time()
+    try:
+        lParser.parse(
+            env.currentproj.config['topPkg'],
+            env.currentproj.config['topCmp'],
+            env.currentproj.config['topDep']
+        )
+    except OSError as e:
+        secho('WARNING: ' + str(e), fg='yellow')
+    lElapsed = time.time() - lStart
+
+    lProfiler = lParser.profiler
+    lPrepend = re.compile('(^|\n)')
+
+    def rel(aPath):
+        return relpath(aPath, env.srcdir)
+
+    def ms(aSeconds):
+        return '{:.1f}'.format(aSeconds * 1e3)
+
+    echo()
+    secho('* Parsed {} dep file inclusions in {:.2f}s ({} reused)'.format(
+        len(lProfiler.profiles), lElapsed, sum(p.reused for p in lProfiler.profiles)
+    ), fg='blue')
+
+    echo()
+    secho('* Dep files, by own time', fg='blue')
+    lTable = Texttable(max_width=0)
+    lTable.header(['dep file', 'inclusions', 'own ms', 'total ms', 'eval ms', 'lines', 'globs', 'matched'])
+    lTable.set_deco(Texttable.HEADER | Texttable.BORDER)
+    lTable.set_cols_dtype(['t'] * 8)
+    for lPath, lCount, lSum in lProfiler.byDepFile()[:aTop]:
+        lTable.add_row([rel(lPath), lCount, ms(lSum.own), ms(lSum.total), ms(lSum.eval), lSum.lines, lSum.globs, lSum.matched])
+    echo(lPrepend.sub('\g<1>  ', lTable.draw()))
+
+    echo()
+    secho('* Include depths', fg='blue')
+    lTable = Texttable(max_width=0)
+    lTable.header(['depth', 'inclusions', 'own ms', 'eval ms', 'lines', 'globs', 'matched'])
+    lTable.set_deco(Texttable.HEADER | Texttable.BORDER)
+    lTable.set_cols_dtype(['t'] * 7)
+    for lDepth, lCount, lSum in lProfiler.byDepth():
+        lTable.add_row([lDepth, lCount, ms(lSum.own), ms(lSum.eval), lSum.lines, lSum.globs, lSum.matched])
+    echo(lPrepend.sub('\g<1>  ', lTable.draw()))
+
+    echo()
+    secho('* File expressions, by time', fg='blue')
+    lTable = Texttable(max_width=0)
+    lTable.header(['expression', 'expansions', 'ms', 'matched'])
+    lTable.set_deco(Texttable.HEADER | Texttable.BORDER)
+    lTable.set_cols_dtype(['t'] * 4)
+    for lExpr, lCount, lTime, lMatched in lProfiler.byGlob()[:aTop]:
+        lTable.add_row([rel(lExpr), lCount, ms(lTime), lMatched])
+    echo(lPrepend.sub('\g<1>  ', lTable.draw()))
+
+    if aJson:
+        with open(aJson, 'w') as lFile:
+            json.dump(lProfiler.asDict(), lFile, indent=2)
+        secho('Measurements written to ' + aJson, fg='green')
+
+    if aFolded:
+        with open(aFolded, 'w') as lFile:
+            lFile.write('\n'.join(lProfiler.folded(rel)) + '\n')
+        secho('Folded stacks written to ' + aFolded, fg='green')
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def watchedDirs(aStamps):
+    '''Directories to watch for changes to the given dep files and directories
+
+    For missing paths, the closest existing parent directory is watched.
+    '''
+    lDirs = set()
+    for lPath, lStamp in aStamps.iteritems():
+        if lStamp is not None:
+            lDirs.add(lPath if os.path.isdir(lPath) else os.path.dirname(lPath))
+            continue
+        lDir = os.path.dirname(lPath)
+        while lDir and not os.path.isdir(lDir) and lDir != os.path.dirname(lDir):
+            lDir = os.path.dirname(lDir)
+        if lDir:
+            lDirs.add(lDir)
+    return lDirs
+
+
+@dep.command()
+@click.option('-i', '--interval', type=float, default=1., help="Polling interval in seconds, where inotify is not available.")
+@click.pass_obj
+def watch(env, interval):
+    '''Keep the dependency tree of the current project up to date
+
+    Watches the dep files and the directories the project depends on, and re-parses
+    the dep files affected by each change. The refreshed tree is stored in the project
+    dependency cache, where other ipbb commands pick it up.
+    '''
+    from ..depparser.DepFileParser import DepFileParser
+    from ..depparser.DepTreeCache import DepTreeCache
+    from ..tools import inotify
+    from . import kProjDepCacheFile
+    import time
+
+    lTop = (
+        env.currentproj.config['topPkg'],
+        env.currentproj.config['topCmp'],
+        env.currentproj.config['topDep']
+    )
+    lCache = DepTreeCache(join(env.currentproj.path, kProjDepCacheFile), env._verbosity)
+
+    # A dedicated parser: the records of the dep files it parsed are kept across refreshes
+    lParser = DepFileParser(
+        env.currentproj.config['toolset'],
+        env.pathMaker,
+        aVerbosity=env._verbosity,
+        aJobs=env.parseJobs
+    )
+
+    def refresh():
+        '''Returns the changed paths and the time taken, None for the paths if the parse failed'''
+        env.pathMaker.resetIndex()
+        lStart = time.time()
+        try:
+            lChanged = lParser.refresh(*lTop)
+        except (OSError, RuntimeError, SystemExit) as e:
+            # Missing dep files, malformed lines and directives: wait for a fix, the
+            # partial tree is not cached. The dep files read so far are stamped, their
+            # next change triggers a retry.
+            secho(time.strftime('[%H:%M:%S] ') + 'ERROR: ' + str(e), fg='red')
+            return None, time.time() - lStart
+        lCache.save(lParser, *lTop)
+        return lChanged, time.time() - lStart
+
+    if inotify.available():
+        lWatcher = inotify.DirWatcher()
+    else:
+        secho('inotify not available, polling every {}s'.format(interval), fg='yellow')
+        lWatcher = inotify.PollingWatcher(interval)
+
+    _, lElapsed = refresh()
+    lWatcher.watch(watchedDirs(lParser.stamps))
+    secho('Watching {} dep files and directories ({:.2f}s). Press Ctrl-C to stop.'.format(len(lParser.stamps), lElapsed), fg='blue')
+
+    try:
+        while True:
+            if not lWatcher.wait() or not lParser.changedPaths():
+                continue
+
+            lChanged, lElapsed = refresh()
+            lWatcher.watch(watchedDirs(lParser.stamps))
+            if lChanged is None:
+                continue
+
+            echo(time.strftime('[%H:%M:%S] ') + '{} change(s), refreshed in {:.2f}s: {} commands, {} missing'.format(
+                len(lChanged), lElapsed, sum(len(v) for v in lParser.commands.itervalues()), len(lParser.missing)
+            ))
+            for lPath in lChanged:
+                echo('  ' + relpath(lPath, env.srcdir))
+    except KeyboardInterrupt:
+        echo()
+    finally:
+        lWatcher.close()
 # ------------------------------------------------------------------------------
 
 
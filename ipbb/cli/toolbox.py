@@ -40,7 +40,8 @@ def check_depfile(env, verbose, component, depfile, toolset):
     lPathMaker = Pathmaker(env.srcdir, env._verbosity)
 
     try:
-        lParser = DepFileParser(toolset, lPathMaker)
+        # Commands are listed only in verbose mode, the missing entries are enough otherwise
+        lParser = DepFileParser(toolset, lPathMaker, aMode='full' if verbose else 'structure')
         lParser.parse(lPackage, lComponent, depfile)
     except OSError as lExc:
         raise click.ClickException("Failed to parse dep file - '{}'".format(lExc))
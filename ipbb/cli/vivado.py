@@ -21,6 +21,8 @@ from .utils import DirSentry, ensureNoMissingFiles, echoVivadoConsoleError
 
 from ..depparser.VivadoProjectMaker import VivadoProjectMaker
 from ..tools.xilinx import VivadoOpen, VivadoConsoleError, VivadoSnoozer
+from ..tools.vivadoserver import VivadoClient, serverRunning, serverStatus, stopServer, spawnServer
+from . import kProjVivadoSocket
 
 # Debugging and testing
 #import pdb; pdb.set_trace()
@@ -38,6 +40,20 @@ def ensureVivado(env):
 # ------------------------------------------------------------------------------
 
 
+# ------------------------------------------------------------------------------
+def vivadoSession(env, aSessionId, **kwargs):
+    '''Vivado console for a subcommand
+
+    A session on the Vivado server of the project if one is running, a new Vivado
+    process otherwise.
+    '''
+    lSocketPath = join(env.currentproj.path, kProjVivadoSocket)
+    if serverRunning(lSocketPath):
+        return VivadoClient(lSocketPath, aSessionId, echo=env.vivadoEcho, **kwargs)
+    return VivadoOpen(aSessionId, echo=env.vivadoEcho, **kwargs)
+# ------------------------------------------------------------------------------
+
+
 # ------------------------------------------------------------------------------
 @click.group('vivado', short_help='Set up, syntesize, implement Vivado projects.', chain=True)
 @click.option('-p', '--proj', default=None, help="Selected project, if not current")
@@ -77,6 +93,72 @@ import types
 vivado.get_command = types.MethodType(vivado_get_command_aliases, vivado)
 # ------------------------------------------------------------------------------
 
+# ------------------------------------------------------------------------------
+@vivado.command('server', short_help='Start, stop or query the Vivado server of the project.')
+@click.argument('action', type=click.Choice(['start', 'stop', 'status']), default='status')
+@click.option('-t', '--idle-timeout', type=int, default=3600, help='Seconds without sessions before the server quits, 0 for never.')
+@click.option('-w', '--wait', type=int, default=300, help='Seconds to wait for Vivado to start.')
+@click.pass_obj
+def server(env, action, idle_timeout, wait):
+    '''Vivado server of the project
+
+    Keeps Vivado running with the project open. The other vivado subcommands run
+    their commands on it, sparing Vivado's start up and the opening of the project.
+    '''
+
+    lSocketPath = join(env.currentproj.path, kProjVivadoSocket)
+
+    if action == 'status':
+        lStatus = serverStatus(lSocketPath)
+        if lStatus is None:
+            echo('No Vivado server running for ' + style(env.currentproj.name, fg='blue'))
+            return
+
+        lSummary = Texttable(max_width=0)
+        lSummary.set_deco(Texttable.VLINES | Texttable.BORDER)
+        lSummary.add_rows([
+            ['pid', lStatus['pid']],
+            ['project', lStatus['project']],
+            ['vivado running', lStatus['vivado']],
+            ['current session', lStatus['session'] or '-'],
+            ['sessions served', lStatus['sessions']],
+            ['uptime', '{:.0f}s'.format(lStatus['uptime'])],
+            ['idle', '{:.0f}s / {}'.format(lStatus['idle'], '{:.0f}s'.format(lStatus['idle timeout']) if lStatus['idle timeout'] else 'never')],
+        ], header=False)
+        echo(lSummary.draw())
+
+    elif action == 'stop':
+        if not stopServer(lSocketPath):
+            echo('No Vivado server running for ' + style(env.currentproj.name, fg='blue'))
+            return
+
+        # The server quits once the current session is over
+        while serverRunning(lSocketPath):
+            time.sleep(1)
+        secho('Vivado server stopped', fg='green')
+
+    elif action == 'start':
+        if serverRunning(lSocketPath):
+            echo('Vivado server already running for ' + style(env.currentproj.name, fg='blue'))
+            return
+
+        ensureVivado(env)
+
+        lLogPath = join(env.currentproj.path, kProjVivadoSocket + '.log')
+        lProcess = spawnServer(lSocketPath, join(env.currentproj.path, 'top', 'top.xpr'), idle_timeout, lLogPath)
+        secho('Starting Vivado server (pid {}), log in {}'.format(lProcess.pid, lLogPath), fg='blue')
+
+        lStart = time.time()
+        while not serverRunning(lSocketPath):
+            if lProcess.poll() is not None:
+                raise click.ClickException('Vivado server failed to start. See ' + lLogPath)
+            if time.time() - lStart > wait:
+                raise click.ClickException('Vivado server not ready after {}s. See {}'.format(wait, lLogPath))
+            time.sleep(1)
+        secho('Vivado server ready', fg='green')
+# ------------------------------------------------------------------------------
+
+
 # ------------------------------------------------------------------------------
 @vivado.command('make-project', short_help='Assemble the project from sources.')
 @click.option('-r/-n', '--reverse/--natural', 'aReverse', default=True)
@@ -92,18 +174,20 @@ def makeproject(env, aReverse, aOptimise, aToScript, aToStdout):
     # Check if vivado is around
     ensureVivado(env)
 
-    lDepFileParser = env.depParser
-
-    # Ensure thay all dependencies have been resolved
-    ensureNoMissingFiles(env.currentproj.name, lDepFileParser)
-
     lVivadoMaker = VivadoProjectMaker(aReverse, aOptimise)
 
     lDryRun = aToScript or aToStdout
 
+    # Parse the dep files while Vivado starts up
+    if not lDryRun:
+        lDepFileParserReady = env.depParserInBackground()
+    else:
+        lDepFileParser = env.depParser
+        lDepFileParserReady = lambda: lDepFileParser
+
     try:
         with (
-            VivadoOpen(lSessionId, echo=env.vivadoEcho) if not lDryRun 
+            vivadoSession(env, lSessionId) if not lDryRun 
             else SmartOpen(
                 # Dump to script
                 aToScript if not aToStdout 
@@ -111,6 +195,14 @@ def makeproject(env, aReverse, aOptimise, aToScript, aToStdout):
                 else None
             )
         ) as lConsole:
+            try:
+                lDepFileParser = lDepFileParserReady()
+            except RuntimeError as lExc:
+                raise click.ClickException(str(lExc))
+
+            # Ensure thay all dependencies have been resolved
+            ensureNoMissingFiles(env.currentproj.name, lDepFileParser)
+
             lVivadoMaker.write(
                 lConsole,
                 lDepFileParser.vars,
@@ -150,9 +242,9 @@ def checksyntax(env):
 
     ensureVivado(env)
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
 
             # Open the project
             lConsole('open_project {}'.format(lVivProjPath))
@@ -179,14 +271,15 @@ def getSynthRunProps(aConsole):
     '''
 
     with VivadoSnoozer(aConsole):
-        lSynthesisRuns = aConsole('get_runs -filter {IS_SYNTHESIS}')[0].split()
+        lSynthesisRuns = aConsole.query('get_runs -filter {IS_SYNTHESIS}').split()
         lRunProps = {}
 
         lProps = ['STATUS', 'PROGRESS', 'STATS.ELAPSED']
-        
-        for lRun in lSynthesisRuns:
-            lValues = aConsole([ 'get_property {0} [get_runs {1}]'.format(lProp, lRun) for lProp in lProps ])
-            lRunProps[lRun] = dict(zip(lProps, lValues))
+
+        # All in one batch
+        lValues = [ r.value for r in aConsole.evaluate([ 'get_property {0} [get_runs {1}]'.format(lProp, lRun) for lRun in lSynthesisRuns for lProp in lProps ]) ]
+        for i, lRun in enumerate(lSynthesisRuns):
+            lRunProps[lRun] = dict(zip(lProps, lValues[i*len(lProps):(i+1)*len(lProps)]))
     return lRunProps
 # -------------------------------------
 
@@ -214,9 +307,9 @@ def synth(env, jobs):
     # if email is not None:
         # args +=  ['-email_to {} -email_all'.format(email)]
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
 
             # Open the project
             lConsole('open_project {}'.format(lVivProjPath))
@@ -303,9 +396,9 @@ def sim(env, run_for, gui_mode, iocheck):
 
 	proj_file.close()
 
-	from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+	from ..tools.xilinx import VivadoConsoleError
 	try: #prepare and run simulation
-		with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+		with vivadoSession(env, lSessionId) as lConsole:
 			lConsole('open_project {}'.format(lVivProjPath)) #open the project in Vivado
 			lConsole('set_property top {} [get_filesets sim_1]'.format(tb_file)) #set the top file
 			lConsole('set_property source_mgmt_mode All [current_project]')
@@ -369,9 +462,9 @@ def impl(env, jobs):
         'Timing 38-282', # Force error when timing is not met
     ]
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho, stopOnCWarnings=True) as lConsole:
+        with vivadoSession(env, lSessionId, stopOnCWarnings=True) as lConsole:
 
             # Change message severity to ERROR for the isses we're interested in
             lConsole(['set_msg_config -id "{}" -new_severity "ERROR"'.format(e) for e in lStopOn])
@@ -414,9 +507,9 @@ def orderconstr(env, order):
     lConstrOrder = lConstrSrc if order else [ f for f in reversed(lConstrSrc)]
     # echo('\n'.join( ' * {}'.format(style(c, fg='blue')) for c in lConstrOrder ))
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
             # Open vivado project
             lConsole('open_project {}'.format(lVivProjPath))
             # lConstraints = lConsole('get_files -of_objects [get_filesets constrs_1]')[0].split()
@@ -426,7 +519,7 @@ def orderconstr(env, order):
             lCmds = [lCmdTemplate.format(lConstrOrder[i], lConstrOrder[i+1]) for i in xrange(len(lConstrOrder)-1)]
             lConsole(lCmds)
 
-            lConstraints = lConsole('get_files -of_objects [get_filesets constrs_1]')[0].split()
+            lConstraints = lConsole.query('get_files -of_objects [get_filesets constrs_1]').split()
 
         echo('\nNew constraint order:')
         echo('\n'.join( ' * {}'.format(style(c, fg='blue')) for c in lConstraints ))
@@ -465,9 +558,9 @@ def resourceusage(env):
     ]
 
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
             lConsole(lOpenCmds)
             # lConsole(lImplCmds)
     except VivadoConsoleError as lExc:
@@ -503,9 +596,9 @@ def bitfile(env):
         'wait_on_run impl_1',
     ]
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
             lConsole(lOpenCmds)
             lConsole(lBitFileCmds)
     except VivadoConsoleError as lExc:
@@ -538,23 +631,21 @@ def status(env):
     lInfos = {}
     lProps = ['STATUS', 'PROGRESS', 'IS_IMPLEMENTATION', 'IS_SYNTHESIS', 'STATS.ELAPSED']
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
             echo('Opening project')
             lConsole(lOpenCmds)
             
-            lIPs = lConsole('get_ips')[0].split()
+            lIPs = lConsole.query('get_ips').split()
 
             echo('Retrieving run information')
             # Gather data about existing runs
-            lRuns = lConsole('get_runs')[0].split()
-            for lRun in sorted(lRuns):
-                secho(lRun, fg='blue')
-
-                lCmds = [ 'get_property {0} [get_runs {1}]'.format(lProp, lRun) for lProp in lProps ]
-                lValues = lConsole(lCmds)
-                lInfos[lRun] = dict(zip(lProps, lValues))
+            lRuns = sorted(lConsole.query('get_runs').split())
+            lCmds = [ 'get_property {0} [get_runs {1}]'.format(lProp, lRun) for lRun in lRuns for lProp in lProps ]
+            lValues = [ r.value for r in lConsole.evaluate(lCmds) ]
+            for i, lRun in enumerate(lRuns):
+                lInfos[lRun] = dict(zip(lProps, lValues[i*len(lProps):(i+1)*len(lProps)]))
 
     except VivadoConsoleError as lExc:
         echoVivadoConsoleError(lExc)
@@ -597,9 +688,9 @@ def reset(env):
         'reset_run impl_1',
     ]
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
             lConsole(lOpenCmds)
             lConsole(lResetCmds)
     except VivadoConsoleError as lExc:
@@ -656,7 +747,8 @@ def package(ctx, aTag):
 
     # -------------------------------------------------------------------------
     from .dep import hash
-    lHash = ctx.invoke(hash, output=join(lSrcPath, 'hashes.txt'), verbose=True)
+    # The hash tree gives per package and component digests, to tell what changed between builds
+    lHash, lTree = ctx.invoke(hash, output=join(lSrcPath, 'hashes.txt'), verbose=True)
     # -------------------------------------------------------------------------
 
     # -------------------------------------------------------------------------
@@ -664,7 +756,9 @@ def package(ctx, aTag):
     lSummary.update({
         'time': socket.gethostname().replace('.', '_'),
         'build host': time.strftime("%a, %d %b %Y %H:%M:%S +0000"),
-        'md5': lHash.hexdigest(),
+        lHash.name: lHash.hexdigest(),
+        'hash algorithm': lHash.name,
+        'merkle': lTree,
     })
 
     with open(join(lSrcPath, 'summary.txt'), 'w') as lSummaryFile:
@@ -728,9 +822,9 @@ def archive(ctx):
         'archive_project %s -force' % join(env.currentproj.path, '{}.xpr.zip'.format(env.currentproj.config['name'])),
     ]
 
-    from ..tools.xilinx import VivadoOpen, VivadoConsoleError
+    from ..tools.xilinx import VivadoConsoleError
     try:
-        with VivadoOpen(lSessionId, echo=env.vivadoEcho) as lConsole:
+        with vivadoSession(env, lSessionId) as lConsole:
             lConsole(lOpenCmds)
             lConsole(lArchiveCmds)
     except VivadoConsoleError as lExc:
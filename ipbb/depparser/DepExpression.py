@@ -0,0 +1,215 @@
+from __future__ import print_function
+import ast
+import operator
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class DepExpressionError(Exception):
+    """Raised when a dep file directive is not supported, or fails to evaluate"""
+    pass
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class DepExpression(object):
+    """Compiled dep file directive
+
+    The directives of dep files (`@name = value` and `?condition?`) are restricted to
+    literals, variables, comparisons, boolean and arithmetic operators. They are
+    compiled into nested closures, evaluated against the parser variables only: no
+    builtins, attributes or function calls are reachable.
+
+    Attributes:
+        source (str): expression source text
+        target (str): name of the variable assigned, None for plain expressions
+        names (frozenset): names of the variables the directive refers to, target included
+    """
+
+    __slots__ = ('source', 'target', 'names', '_eval')
+
+    # --------------------------------------------------------------
+    def __init__(self, aSource, aTarget, aNames, aEval):
+        self.source = aSource
+        self.target = aTarget
+        self.names = aNames
+        self._eval = aEval
+
+    def __call__(self, aVars):
+        '''Evaluates the expression, or the value to assign, against aVars'''
+        try:
+            return self._eval(aVars)
+        except DepExpressionError:
+            raise
+        except Exception as e:
+            raise DepExpressionError('{0}: {1}'.format(type(e).__name__, e))
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, self.source)
+    # --------------------------------------------------------------
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+_kConstants = {'True': True, 'False': False, 'None': None}
+
+_kBinaryOps = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    # Classic division on Python 2, as exec'd directives used to behave
+    ast.Div: getattr(operator, 'div', operator.truediv),
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+_kUnaryOps = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_kCompareOps = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+
+def _variable(aName):
+    def lEval(aVars):
+        try:
+            return aVars[aName]
+        except KeyError:
+            raise DepExpressionError("name '{0}' is not defined".format(aName))
+    return lEval
+
+
+def _constant(aValue):
+    return lambda aVars: aValue
+
+
+def _build(aNode, aNames):
+    '''Turns an expression node into a function of the variables, collecting the names it reads'''
+
+    lType = type(aNode).__name__
+
+    # Literals: the node types differ across Python versions
+    if lType in ('Num', 'Str', 'Bytes', 'NameConstant', 'Constant'):
+        return _constant(getattr(aNode, 'value', getattr(aNode, 'n', getattr(aNode, 's', None))))
+
+    if lType == 'Name':
+        if aNode.id in _kConstants:
+            return _constant(_kConstants[aNode.id])
+        aNames.add(aNode.id)
+        return _variable(aNode.id)
+
+    if lType in ('Tuple', 'List'):
+        lItems = [_build(n, aNames) for n in aNode.elts]
+        lFactory = tuple if lType == 'Tuple' else list
+        return lambda aVars: lFactory(f(aVars) for f in lItems)
+
+    if lType == 'BoolOp':
+        lValues = [_build(n, aNames) for n in aNode.values]
+        if isinstance(aNode.op, ast.And):
+            def lAnd(aVars):
+                for f in lValues:
+                    lValue = f(aVars)
+                    if not lValue:
+                        return lValue
+                return lValue
+            return lAnd
+        else:
+            def lOr(aVars):
+                for f in lValues:
+                    lValue = f(aVars)
+                    if lValue:
+                        return lValue
+                return lValue
+            return lOr
+
+    if lType == 'UnaryOp' and type(aNode.op) in _kUnaryOps:
+        lOp, lOperand = _kUnaryOps[type(aNode.op)], _build(aNode.operand, aNames)
+        return lambda aVars: lOp(lOperand(aVars))
+
+    if lType == 'BinOp' and type(aNode.op) in _kBinaryOps:
+        lOp, lLeft, lRight = _kBinaryOps[type(aNode.op)], _build(aNode.left, aNames), _build(aNode.right, aNames)
+        return lambda aVars: lOp(lLeft(aVars), lRight(aVars))
+
+    if lType == 'Compare' and all(type(o) in _kCompareOps for o in aNode.ops):
+        lLeft = _build(aNode.left, aNames)
+        lOps = [_kCompareOps[type(o)] for o in aNode.ops]
+        lRights = [_build(n, aNames) for n in aNode.comparators]
+
+        # Single comparisons are by far the most common
+        if len(lOps) == 1:
+            lOp, lRight = lOps[0], lRights[0]
+            return lambda aVars: lOp(lLeft(aVars), lRight(aVars))
+
+        def lChain(aVars):
+            lA = lLeft(aVars)
+            for lOp, lRight in zip(lOps, lRights):
+                lB = lRight(aVars)
+                if not lOp(lA, lB):
+                    return False
+                lA = lB
+            return True
+        return lChain
+
+    if lType == 'IfExp':
+        lTest, lBody, lElse = _build(aNode.test, aNames), _build(aNode.body, aNames), _build(aNode.orelse, aNames)
+        return lambda aVars: lBody(aVars) if lTest(aVars) else lElse(aVars)
+
+    raise DepExpressionError("unsupported syntax '{0}'".format(lType))
+
+
+# Compiled directives, by source text and mode. Shared by all the parsers of the
+# process, and emptied when full, as the re module does
+_kCache = {}
+_kCacheMaxSize = 4096
+
+
+def compileDirective(aSource, aMode):
+    '''Compiles the body of a dep file directive
+
+    Args:
+        aSource (str): directive text, without the leading '@' or the enclosing '?'
+        aMode (str): 'assign' for `@` directives, 'eval' for conditions
+
+    Returns:
+        DepExpression: compiled directive, shared by all the occurrences of the same text
+    '''
+    lKey = (aSource, aMode)
+    try:
+        return _kCache[lKey]
+    except KeyError:
+        pass
+
+    try:
+        lTree = ast.parse(aSource.strip(), mode='exec' if aMode == 'assign' else 'eval')
+    except SyntaxError as e:
+        raise DepExpressionError('invalid syntax: {0}'.format(e.msg))
+
+    lNames = set()
+    if aMode == 'assign':
+        if len(lTree.body) != 1 or not isinstance(lTree.body[0], ast.Assign):
+            raise DepExpressionError('expected an assignment')
+        lTargets = lTree.body[0].targets
+        if len(lTargets) != 1 or not isinstance(lTargets[0], ast.Name):
+            raise DepExpressionError('only single variables can be assigned')
+        lTarget = lTargets[0].id
+        lNames.add(lTarget)
+        lEval = _build(lTree.body[0].value, lNames)
+    else:
+        lTarget = None
+        lEval = _build(lTree.body, lNames)
+
+    if len(_kCache) >= _kCacheMaxSize:
+        _kCache.clear()
+    lExpr = _kCache[lKey] = DepExpression(aSource, lTarget, frozenset(lNames), lEval)
+    return lExpr
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
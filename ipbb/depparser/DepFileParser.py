@@ -1,11 +1,47 @@
 from __future__ import print_function
-import argparse
 import os
+import re
 import glob
+import threading
+import time
+import hashlib
 import Pathmaker
+from DepExpression import compileDirective, DepExpressionError
+from RevDepIndex import RevDepIndex
+from DepTree import DepTree
+from DepFileProfiler import DepFileProfiler
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 from os.path import exists
 
+try:
+    from __builtin__ import intern
+except ImportError:
+    from sys import intern
+
+
+def _intern(aString):
+    # Python 2 interns only byte strings, other strings are left as they are
+    try:
+        return intern(aString)
+    except TypeError:
+        return aString
+
+
+# -----------------------------------------------------------------------------
+def stamp(aPath):
+    '''Returns a (mtime, size, inode) signature of a file, directory or open file descriptor.
+
+    None is returned for paths that do not exist.
+    '''
+    try:
+        lStat = os.fstat(aPath) if isinstance(aPath, int) else os.stat(aPath)
+    except OSError:
+        return None
+    return (lStat.st_mtime, lStat.st_size, lStat.st_ino)
+# -----------------------------------------------------------------------------
+
+
 # -----------------------------------------------------------------------------
 class Command(object):
     """Container class for dep commands parsed form dep files
@@ -19,10 +55,14 @@ class Command(object):
         Include   (bool): flag, used to include/exclude target from projects
         TopLevel  (bool): flag, identifies address table as top-level (address tables only)
         Vhdl2008  (bool): flags toggles the vhdl 2008 syntax for .vhd files (vhd targets only)
+        Group     (str): dep command the target was listed by (src, addrtab, ...)
 
     """
+    # Large projects hold tens of thousands of commands, keep them small
+    __slots__ = ('FilePath', 'Package', 'Component', 'Lib', 'Map', 'Include', 'TopLevel', 'Vhdl2008', 'Group')
+
     # --------------------------------------------------------------
-    def __init__(self, aFilePath, aPackage, aComponent, aLib, aMap, aInclude, aTopLevel, aVhdl2008):
+    def __init__(self, aFilePath, aPackage, aComponent, aLib, aMap, aInclude, aTopLevel, aVhdl2008, aGroup=None):
         self.FilePath = aFilePath
         self.Package = aPackage
         self.Component = aComponent
@@ -31,6 +71,7 @@ class Command(object):
         self.Include = aInclude
         self.TopLevel = aTopLevel
         self.Vhdl2008 = aVhdl2008
+        self.Group = aGroup
 
     def __str__(self):
 
@@ -59,25 +100,168 @@ class Command(object):
 
     def __eq__(self, other):
         return (self.FilePath == other.FilePath) and (self.Lib == other.Lib)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        # Consistent with __eq__
+        return hash((self.FilePath, self.Lib))
     # --------------------------------------------------------------
 # -----------------------------------------------------------------------------
 
 # -----------------------------------------------------------------------------
-# Experimental
 class DepFile(object):
-    """docstring for DepFile"""
+    """Node of the include tree: a dep file and what parsing it produced
+
+    Items are kept in parsing order: Command objects, DepFile nodes of the dep files it
+    includes, and missing entries as (path expression, command, package, component,
+    dep file path) tuples. A dep file spliced in from an earlier inclusion shares the node
+    of that inclusion, so that the tree is really a DAG: aggregates are computed once per
+    node, on first use.
+
+    Attributes:
+        pkg       (str): package of the dep file
+        cmp       (str): component of the dep file
+        dep       (str): dep file name
+        commands (list): items, in parsing order
+    """
+    __slots__ = ('pkg', 'cmp', 'dep', 'commands', '_counts', '_digest')
+
     def __init__(self, aPackage, aComponent, aDepFileName):
         super(DepFile, self).__init__()
         self.pkg = aPackage
         self.cmp = aComponent
         self.dep = aDepFileName
         self.commands = []
-        self.cmds = OrderedDict()
+        self._counts = None
+        self._digest = None
 
     def __str__(self):
         pathmaker = Pathmaker.Pathmaker('', 1)
         return '{}:{} - {}'.format(self.pkg, pathmaker.getPath('', self.cmp, 'include', self.dep), len(self.commands))
 
+    # --------------------------------------------------------------
+    @property
+    def key(self):
+        return (self.pkg, self.cmp, self.dep)
+
+    @property
+    def counts(self):
+        '''Items of the subtree by kind: commands by group, 'include' and 'missing' entries
+
+        Every inclusion is counted, duplicates are not removed.
+        '''
+        if self._counts is None:
+            self._aggregate()
+        return self._counts
+
+    @property
+    def digest(self):
+        '''Hash of the content of the subtree: commands and their flags, missing entries and nested dep files
+
+        Two nodes with the same digest produced the same results, wherever they are in
+        the tree, which lets comparisons skip whole subtrees.
+        '''
+        if self._digest is None:
+            self._aggregate()
+        return self._digest
+
+    def _aggregate(self):
+        # Post-order over the nodes not aggregated yet, without recursion
+        lStack = [(self, False)]
+        while lStack:
+            lNode, lChildrenDone = lStack.pop()
+            if lNode._digest is not None:
+                continue
+            if not lChildrenDone:
+                lStack.append((lNode, True))
+                lStack.extend((lItem, False) for lItem in lNode.commands if isinstance(lItem, DepFile) and lItem._digest is None)
+                continue
+
+            lCounts = {}
+            lHash = hashlib.sha1(repr(lNode.key))
+            for lItem in lNode.commands:
+                if isinstance(lItem, DepFile):
+                    lCounts['include'] = lCounts.get('include', 0) + 1
+                    for lKind, lCount in lItem._counts.iteritems():
+                        lCounts[lKind] = lCounts.get(lKind, 0) + lCount
+                    lHash.update('d' + lItem._digest)
+                elif isinstance(lItem, tuple):
+                    lCounts['missing'] = lCounts.get('missing', 0) + 1
+                    lHash.update('m' + repr(lItem[:2]))
+                else:
+                    lCounts[lItem.Group] = lCounts.get(lItem.Group, 0) + 1
+                    lHash.update('c' + repr((lItem.Group, lItem.FilePath, lItem.Lib, lItem.Map, lItem.Include, lItem.TopLevel, lItem.Vhdl2008)))
+            lNode._counts = lCounts
+            lNode._digest = lHash.hexdigest()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def walk(self):
+        '''Yields (node, depth) for every inclusion in the subtree, in parsing order'''
+        lStack = [(self, 0)]
+        while lStack:
+            lNode, lDepth = lStack.pop()
+            yield lNode, lDepth
+            lStack.extend((lItem, lDepth + 1) for lItem in reversed(lNode.commands) if isinstance(lItem, DepFile))
+
+    def iterCommands(self, aGroup=None):
+        '''Yields the commands of the subtree in parsing order, duplicates included'''
+        lStack = [iter(self.commands)]
+        while lStack:
+            for lItem in lStack[-1]:
+                if isinstance(lItem, DepFile):
+                    lStack.append(iter(lItem.commands))
+                    break
+                if isinstance(lItem, Command) and (aGroup is None or lItem.Group == aGroup):
+                    yield lItem
+            else:
+                lStack.pop()
+    # --------------------------------------------------------------
+
+
+class DepFileRecord(object):
+    """Everything parsing a dep file, and the files it includes, added to the parser state
+
+    Records are used to splice in the results of a dep file included more than once
+    instead of parsing it again. A record can be reused only if the variables it consulted
+    still have the same values.
+
+    Attributes:
+        key      (tuple): (package, component, dep file name) of the parsed file
+        mode       (str): parse mode the record was produced in
+        path       (str): path of the dep file
+        reads     (dict): variables consulted before being assigned, and their values
+        writes    (dict): variables assigned by the dep files
+        warnings  (list): warnings issued while parsing
+        stamps    (dict): stamps of the dep files and directories the record depends on
+        node   (DepFile): include tree node of the dep file
+    """
+    def __init__(self, aKey, aMode, aPath, aNode):
+        super(DepFileRecord, self).__init__()
+        self.key = aKey
+        self.mode = aMode
+        self.path = aPath
+        self.node = aNode
+        self.reads = {}
+        self.writes = {}
+        self.warnings = []
+        self.stamps = {}
+        # Contributions to the parser lists, filled in when the parsing is complete
+        self.commands = {}
+        self.libs = []
+        self.maps = []
+        self.missing = []
+        self.componentLog = []
+        self.revDepLog = []
+        self._offsets = None
+
+
+# Placeholder for variables not defined, in DepFileRecord.reads
+_kUndefined = object()
+
+
 class MissingFile(object):
     """docstring for MissingFile"""
     def __init__(self, aPackage, aComponent, aPathExpr):
@@ -88,131 +272,479 @@ class MissingFile(object):
 
 class MultiCommandExpr(object):
     pass
+# -----------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class DepLineParserError(Exception):
+    pass
+
+
+class DepLine(object):
+    """Parsed dep file line
+
+    Exposes the command name as 'cmd' and one attribute per option of the command,
+    like the argparse namespace it replaces.
+    """
+    def __init__(self, aFields):
+        self.__dict__ = aFields
+
+    def __contains__(self, aKey):
+        return aKey in self.__dict__
+
+    def __repr__(self):
+        return 'DepLine(' + ', '.join('%s=%r' % i for i in sorted(self.__dict__.items())) + ')'
 
 
-class CommandFile(object):
+class DepLineOption(object):
+    """Option of a dep command
+
+    Attributes:
+        flags  (tuple): option strings, e.g. ('-l', '--lib')
+        dest     (str): name of the parsed attribute
+        action   (str): one of 'store', 'store_true' or 'component'
+    """
+    def __init__(self, aFlags, aDest, aAction):
+        self.flags = aFlags
+        self.dest = aDest
+        self.action = aAction
+        self.name = '/'.join(aFlags)
+        self.takesValue = (aAction != 'store_true')
+
+
+class DepLineCommand(object):
+    """Grammar of a dep command: its options and the number of file arguments it takes"""
+    def __init__(self, aName, aNargs):
+        self.name = aName
+        self.nargs = aNargs
+        self.options = {}
+        self.prefixes = {}
+        self.defaults = {'cmd': aName, 'file': []}
+
+    def addOption(self, *aFlags, **aKwargs):
+        lAction = aKwargs.get('action', 'store')
+        lDest = aKwargs.get('dest', aFlags[-1].lstrip('-'))
+        lOption = DepLineOption(aFlags, lDest, lAction)
+
+        for lFlag in aFlags:
+            self.options[lFlag] = lOption
+            # Long options can be abbreviated, as long as the abbreviation is unique
+            if lFlag.startswith('--'):
+                for i in range(3, len(lFlag)):
+                    self.prefixes.setdefault(lFlag[:i], []).append(lFlag)
+
+        self.defaults[lDest] = {'store': None, 'store_true': False, 'component': (None, None)}[lAction]
+        return lOption
+
+
+class DepLineParser(object):
+    """Parser for dep file lines
+
+    Hand-written replacement for the argparse subparser tree used originally, which was by
+    far the most expensive part of the dep file parsing. It accepts the same syntax (option
+    abbreviations, combined short flags, '=' separated values, '--') and reports errors
+    with the same messages.
+    """
+
+    _reNegativeNumber = re.compile(r'^-\d+$|^-\d*\.\d+$')
+
     def __init__(self):
-        super(CommandFile, self).__init__()
-        self.abspath
-# -----------------------------------------------------------------------------
+        self._commands = OrderedDict()
+
+    def addCommand(self, aName, nargs="*"):
+        self._commands[aName] = DepLineCommand(aName, nargs)
+        return self._commands[aName]
+
+    def _isOption(self, aToken):
+        return aToken[0] == '-' and aToken != '-' and not self._reNegativeNumber.match(aToken)
+
+    def parse(self, aTokens):
+        if not aTokens:
+            raise DepLineParserError('too few arguments')
+
+        try:
+            lCommand = self._commands[aTokens[0]]
+        except KeyError:
+            raise DepLineParserError('argument cmd: invalid choice: %r (choose from %s)' % (
+                aTokens[0], ', '.join(repr(c) for c in self._commands)))
+
+        lOptions = lCommand.options
+        lFields = dict(lCommand.defaults)
+        lFiles = None
+        lExtras = []
+        lPositionalsOnly = False
+        lFilesClosed = False
+
+        i, n = 1, len(aTokens)
+        while i < n:
+            lToken = aTokens[i]
+            i += 1
+
+            # --------------------------------------------------------------
+            # Positional arguments: only the first contiguous block is accepted
+            if lPositionalsOnly or not self._isOption(lToken):
+                if lFiles is None:
+                    lFiles = [lToken]
+                elif not lFilesClosed:
+                    lFiles.append(lToken)
+                else:
+                    lExtras.append(lToken)
+                continue
 
+            if lToken == '--':
+                lPositionalsOnly = True
+                continue
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Options: resolve the token into an option and an explicit value, if any
+            lFilesClosed = lFiles is not None
+            lOption, lExplicit = None, None
+            if '=' in lToken and lToken.split('=', 1)[0] in lOptions:
+                lFlag, lExplicit = lToken.split('=', 1)
+                lOption = lOptions[lFlag]
+            elif lToken in lOptions:
+                lOption = lOptions[lToken]
+            elif lToken.startswith('--'):
+                lMatches = lCommand.prefixes.get(lToken.split('=', 1)[0], [])
+                if len(lMatches) > 1:
+                    raise DepLineParserError('ambiguous option: %s could match %s' % (lToken, ', '.join(lMatches)))
+                elif lMatches:
+                    lOption = lOptions[lMatches[0]]
+                    if '=' in lToken:
+                        lExplicit = lToken.split('=', 1)[1]
+            elif lToken[:2] in lOptions:
+                lOption = lOptions[lToken[:2]]
+                lExplicit = lToken[2:]
+
+            if lOption is None:
+                lExtras.append(lToken)
+                continue
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Flags: short ones can be chained, e.g. '-nt'
+            while not lOption.takesValue:
+                lFields[lOption.dest] = True
+                if lExplicit is None:
+                    break
+
+                if lToken[1] != '-' and ('-' + lExplicit[0]) in lOptions:
+                    lOption = lOptions['-' + lExplicit[0]]
+                    lExplicit = lExplicit[1:] or None
+                else:
+                    raise DepLineParserError('argument %s: ignored explicit argument %r' % (lOption.name, lExplicit))
 
-# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
-class ComponentAction(argparse.Action):
-    '''
-    Parses <module>:<component>
-    '''
+            if not lOption.takesValue:
+                continue
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Options with a value
+            if lExplicit is not None:
+                lValue = lExplicit
+            elif i < n and not self._isOption(aTokens[i]):
+                lValue = aTokens[i]
+                i += 1
+            else:
+                raise DepLineParserError('argument %s: expected one argument' % lOption.name)
+
+            if lOption.action == 'component':
+                lValue = self._parseComponent(lValue)
+
+            lFields[lOption.dest] = lValue
+            # --------------------------------------------------------------
 
-    def __call__(self, parser, namespace, values, option_string=None):
-        lSeparators = values.count(':')
+        if lFiles is not None:
+            lFields['file'] = lFiles
+        elif lCommand.nargs == '+':
+            raise DepLineParserError('too few arguments')
+
+        if lExtras:
+            raise DepLineParserError('unrecognized arguments: %s' % ' '.join(lExtras))
+
+        return DepLine(lFields)
+
+    @staticmethod
+    def _parseComponent(aValue):
+        '''
+        Parses <module>:<component>
+        '''
+        lTokenized = aValue.split(':')
         # Validate the format
-        if lSeparators > 1:
-            raise argparse.ArgumentTypeError(
-                'Malformed component name : %s. Expected <module>:<component>' % values)
+        if len(lTokenized) > 2:
+            raise DepLineParserError(
+                'Malformed component name : %s. Expected <module>:<component>' % aValue)
 
-        lTokenized = values.split(':')
         if len(lTokenized) == 1:
             lTokenized.insert(0, None)
 
-        setattr(namespace, self.dest, tuple(lTokenized))
+        return tuple(lTokenized)
 # ------------------------------------------------------------------------------
 
 
-# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 # ------------------------------------------------------------------------------
-class DepLineParserError(Exception):
-    pass
+class DepFilePrefetcher(object):
+    """Reads dep files ahead of the parser, on a thread pool
+
+    Every dep file read is scanned for the files it refers to: the directories they are
+    in are listed into the Pathmaker index and the dep files it includes are read in turn.
+    Conditions are not evaluated, both branches of conditional lines are prefetched.
+
+    Only the I/O is done in parallel. The parser still interprets the dep files in order,
+    one line at the time, so results and side effects of variable assignments and
+    conditional directives are the same as in the serial parsing.
+    """
+
+    # --------------------------------------------------------------
+    def __init__(self, aParser, aJobs):
+        self._parser = aParser
+        self._pathMaker = aParser.pathMaker
+        self._pool = ThreadPool(aJobs)
+        self._depFiles = {}
+        self._lock = threading.Lock()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def fetch(self, aPackage, aComponent, aDepFilePath):
+        '''Schedules the reading of a dep file, unless already done'''
+        with self._lock:
+            if aDepFilePath not in self._depFiles:
+                self._depFiles[aDepFilePath] = self._pool.apply_async(
+                    self._read, (aPackage, aComponent, aDepFilePath))
+            return self._depFiles[aDepFilePath]
+
+    def get(self, aPackage, aComponent, aDepFilePath):
+        '''Returns the (stamp, lines) of a dep file, None if it does not exist'''
+        return self.fetch(aPackage, aComponent, aDepFilePath).get()
+
+    def close(self):
+        # Speculative reads still queued are no longer needed
+        self._pool.terminate()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def _read(self, aPackage, aComponent, aDepFilePath):
+        lContent = readDepFile(aDepFilePath)
+        if lContent is not None:
+            try:
+                self._scan(aPackage, aComponent, lContent[1])
+            except Exception:
+                # Prefetching is speculative, errors are left to the parser
+                pass
+        return lContent
+
+    def _scan(self, aPackage, aComponent, aLines):
+        lListed = set()
+        for lLine in aLines:
+            lLine = lLine.strip()
+            if lLine == "" or lLine[0] in "#@":
+                continue
+
+            if lLine[0] == "?":
+                lLine = lLine[lLine.find("?", 1) + 1:]
+
+            try:
+                lParsedLine = self._parser.parseLine(lLine.split())
+                lPackage, lComponent = lParsedLine.component
+            except DepLineParserError:
+                # Reported by the parser, if the line is ever used
+                continue
+
+            lPackage = aPackage if lPackage is None else lPackage
+            lComponent = aComponent if lComponent is None else lComponent
+
+            if lParsedLine.file:
+                lFileExprList = lParsedLine.file
+            else:
+                lFileExprList = [self._pathMaker.getDefName(lParsedLine.cmd, lComponent.split('/')[-1])]
+
+            for lFileExpr in lFileExprList:
+                if lParsedLine.cmd != "include":
+                    # Warm up the index, matching is left to the parser
+                    lDirKey = (lPackage, lComponent, lParsedLine.cmd, lParsedLine.cd, os.path.dirname(lFileExpr))
+                    if lDirKey not in lListed:
+                        lListed.add(lDirKey)
+                        self._pathMaker.listDirs(self._pathMaker.getPath(
+                            lPackage, lComponent, lParsedLine.cmd, lFileExpr, cd=lParsedLine.cd))
+                    continue
+
+                _, lFileList = self._pathMaker.glob(lPackage, lComponent, lParsedLine.cmd, lFileExpr, cd=lParsedLine.cd)
+                for lFile, _ in lFileList:
+                    self.fetch(lPackage, lComponent, self._pathMaker.getPath(lPackage, lComponent, 'include', lFile))
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
 
 
-class DepLineParser(argparse.ArgumentParser):
-    def error(self, message):
-        raise DepLineParserError(message)
+# ------------------------------------------------------------------------------
+def readDepFile(aDepFilePath):
+    '''Returns the stamp and the lines of a dep file, None if it does not exist'''
+    if not exists(aDepFilePath):
+        return None
+
+    with open(aDepFilePath) as lDepFile:
+        # Stamp the file before reading it, later changes will be detected
+        return stamp(lDepFile.fileno()), lDepFile.readlines()
 # ------------------------------------------------------------------------------
 
 
 class DepFileParser(object):
+    """Parser of dependency trees
+
+    Parse modes, each one producing the results of the previous ones:
+     - 'includes': variables and include tree; other commands are not expanded.
+     - 'structure': also components and missing entries; no commands are built.
+     - 'counts': also libraries and commands.
+     - 'full': complete commands, maps, include tree contents and reverse dependencies.
+    """
+
+    modes = ('includes', 'structure', 'counts', 'full')
+
     # ----------------------------------------------------------------------------------------------------------------------------
-    def __init__(self, aToolSet, aPathmaker, aVariables={}, aVerbosity=0):
+    def __init__(self, aToolSet, aPathmaker, aVariables={}, aVerbosity=0, aJobs=1, aProfile=False, aMemo=None, aMode='full'):
         # --------------------------------------------------------------
         # Member variables
         self._toolset = aToolSet
-        self._depth = 0
-        self._includes = None
         self._verbosity = aVerbosity
-        self._revDepMap = {}
+        self._userVars = {}
+        self._initialVars = {}
+        # Records of the parsed dep files, by (package, component, dep file). Parsers
+        # of the same source area can share them, to parse common dep files once.
+        self._memo = aMemo if aMemo is not None else {}
+        self._jobs = aJobs
+        self._prefetcher = None
+
+        # Measurements of the last parse, when profiling
+        self.profiler = DepFileProfiler() if aProfile else None
+
+        if aMode not in self.modes:
+            raise ValueError("Unknown parse mode '{0}', expected one of {1}".format(aMode, ', '.join(self.modes)))
+        self.mode = aMode
+        self._level = self.modes.index(aMode)
 
         self.pathMaker = aPathmaker
-
-        self.vars = {}
-        self.commands = {'setup': [], 'src': [], 'addrtab': [], 'iprepo': []}
-        self.libs = list()
-        self.maps = list()
-        self.components = OrderedDict()
-
-        self.missing = list()
         # --------------------------------------------------------------
 
         # --------------------------------------------------------------
         # Add to or override the Script Variables with user commandline
         for lArgs in aVariables:
             lKey, lVal = lArgs.split('=')
-            self.vars[lKey] = lVal
+            self._userVars[lKey] = lVal
+            self._initialVars[lKey] = lVal
         # --------------------------------------------------------------
 
         # --------------------------------------------------------------
         # Set the toolset
         if self._toolset == 'xtclsh':
-            self.vars['toolset'] = 'ISE'
+            self._initialVars['toolset'] = 'ISE'
         elif self._toolset == 'vivado':
-            self.vars['toolset'] = 'Vivado'
+            self._initialVars['toolset'] = 'Vivado'
         elif self._toolset == 'sim':
-            self.vars['toolset'] = 'Modelsim'
+            self._initialVars['toolset'] = 'Modelsim'
         else:
-            self.vars['toolset'] = 'other'
+            self._initialVars['toolset'] = 'other'
         # --------------------------------------------------------------
 
-        # --------------------------------------------------------------
-        # Special options
-        lCompArgOpts = dict(action=ComponentAction, default=(None, None))
-        # --------------------------------------------------------------
+        self.reset()
 
         # --------------------------------------------------------------
         # Set up the parser
-        parser = DepLineParser(usage=argparse.SUPPRESS)
-        parser_add = parser.add_subparsers(dest="cmd")
-        subp = parser_add.add_parser("include")
-        subp.add_argument("-c", "--component", **lCompArgOpts)
-        subp.add_argument("--cd")
-        subp.add_argument("file", nargs="*")
-        subp = parser_add.add_parser("setup")
-        subp.add_argument("-c", "--component", **lCompArgOpts)
-        subp.add_argument("-z", "--coregen", action="store_true")
-        subp.add_argument("--cd")
-        subp.add_argument("file", nargs="*")
-        subp = parser_add.add_parser("src")
-        subp.add_argument("-c", "--component", **lCompArgOpts)
-        subp.add_argument("-l", "--lib")
-        subp.add_argument("-m", "--map")
-        # subp.add_argument("-g", "--generated" , action = "store_true") #
+        parser = DepLineParser()
+        subp = parser.addCommand("include")
+        subp.addOption("-c", "--component", action="component")
+        subp.addOption("--cd")
+        subp = parser.addCommand("setup")
+        subp.addOption("-c", "--component", action="component")
+        subp.addOption("-z", "--coregen", action="store_true")
+        subp.addOption("--cd")
+        subp = parser.addCommand("src", nargs="+")
+        subp.addOption("-c", "--component", action="component")
+        subp.addOption("-l", "--lib")
+        subp.addOption("-m", "--map")
+        # subp.addOption("-g", "--generated" , action = "store_true") #
         # TODO: Check if still used in Vivado
-        subp.add_argument("-n", "--noinclude", action="store_true")
-        subp.add_argument("--cd")
-        subp.add_argument("file", nargs="+")
-        subp.add_argument("--vhdl2008", action="store_true")
-        subp = parser_add.add_parser("addrtab")
-        subp.add_argument("-c", "--component", **lCompArgOpts)
-        subp.add_argument("--cd")
-        subp.add_argument("-t", "--toplevel", action="store_true")
-        subp.add_argument("file", nargs="*")
-        subp = parser_add.add_parser("iprepo")
-        subp.add_argument("-c", "--component", **lCompArgOpts)
-        subp.add_argument("--cd")
-        subp.add_argument("file", nargs="*")
+        subp.addOption("-n", "--noinclude", action="store_true")
+        subp.addOption("--cd")
+        subp.addOption("--vhdl2008", action="store_true")
+        subp = parser.addCommand("addrtab")
+        subp.addOption("-c", "--component", action="component")
+        subp.addOption("--cd")
+        subp.addOption("-t", "--toplevel", action="store_true")
+        subp = parser.addCommand("iprepo")
+        subp.addOption("-c", "--component", action="component")
+        subp.addOption("--cd")
         # map parser method to self
-        self.parseLine = parser.parse_args
+        self.parseLine = parser.parse
         # --------------------------------------------------------------
     # ----------------------------------------------------------------------------------------------------------------------------
 
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def reset(self):
+        '''Clears the parsing results
+
+        The records of the dep files parsed so far are kept, and reused by the next parsing
+        unless invalidated.
+        '''
+        self._depth = 0
+        self._includes = None
+        self._revDepMap = {}
+        self._stamps = {}
+        self._recording = []
+        self._componentLog = []
+        self._revDepLog = []
+        self._revDepIndex = None
+        self._tree = None
+        self._missingReportCache = None
+        if self.profiler is not None:
+            self.profiler = DepFileProfiler()
+
+        self.vars = dict(self._initialVars)
+        self.commands = {'setup': [], 'src': [], 'addrtab': [], 'iprepo': []}
+        self.libs = list()
+        self.maps = list()
+        self.components = OrderedDict()
+
+        self.missing = list()
+    # ----------------------------------------------------------------------------------------------------------------------------
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def changedPaths(self):
+        '''Returns the dep files and directories that changed since they were parsed'''
+        return [lPath for lPath, lStamp in self._stamps.iteritems() if stamp(lPath) != lStamp]
+
+    def invalidate(self, aPaths):
+        '''Forgets the records of the dep files depending on any of aPaths
+
+        Returns:
+            int: number of records dropped
+        '''
+        lPaths = frozenset(aPaths)
+        lDropped = 0
+        for lKey in list(self._memo):
+            lRecords = [r for r in self._memo[lKey] if lPaths.isdisjoint(r.stamps)]
+            lDropped += len(self._memo[lKey]) - len(lRecords)
+            if lRecords:
+                self._memo[lKey] = lRecords
+            else:
+                del self._memo[lKey]
+        return lDropped
+
+    def refresh(self, aPackage, aComponent, aDepFileName):
+        '''Brings the parsing results up to date with the dep files on disk
+
+        Only the dep files depending on changed files or directories are parsed again,
+        the others are spliced in from their records.
+
+        Returns:
+            list: the paths that changed
+        '''
+        lChanged = self.changedPaths()
+        self.invalidate(lChanged)
+        self.reset()
+        self.parse(aPackage, aComponent, aDepFileName)
+        return lChanged
+    # ----------------------------------------------------------------------------------------------------------------------------
+
     # ----------------------------------------------------------------------------------------------------------------------------
     def __str__(self):
         string = ''
@@ -292,20 +824,52 @@ class DepFileParser(object):
     # ----------------------------------------------------------------------------------------------------------------------------
     @property
     def missingPaths(self):
-        lNotFound = set()
+        return self._missingReport()[0]
+    # ----------------------------------------------------------------------------------------------------------------------------
 
-        for lPathExpr, aCmd, lPackage, lComponent, lDepFilePath in self.missing:
-            lNotFound.add(lPathExpr)
+    # ----------------------------------------------------------------------------------------------------------------------------
+    @property
+    def missingFiles(self):
+        return self._missingReport()[1]
+    # ----------------------------------------------------------------------------------------------------------------------------
 
-        return lNotFound
+    # ----------------------------------------------------------------------------------------------------------------------------
+    @property
+    def missingComponents(self):
+        return self._missingReport()[2]
     # ----------------------------------------------------------------------------------------------------------------------------
 
     # ----------------------------------------------------------------------------------------------------------------------------
     @property
-    def missingFiles(self):
-        lNotFound = OrderedDict()
+    def missingPackages(self):
+        return self._missingReport()[3]
+    # ----------------------------------------------------------------------------------------------------------------------------
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def _missingReport(self):
+        '''Missing paths, files, components and packages, classified once per parse
+
+        Each package and component directory is checked once, however many missing
+        entries refer to it.
+        '''
+        if self._missingReportCache is not None:
+            return self._missingReportCache
+
+        lPaths = set()
+        lFiles = OrderedDict()
+        lComponents = OrderedDict()
+        lPackages = set()
+
+        lExists = {}
+        def exists(aPath):
+            if aPath not in lExists:
+                lExists[aPath] = os.path.exists(aPath)
+            return lExists[aPath]
+
         for lPathExpr, aCmd, lPackage, lComponent, lDepFilePath in self.missing:
-            lNotFound.setdefault(
+            lPaths.add(lPathExpr)
+
+            lFiles.setdefault(
                 lPackage,
                 OrderedDict()
             ).setdefault(
@@ -316,34 +880,145 @@ class DepFileParser(object):
                 set()
             ).add(lDepFilePath)
 
-        return lNotFound
+            if not exists(self.pathMaker.getPath(lPackage, lComponent)):
+                lComponents.setdefault(lPackage, set()).add(lComponent)
+
+            if not exists(self.pathMaker.getPath(lPackage)):
+                lPackages.add(lPackage)
+
+        self._missingReportCache = (lPaths, lFiles, lComponents, lPackages)
+        return self._missingReportCache
     # ----------------------------------------------------------------------------------------------------------------------------
 
     # ----------------------------------------------------------------------------------------------------------------------------
     @property
-    def missingComponents(self):
-        lNotFound = OrderedDict()
+    def revDeps(self):
+        '''Reverse dependency index of the parsed tree, built on first use'''
+        if self._revDepIndex is None:
+            self._revDepIndex = RevDepIndex(self)
+        return self._revDepIndex
 
-        for lPathExpr, aCmd, lPackage, lComponent, lDepFilePath in self.missing:
-            if os.path.exists(self.pathMaker.getPath(lPackage, lComponent)):
-                continue
+    @property
+    def tree(self):
+        '''Flattened include tree of the parse, for subtree queries, built on first use'''
+        if self._tree is None:
+            self._tree = DepTree(self)
+        return self._tree
+    # ----------------------------------------------------------------------------------------------------------------------------
 
-            lNotFound.setdefault(lPackage, set()).add(lComponent)
+    # ----------------------------------------------------------------------------------------------------------------------------
+    @property
+    def stamps(self):
+        '''Status stamps of dep files and directories the parse depends on
+        
+        Stamps are taken the first time a path is read, globbed or found missing.
+        Comparing them with fresh stamps tells whether the parse results are still valid.
+        '''
+        return self._stamps
+    # ----------------------------------------------------------------------------------------------------------------------------
 
-        return lNotFound
     # ----------------------------------------------------------------------------------------------------------------------------
+    def _stamp(self, aPath, aStamp=_kUndefined):
+        if aPath not in self._stamps:
+            self._stamps[aPath] = stamp(aPath) if aStamp is _kUndefined else aStamp
 
+        # The dep file being parsed depends on this path
+        if self._recording:
+            self._recording[-1].stamps[aPath] = self._stamps[aPath]
+
+    def _stampDirs(self, aPathExpr):
+        for lDir in self.pathMaker.globDirs(aPathExpr):
+            self._stamp(lDir)
     # ----------------------------------------------------------------------------------------------------------------------------
-    @property
-    def missingPackages(self):
-        lNotFound = set()
 
-        for lPathExpr, aCmd, lPackage, lComponent, lDepFilePath in self.missing:
-            if os.path.exists(self.pathMaker.getPath(lPackage)):
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def _readVars(self, aNames):
+        # Remember the values variables had when the dep files being parsed first looked at them
+        for lRecord in self._recording:
+            for lName in aNames:
+                if lName not in lRecord.writes and lName not in lRecord.reads:
+                    lRecord.reads[lName] = self.vars.get(lName, _kUndefined)
+
+    def _writeVars(self, aNames):
+        for lRecord in self._recording:
+            for lName in aNames:
+                if lName in self.vars:
+                    lRecord.writes[lName] = self.vars[lName]
+
+    def _warn(self, aMessage):
+        print(aMessage)
+        for lRecord in self._recording:
+            lRecord.warnings.append(aMessage)
+    # ----------------------------------------------------------------------------------------------------------------------------
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def _startRecord(self, aKey, aDepFilePath):
+        lRecord = DepFileRecord(aKey, self.mode, aDepFilePath, self._includes)
+        lRecord._offsets = (
+            dict((lCmd, len(lCmds)) for lCmd, lCmds in self.commands.iteritems()),
+            len(self.libs),
+            len(self.maps),
+            len(self.missing),
+            len(self._componentLog),
+            len(self._revDepLog),
+        )
+        self._recording.append(lRecord)
+        return lRecord
+
+    def _closeRecord(self, aRecord):
+        self._recording.pop()
+        if self._recording:
+            self._recording[-1].stamps.update(aRecord.stamps)
+
+        lCommands, lLibs, lMaps, lMissing, lComponents, lRevDeps = aRecord._offsets
+        aRecord.commands = dict((lCmd, self.commands[lCmd][lCommands[lCmd]:]) for lCmd in self.commands)
+        aRecord.libs = self.libs[lLibs:]
+        aRecord.maps = self.maps[lMaps:]
+        aRecord.missing = self.missing[lMissing:]
+        aRecord.componentLog = self._componentLog[lComponents:]
+        aRecord.revDepLog = self._revDepLog[lRevDeps:]
+        aRecord._offsets = None
+
+        self._memo.setdefault(aRecord.key, []).append(aRecord)
+
+    def _recall(self, aKey):
+        for lRecord in self._memo.get(aKey, []):
+            # Records of other modes hold other kinds of results
+            if lRecord.mode != self.mode:
                 continue
+            if all(self.vars.get(lName, _kUndefined) == lValue for lName, lValue in lRecord.reads.iteritems()):
+                return lRecord
+        return None
 
-            lNotFound.add(lPackage)
-        return lNotFound
+    def _replay(self, aRecord):
+        if self._verbosity > 1:
+            print('>' * (self._depth + 1), 'Reusing', *aRecord.key)
+
+        # Let the dep files being parsed know what the replayed ones depend on
+        self._readVars(aRecord.reads)
+        self.vars.update(aRecord.writes)
+        self._writeVars(aRecord.writes)
+        for lWarning in aRecord.warnings:
+            self._warn(lWarning)
+        for lPath, lStamp in aRecord.stamps.iteritems():
+            self._stamp(lPath, lStamp)
+
+        for lCmd, lCmds in aRecord.commands.iteritems():
+            self.commands[lCmd].extend(lCmds)
+        self.libs.extend(aRecord.libs)
+        self.maps.extend(aRecord.maps)
+        self.missing.extend(aRecord.missing)
+        for lPackage, lComponent in aRecord.componentLog:
+            self.components.setdefault(lPackage, []).append(lComponent)
+        self._componentLog.extend(aRecord.componentLog)
+        for lFilePath, lDepFilePath in aRecord.revDepLog:
+            self._revDepMap.setdefault(lFilePath, []).append(lDepFilePath)
+        self._revDepLog.extend(aRecord.revDepLog)
+
+        if self._depth != 0:
+            self._includes.commands.append(aRecord.node)
+        else:
+            self._includes = aRecord.node
     # ----------------------------------------------------------------------------------------------------------------------------
 
     # ----------------------------------------------------------------------------------------------------------------------------
@@ -352,217 +1027,340 @@ class DepFileParser(object):
         Parses a dependency file from package aPackage/aComponent
         '''
         # --------------------------------------------------------------
-        # We have gone one layer further down the rabbit hole        
+        lDepFilePath = self.pathMaker.getPath(
+            aPackage, aComponent, 'include', aDepFileName)
+
+        # Directory listings are collected afresh at every parsing
+        lTopLevel = (self._depth == 0)
+        if lTopLevel:
+            self.pathMaker.resetIndex()
+            if self._jobs > 1:
+                self._prefetcher = DepFilePrefetcher(self, self._jobs)
+
+        # Refuse to go round in circles
+        lChain = [lRecord.path for lRecord in self._recording]
+        if lDepFilePath in lChain:
+            raise RuntimeError("Include cycle detected:\n  " + "\n  -> ".join(
+                lChain[lChain.index(lDepFilePath):] + [lDepFilePath]))
+        # --------------------------------------------------------------
+
+        # --------------------------------------------------------------
+        # Dep files included more than once are parsed only the first time,
+        # as long as the variables they use keep the same values
+        if self.profiler:
+            self.profiler.enter(lDepFilePath)
+        lRecord = None
+        try:
+            lRecord = self._recall((aPackage, aComponent, aDepFileName))
+            if lRecord is not None:
+                self._replay(lRecord)
+            else:
+                self._parseDepFile(aPackage, aComponent, aDepFileName, lDepFilePath)
+        finally:
+            if self.profiler:
+                self.profiler.exit(lRecord is not None)
+            if lTopLevel and self._prefetcher is not None:
+                self._prefetcher.close()
+                self._prefetcher = None
+        # --------------------------------------------------------------
+
+        # --------------------------------------------------------------
+        # If we are exiting the top-level, uniquify the commands list, keeping
+        # the order as defined in Dave's origianl voodoo
+        if self._depth == 0:
+            for i in self.commands:
+                lTemp = list()
+                lAdded = set()
+                for j in reversed(self.commands[i]):
+                    if j not in lAdded:
+                        lTemp.append(j)
+                        lAdded.add(j)
+                lTemp.reverse()
+                self.commands[i] = lTemp
+
+            # If we are exiting the top-level, uniquify the component list
+            for lPkg in self.components:
+                self.components[lPkg] = list(OrderedDict.fromkeys(self.components[lPkg]))
+
+            # Classify the missing entries once, rather than at every access
+            self._missingReportCache = None
+            self._missingReport()
+
+            if self._verbosity > 0:
+                print('+++ Pathmaker index: {listdir} directory listings, {stat} stat calls'.format(**self.pathMaker.syscalls))
+        # --------------------------------------------------------------
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def _readDepFile(self, aPackage, aComponent, aDepFilePath):
+        '''Returns the lines of a dep file, None if it does not exist'''
+        if self._prefetcher is not None:
+            lContent = self._prefetcher.get(aPackage, aComponent, aDepFilePath)
+        else:
+            lContent = readDepFile(aDepFilePath)
+
+        if lContent is None:
+            return None
+
+        lStamp, lLines = lContent
+        self._stamp(aDepFilePath, lStamp)
+        return lLines
+    # ----------------------------------------------------------------------------------------------------------------------------
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    def _parseDepFile(self, aPackage, aComponent, aDepFileName, aDepFilePath):
+        lDepFilePath = aDepFilePath
+
+        # --------------------------------------------------------------
+        # We have gone one layer further down the rabbit hole
         lParentInclude = self._includes if self._depth != 0 else None
 
         self._includes = DepFile(aPackage, aComponent, aDepFileName)
         self._depth += 1
+
+        lRecord = self._startRecord((aPackage, aComponent, aDepFileName), lDepFilePath)
         # --------------------------------------------------------------
         if self._verbosity > 1:
             print('>' * self._depth, 'Parsing',
                   aPackage, aComponent, aDepFileName)
 
-        # --------------------------------------------------------------
-        lDepFilePath = self.pathMaker.getPath(
-            aPackage, aComponent, 'include', aDepFileName)
-        # --------------------------------------------------------------
-
-
-        if not exists(lDepFilePath):
+        lDepFile = self._readDepFile(aPackage, aComponent, lDepFilePath)
+        if lDepFile is None:
+            self._stampDirs(lDepFilePath)
             self.missing.append(
                 (lDepFilePath, 'include', aPackage, aComponent, lDepFilePath))
             raise OSError("File "+lDepFilePath+" does not exist")
 
-        with open(lDepFilePath) as lDepFile:
-            for lLineNum, lLine in enumerate(lDepFile):
+        lProfile = self.profiler.current if self.profiler else None
+        if lProfile:
+            lProfile.lines = len(lDepFile)
 
-                lLine = lLine.strip()
-                # --------------------------------------------------------------
-                # Ignore blank lines and comments
-                if lLine == "" or lLine[0] == "#":
-                    continue
-                # --------------------------------------------------------------
+        for lLineNum, lLine in enumerate(lDepFile):
 
-                # --------------------------------------------------------------
-                # Process the assignment directive
-                if lLine[0] == "@":
-                    lTokenized = lLine[1:].split("=")
-                    if len(lTokenized) != 2:
-                        raise SystemExit("@ directives must be key=value pairs. Found '{0}' in {1}".format(
-                            lLine, aDepFileName))
-                    if lTokenized[0].strip() in self.vars:
-                        print("Warning!", lTokenized[0].strip(
-                        ), "already defined. Not redefining.")
-                    else:
-                        try:
-                            exec(lLine[1:], None, self.vars)
-                        except:
-                            raise SystemExit(
-                                "Parsing directive failed in {0} , line '{1}'".format(aDepFileName, lLine))
-                    continue
-                # --------------------------------------------------------------
+            lLine = lLine.strip()
+            # --------------------------------------------------------------
+            # Ignore blank lines and comments
+            if lLine == "" or lLine[0] == "#":
+                continue
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Process the assignment directive
+            if lLine[0] == "@":
+                lTokenized = lLine[1:].split("=")
+                if len(lTokenized) != 2:
+                    raise SystemExit("@ directives must be key=value pairs. Found '{0}' in {1}".format(
+                        lLine, aDepFileName))
+                if lProfile:
+                    lEvalStart = time.time()
+                try:
+                    lExpr = compileDirective(lLine[1:], 'assign')
+                    self._readVars(lExpr.names)
 
-                # --------------------------------------------------------------
-                # Process the conditional directive
-                if lLine[0] == "?":
-                    lTokens = [i for i, letter in enumerate(
-                        lLine) if letter == "?"]
-                    if len(lTokens) != 2:
-                        raise SystemExit(
-                            "There must be precisely two '?' tokens per line. Found {0} in {1} , line '{2}'".format(
-                                len(lTokens), aDepFileName, lLine
-                            )
+                    if lExpr.target in self.vars:
+                        self._warn("Warning! {0} already defined. Not redefining.".format(lExpr.target))
+                    else:
+                        self.vars[lExpr.target] = lExpr(self.vars)
+                        self._writeVars(lExpr.names)
+                except DepExpressionError as e:
+                    raise SystemExit(
+                        "Parsing directive failed in {0}:{1} , line '{2}': {3}".format(lDepFilePath, lLineNum + 1, lLine, e))
+                if lProfile:
+                    lProfile.eval += time.time() - lEvalStart
+                continue
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Process the conditional directive
+            if lLine[0] == "?":
+                lTokens = [i for i, letter in enumerate(
+                    lLine) if letter == "?"]
+                if len(lTokens) != 2:
+                    raise SystemExit(
+                        "There must be precisely two '?' tokens per line. Found {0} in {1} , line '{2}'".format(
+                            len(lTokens), aDepFileName, lLine
                         )
+                    )
 
-                    try:
-                        lExprValue = eval(
-                            lLine[lTokens[0] + 1: lTokens[1]], None, self.vars)
-                    except:
-                        raise SystemExit(
-                            "Parsing directive failed in {0} , line '{1}'".format(aDepFileName, lLine))
+                if lProfile:
+                    lEvalStart = time.time()
+                try:
+                    lExpr = compileDirective(lLine[lTokens[0] + 1: lTokens[1]], 'eval')
+                    self._readVars(lExpr.names)
+                    lExprValue = lExpr(self.vars)
+                except DepExpressionError as e:
+                    raise SystemExit(
+                        "Parsing directive failed in {0}:{1} , line '{2}': {3}".format(lDepFilePath, lLineNum + 1, lLine, e))
+                if lProfile:
+                    lProfile.eval += time.time() - lEvalStart
+
+                if not isinstance(lExprValue, bool):
+                    raise SystemExit("Directive does not evaluate to boolean type in {0}:{1} , line '{2}'".format(
+                        lDepFilePath, lLineNum + 1, lLine))
+
+                if not lExprValue:
+                    continue
 
-                    if not isinstance(lExprValue, bool):
-                        raise SystemExit("Directive does not evaluate to boolean type in {0} , line '{1}'".format(
-                            aDepFileName, lLine))
+                # if line is accepted, strip the conditionality from the
+                # front and carry on
+                lLine = lLine[lTokens[1] + 1:].strip()
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Parse the line using arg_parse
+            try:
+                lParsedLine = self.parseLine(lLine.split())
+            except DepLineParserError as e:
+                lMsg = "Error caught while parsine line {0} in file {1}".format(lLineNum,lDepFilePath) + "\n"
+                lMsg += "Details - " + str(e) + ": '" + lLine + "'"
+                raise RuntimeError(lMsg)
+
+            if self._verbosity > 1:
+                print(' ' * self._depth, '- Parsed line', vars(lParsedLine))
+            # --------------------------------------------------------------
+
+            # Lighter parse modes skip what they do not need
+            if lParsedLine.cmd != 'include' and self._level < 1:
+                continue
 
-                    if not lExprValue:
-                        continue
+            # --------------------------------------------------------------
+            # Set package and module variables, whether specified or not
+            lPackage, lComponent = lParsedLine.component
+
+            # --------------------------------------------------------------
+            # Set package and component to current ones if not defined
+            if lPackage is None:
+                lPackage = aPackage
+
+            if lComponent is None:
+                lComponent = aComponent
+
+            # They are repeated in every command, share a single copy
+            lPackage = _intern(lPackage)
+            lComponent = _intern(lComponent)
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Set the target file expression, whether specified explicitly
+            # or not
+            if (not lParsedLine.file):
+                lComponentName = lComponent.split('/')[-1]
+                lFileExprList = [self.pathMaker.getDefName(
+                    lParsedLine.cmd, lComponentName)]
+            else:
+                lFileExprList = lParsedLine.file
+            # --------------------------------------------------------------
+
+            # --------------------------------------------------------------
+            # Expand file espression into a list of files
+            lFileLists = []
+            for lFileExpr in lFileExprList:
+                if lProfile:
+                    lGlobStart = time.time()
+
+                # Stamp the directories the expression is going to be matched against
+                self._stampDirs(self.pathMaker.getPath(
+                    lPackage, lComponent, lParsedLine.cmd, lFileExpr, cd=lParsedLine.cd))
+
+                # Expand file expression
+                lPathExpr, lFileList = self.pathMaker.glob(
+                    lPackage, lComponent, lParsedLine.cmd, lFileExpr, cd=lParsedLine.cd)
+
+                if lProfile:
+                    self.profiler.glob(lPathExpr, time.time() - lGlobStart, len(lFileList))
 
-                    # if line is accepted, strip the conditionality from the
-                    # front and carry on
-                    lLine = lLine[lTokens[1] + 1:].strip()
                 # --------------------------------------------------------------
+                # Store the result and move on
+                if lFileList:
+                    lFileLists.append(lFileList)
 
-                # --------------------------------------------------------------
-                # Parse the line using arg_parse
-                try:
-                    lParsedLine = self.parseLine(lLine.split())
-                except DepLineParserError as e:
-                    lMsg = "Error caught while parsine line {0} in file {1}".format(lLineNum,lDepFilePath) + "\n"
-                    lMsg += "Details - " + e.message + ": '" + lLine + "'"
-                    raise RuntimeError(lMsg)
-
-                if self._verbosity > 1:
-                    print(' ' * self._depth, '- Parsed line', vars(lParsedLine))
-                # --------------------------------------------------------------
+                    self.components.setdefault(
+                        lPackage, []).append(lComponent)
+                    self._componentLog.append((lPackage, lComponent))
 
-                # --------------------------------------------------------------
-                # Set package and module variables, whether specified or not
-                lPackage, lComponent = lParsedLine.component
+                else:
+                    # Something's off, no files found
+                    self.missing.append(
+                        (lPathExpr, lParsedLine.cmd, lPackage, lComponent, lDepFilePath))
 
+                    self._includes.commands.append((lPathExpr, lParsedLine.cmd, lPackage, lComponent, lDepFilePath))
                 # --------------------------------------------------------------
-                # Set package and component to current ones if not defined
-                if lPackage is None:
-                    lPackage = aPackage
+            # --------------------------------------------------------------
 
-                if lComponent is None:
-                    lComponent = aComponent
-                # --------------------------------------------------------------
+            # --------------------------------------------------------------
+            # If an include command, parse the specified dep files
+            if lParsedLine.cmd == "include":
+                for lFileList in lFileLists:
+                    for lFile, lFilePath in lFileList:
+                        self.parse(lPackage, lComponent, lFile)
 
+            elif self._level >= 2:
                 # --------------------------------------------------------------
-                # Set the target file expression, whether specified explicitly
+                # Set some processing flags, whether specified explicitly
                 # or not
-                if (not lParsedLine.file):
-                    lComponentName = lComponent.split('/')[-1]
-                    lFileExprList = [self.pathMaker.getDefName(
-                        lParsedLine.cmd, lComponentName)]
+                if 'noinclude' in lParsedLine:
+                    lInclude = not lParsedLine.noinclude
                 else:
-                    lFileExprList = lParsedLine.file
-                # --------------------------------------------------------------
+                    lInclude = True
 
+                if 'toplevel' in lParsedLine:
+                    lTopLevel = lParsedLine.toplevel
+                else:
+                    lTopLevel = False
                 # --------------------------------------------------------------
-                # Expand file espression into a list of files
-                lFileLists = []
-                for lFileExpr in lFileExprList:
-                    # Expand file expression
-                    lPathExpr, lFileList = self.pathMaker.glob(
-                        lPackage, lComponent, lParsedLine.cmd, lFileExpr, cd=lParsedLine.cd)
-
-                    # --------------------------------------------------------------
-                    # Store the result and move on
-                    if lFileList:
-                        lFileLists.append(lFileList)
 
-                        self.components.setdefault(
-                            lPackage, []).append(lComponent)
-
-                    else:
-                        # Something's off, no files found
-                        self.missing.append(
-                            (lPathExpr, lParsedLine.cmd, lPackage, lComponent, lDepFilePath))
-
-                        self._includes.commands.append((lPathExpr, lParsedLine.cmd, lPackage, lComponent, lDepFilePath))
-                    # --------------------------------------------------------------
                 # --------------------------------------------------------------
-
+                # Set the target library, whether specified explicitly or
+                # not
+                if ('lib' in lParsedLine) and (lParsedLine.lib):
+                    lLib = _intern(lParsedLine.lib)
+                    self.libs.append(lLib)
+                else:
+                    lLib = None
                 # --------------------------------------------------------------
-                # If an include command, parse the specified dep files
-                if lParsedLine.cmd == "include":
-                    for lFileList in lFileLists:
-                        for lFile, lFilePath in lFileList:
-                            self.parse(lPackage, lComponent, lFile)
 
+                # --------------------------------------------------------------
+                # Specifies the files should be read as VHDL 2008
+                if lParsedLine.cmd == 'src' or lParsedLine.cmd == 'include' in lParsedLine:
+                    lVhdl2008 = lParsedLine.vhdl2008
                 else:
-                    # --------------------------------------------------------------
-                    # Set some processing flags, whether specified explicitly
-                    # or not
-                    if 'noinclude' in lParsedLine:
-                        lInclude = not lParsedLine.noinclude
-                    else:
-                        lInclude = True
-
-                    if 'toplevel' in lParsedLine:
-                        lTopLevel = lParsedLine.toplevel
-                    else:
-                        lTopLevel = False
-                    # --------------------------------------------------------------
+                    lVhdl2008 = False
+                # --------------------------------------------------------------
 
-                    # --------------------------------------------------------------
-                    # Set the target library, whether specified explicitly or
-                    # not
-                    if ('lib' in lParsedLine) and (lParsedLine.lib):
-                        lLib = lParsedLine.lib
-                        self.libs.append(lLib)
-                    else:
-                        lLib = None
-                    # --------------------------------------------------------------
+                # Counting needs the commands alone
+                lFull = self._level >= 3
 
-                    # --------------------------------------------------------------
-                    # Specifies the files should be read as VHDL 2008
-                    if lParsedLine.cmd == 'src' or lParsedLine.cmd == 'include' in lParsedLine:
-                        lVhdl2008 = lParsedLine.vhdl2008
-                    else:
-                        lVhdl2008 = False
-                    # --------------------------------------------------------------
+                for lFileList in lFileLists:
+                    for lFile, lFilePath in lFileList:
+                        # --------------------------------------------------------------
+                        # Debugging
+                        if self._verbosity > 0:
+                            print(' ' * self._depth, ':',
+                                  lParsedLine.cmd, lFile, lFilePath)
+                        # --------------------------------------------------------------
 
-                    for lFileList in lFileLists:
-                        for lFile, lFilePath in lFileList:
-                            # --------------------------------------------------------------
-                            # Debugging
-                            if self._verbosity > 0:
-                                print(' ' * self._depth, ':',
-                                      lParsedLine.cmd, lFile, lFilePath)
-                            # --------------------------------------------------------------
-
-                            # --------------------------------------------------------------
-                            # Map to any generated libraries
-                            if ('map' in lParsedLine) and (lParsedLine.map):
-                                lMap = lParsedLine.map
+                        # --------------------------------------------------------------
+                        # Map to any generated libraries
+                        if ('map' in lParsedLine) and (lParsedLine.map):
+                            lMap = _intern(lParsedLine.map)
+                            if lFull:
                                 self.maps.append((lMap, lFilePath))
-                            else:
-                                lMap = None
-                            # --------------------------------------------------------------
-
-                            self.commands[lParsedLine.cmd].append(Command(
-                                lFilePath, lPackage, lComponent, lMap, lInclude, lInclude, lTopLevel, lVhdl2008
-                            ))
+                        else:
+                            lMap = None
+                        # --------------------------------------------------------------
 
-                            self._includes.commands.append(Command(
-                                lFilePath, lPackage, lComponent, lMap, lInclude, lInclude, lTopLevel, lVhdl2008
-                            ))
+                        lCommand = Command(
+                            lFilePath, lPackage, lComponent, lMap, lInclude, lInclude, lTopLevel, lVhdl2008, lParsedLine.cmd
+                        )
+                        self.commands[lParsedLine.cmd].append(lCommand)
+                        if not lFull:
+                            continue
+                        self._includes.commands.append(lCommand)
 
-                            self._revDepMap.setdefault(lFilePath, []).append(lDepFilePath)
-                        # --------------------------------------------------------------
+                        self._revDepMap.setdefault(lFilePath, []).append(lDepFilePath)
+                        self._revDepLog.append((lFilePath, lDepFilePath))
+                    # --------------------------------------------------------------
 
         # --------------------------------------------------------------
 
@@ -574,29 +1372,8 @@ class DepFileParser(object):
         if lParentInclude:
             lParentInclude.commands.append(self._includes)
             self._includes = lParentInclude
-        # --------------------------------------------------------------
-
-        # --------------------------------------------------------------
-        # If we are exiting the top-level, uniquify the commands list, keeping
-        # the order as defined in Dave's origianl voodoo
-        if self._depth == 0:
-            for i in self.commands:
-                lTemp = list()
-                for j in reversed(self.commands[i]):
-                    if j not in lTemp:
-                        lTemp.append(j)
-                lTemp.reverse()
-                self.commands[i] = lTemp
 
-            # If we are exiting the top-level, uniquify the component list
-            for lPkg in self.components:
-                lTemp = list()
-                lAdded = set()
-                for lCmp in self.components[lPkg]:
-                    if lCmp not in lAdded:
-                        lTemp.append(lCmp)
-                        lAdded.add(lCmp)
-                self.components[lPkg] = lTemp
+        self._closeRecord(lRecord)
         # --------------------------------------------------------------
 
     # ----------------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,152 @@
+from __future__ import print_function
+import time
+from collections import OrderedDict
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class DepFileProfile(object):
+    """Measurements of one inclusion of a dep file
+
+    Attributes:
+        path      (str): path of the dep file
+        chain   (tuple): paths of the dep files including it, from the top one, and its own
+        total   (float): wall time, includes nested dep files
+        own     (float): wall time, nested dep files excluded
+        lines     (int): lines read
+        globs     (int): file expressions expanded
+        matched   (int): files matched by the expressions
+        eval    (float): time spent evaluating `@` and `?` directives
+        reused   (bool): results spliced in from an earlier inclusion, not parsed
+    """
+    __slots__ = ('path', 'chain', 'total', 'own', 'lines', 'globs', 'matched', 'eval', 'reused', '_start', '_nested')
+
+    def __init__(self, aPath, aChain):
+        self.path = aPath
+        self.chain = aChain
+        self.total = self.own = self.eval = 0.
+        self.lines = self.globs = self.matched = 0
+        self.reused = False
+        self._start = time.time()
+        self._nested = 0.
+
+    @property
+    def depth(self):
+        return len(self.chain) - 1
+
+    def asDict(self):
+        return OrderedDict((s, getattr(self, s)) for s in self.__slots__ if not s.startswith('_'))
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class DepFileProfiler(object):
+    """Collects wall time and work done by every dep file inclusion of a parse
+
+    Attributes:
+        profiles  (list): DepFileProfile of every inclusion, in parsing order
+        globs     (dict): [expansions, time, files matched] by file expression
+    """
+
+    # --------------------------------------------------------------
+    def __init__(self):
+        super(DepFileProfiler, self).__init__()
+        self.profiles = []
+        self.globs = {}
+        self._stack = []
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    @property
+    def current(self):
+        return self._stack[-1]
+
+    def enter(self, aPath):
+        lChain = (self._stack[-1].chain if self._stack else ()) + (aPath,)
+        lProfile = DepFileProfile(aPath, lChain)
+        self._stack.append(lProfile)
+        self.profiles.append(lProfile)
+
+    def exit(self, aReused=False):
+        lProfile = self._stack.pop()
+        lProfile.total = time.time() - lProfile._start
+        lProfile.own = lProfile.total - lProfile._nested
+        lProfile.reused = aReused
+        if self._stack:
+            self._stack[-1]._nested += lProfile.total
+
+    def glob(self, aPathExpr, aTime, aMatched):
+        lProfile = self._stack[-1]
+        lProfile.globs += 1
+        lProfile.matched += aMatched
+        lStats = self.globs.setdefault(aPathExpr, [0, 0., 0])
+        lStats[0] += 1
+        lStats[1] += aTime
+        lStats[2] += aMatched
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def byDepFile(self):
+        '''Measurements summed over the inclusions of each dep file, slowest first
+
+        Returns:
+            list: (path, inclusions, DepFileProfile of the sums) tuples
+        '''
+        lSums = OrderedDict()
+        for lProfile in self.profiles:
+            if lProfile.path not in lSums:
+                lSums[lProfile.path] = [0, DepFileProfile(lProfile.path, lProfile.chain)]
+            lEntry = lSums[lProfile.path]
+            lEntry[0] += 1
+            self._add(lEntry[1], lProfile)
+        return sorted(((p, n, s) for p, (n, s) in lSums.iteritems()), key=lambda e: e[2].own, reverse=True)
+
+    def byDepth(self):
+        '''Measurements summed by include depth
+
+        Returns:
+            list: (depth, inclusions, DepFileProfile of the sums) tuples
+        '''
+        lSums = {}
+        for lProfile in self.profiles:
+            lEntry = lSums.setdefault(lProfile.depth, [0, DepFileProfile(None, lProfile.chain)])
+            lEntry[0] += 1
+            self._add(lEntry[1], lProfile)
+        return [(d, lSums[d][0], lSums[d][1]) for d in sorted(lSums)]
+
+    def byGlob(self):
+        '''File expressions, slowest first
+
+        Returns:
+            list: (path expression, expansions, time, files matched) tuples
+        '''
+        return sorted(((e,) + tuple(s) for e, s in self.globs.iteritems()), key=lambda e: e[2], reverse=True)
+
+    @staticmethod
+    def _add(aSum, aProfile):
+        aSum.total += aProfile.total
+        aSum.own += aProfile.own
+        aSum.eval += aProfile.eval
+        aSum.lines += aProfile.lines
+        aSum.globs += aProfile.globs
+        aSum.matched += aProfile.matched
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def folded(self, aName=lambda aPath: aPath):
+        '''Own time of the inclusions in folded stack format, as read by flamegraph.pl
+
+        Returns:
+            list: 'top;included;...;dep file microseconds' lines
+        '''
+        lStacks = OrderedDict()
+        for lProfile in self.profiles:
+            lKey = ';'.join(aName(p) for p in lProfile.chain)
+            lStacks[lKey] = lStacks.get(lKey, 0) + lProfile.own
+        return ['{0} {1}'.format(k, int(v * 1e6)) for k, v in lStacks.iteritems()]
+
+    def asDict(self):
+        return OrderedDict([
+            ('profiles', [p.asDict() for p in self.profiles]),
+            ('globs', [OrderedDict(zip(('expression', 'expansions', 'time', 'matched'), g)) for g in self.byGlob()]),
+        ])
+    # --------------------------------------------------------------
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
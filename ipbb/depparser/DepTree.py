@@ -0,0 +1,114 @@
+from __future__ import print_function
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class DepTree(object):
+    """Flattened include tree: every inclusion of a dep file covers a range of `commands`
+
+    Attributes:
+        root      (DepFile): top dep file node
+        commands     (list): Command objects in parsing order, duplicates included
+        nodes        (list): (DepFile, depth, parent inclusion, begin, end) of every inclusion,
+                             in parsing order
+        byComponent  (dict): inclusions of the dep files of each (package, component)
+    """
+
+    # --------------------------------------------------------------
+    def __init__(self, aParser):
+        super(DepTree, self).__init__()
+
+        self.root = aParser._includes
+        self.commands = []
+        self.nodes = []
+        self.byComponent = {}
+
+        if self.root is None:
+            return
+
+        # Depth first, keeping the items of the dep files being walked as iterators
+        lStack = [(self._enter(self.root, None, 0), iter(self.root.commands))]
+        while lStack:
+            lIndex, lItems = lStack[-1]
+            for lItem in lItems:
+                if isinstance(lItem, tuple):
+                    # Missing path expressions
+                    continue
+                if hasattr(lItem, 'commands'):
+                    lStack.append((self._enter(lItem, lIndex, len(lStack)), iter(lItem.commands)))
+                    break
+                self.commands.append(lItem)
+            else:
+                lStack.pop()
+                self.nodes[lIndex][4] = len(self.commands)
+
+        self.nodes = [tuple(lNode) for lNode in self.nodes]
+
+    def _enter(self, aNode, aParent, aDepth):
+        lIndex = len(self.nodes)
+        self.nodes.append([aNode, aDepth, aParent, len(self.commands), None])
+        self.byComponent.setdefault((aNode.pkg, aNode.cmp), []).append(lIndex)
+        return lIndex
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def subtree(self, aIndex, aGroup=None):
+        '''Commands of an inclusion and of the dep files it includes, duplicates included'''
+        lBegin, lEnd = self.nodes[aIndex][3:5]
+        return [c for c in self.commands[lBegin:lEnd] if aGroup is None or c.Group == aGroup]
+
+    def component(self, aPackage, aComponent, aGroup=None):
+        '''Commands pulled in by the dep files of a component, without duplicates'''
+        # Inclusions come in parsing order: the ones nested in the previous one are skipped
+        lRanges = []
+        lEnd = -1
+        for lIndex in self.byComponent.get((aPackage, aComponent), []):
+            lBegin, lStop = self.nodes[lIndex][3:5]
+            if lStop <= lEnd:
+                continue
+            lRanges.append((max(lBegin, lEnd), lStop))
+            lEnd = lStop
+
+        lCommands = []
+        lAdded = set()
+        for lBegin, lStop in reversed(lRanges):
+            for c in reversed(self.commands[lBegin:lStop]):
+                if aGroup is not None and c.Group != aGroup:
+                    continue
+                lKey = (c.Group, c.FilePath, c.Lib)
+                if lKey not in lAdded:
+                    lCommands.append(c)
+                    lAdded.add(lKey)
+        lCommands.reverse()
+        return lCommands
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def digests(self):
+        '''Digests of the dep files of the tree
+
+        Returns:
+            dict: sets of subtree digests by (package, component, dep file name)
+        '''
+        lDigests = {}
+        for lNode in self.nodes:
+            lDigests.setdefault(lNode[0].key, set()).add(lNode[0].digest)
+        return lDigests
+
+    def diff(self, aOther):
+        '''Dep files whose results differ between this tree and aOther
+
+        Returns:
+            tuple: sorted (package, component, dep file name) lists: only here, only in
+                aOther, different
+        '''
+        if self.root is not None and aOther.root is not None and self.root.digest == aOther.root.digest:
+            return [], [], []
+
+        lMine, lTheirs = self.digests(), aOther.digests()
+        return (
+            sorted(k for k in lMine if k not in lTheirs),
+            sorted(k for k in lTheirs if k not in lMine),
+            sorted(k for k in lMine if k in lTheirs and lMine[k] != lTheirs[k]),
+        )
+    # --------------------------------------------------------------
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,124 @@
+from __future__ import print_function
+import os
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .DepFileParser import stamp
+from .._version import __version__
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class DepTreeCache(object):
+    """On-disk cache of the dependency tree parsed by DepFileParser
+
+    The cache stores the parser results together with the stamps of all dep files and
+    directories the parse went through. The results are reused only if the parser
+    settings match and none of the stamped paths has changed since.
+
+    Only complete ('full' mode) trees are stored: they can stand in for the results of
+    any parse mode.
+
+    Attributes:
+        path (str): path of the cache file
+    """
+
+    # Bump when the layout of the stored data changes
+    _format = 5
+
+    # Parser attributes stored in the cache. The parse mode is not: the parser loading
+    # the results keeps its own.
+    _attributes = ['vars', 'commands', 'libs', 'maps', 'components', 'missing', '_revDepMap', '_includes', '_stamps']
+
+    # --------------------------------------------------------------
+    def __init__(self, aPath, aVerbosity=0):
+        self.path = aPath
+        self._verbosity = aVerbosity
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    @staticmethod
+    def key(aParser, aPackage, aComponent, aDepFileName):
+        '''Identifies the parser settings the cached results were produced with'''
+        return (
+            DepTreeCache._format,
+            __version__,
+            aParser.pathMaker.rootdir,
+            aParser._toolset,
+            tuple(sorted(aParser._userVars.items())),
+            aPackage,
+            aComponent,
+            aDepFileName
+        )
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def load(self, aParser, aPackage, aComponent, aDepFileName):
+        '''Restores the parser results from the cache, if still valid
+
+        Returns:
+            bool: True if the cache was valid and the results were restored.
+        '''
+        try:
+            with open(self.path, 'rb') as lCacheFile:
+                lKey, lData = pickle.load(lCacheFile)
+        except Exception as e:
+            # Missing, unreadable or incompatible cache files are just ignored
+            if self._verbosity > 1:
+                print('+++ DepTreeCache: cache not loaded', self.path, '-', e)
+            return False
+
+        if lKey != self.key(aParser, aPackage, aComponent, aDepFileName):
+            if self._verbosity > 1:
+                print('+++ DepTreeCache: parser settings changed')
+            return False
+
+        for lPath, lStamp in lData['_stamps'].iteritems():
+            if stamp(lPath) != lStamp:
+                if self._verbosity > 1:
+                    print('+++ DepTreeCache: stale entry', lPath)
+                return False
+
+        for lAttr in self._attributes:
+            setattr(aParser, lAttr, lData[lAttr])
+
+        if self._verbosity > 1:
+            print('+++ DepTreeCache: results restored from', self.path)
+        return True
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def save(self, aParser, aPackage, aComponent, aDepFileName):
+        '''Writes the parser results to the cache file'''
+        if aParser.mode != 'full':
+            return
+
+        lData = dict((lAttr, getattr(aParser, lAttr)) for lAttr in self._attributes)
+
+        # Write to a temporary file first, then move it in place
+        lTmpPath = '{0}.{1}'.format(self.path, os.getpid())
+        try:
+            with open(lTmpPath, 'wb') as lCacheFile:
+                pickle.dump(
+                    (self.key(aParser, aPackage, aComponent, aDepFileName), lData),
+                    lCacheFile,
+                    pickle.HIGHEST_PROTOCOL
+                )
+            os.rename(lTmpPath, self.path)
+        except (IOError, OSError) as e:
+            # The cache is an optimisation, failing to write it is not an error
+            if self._verbosity > 1:
+                print('+++ DepTreeCache: failed to write', self.path, '-', e)
+            if os.path.exists(lTmpPath):
+                os.remove(lTmpPath)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def clear(self):
+        '''Removes the cache file'''
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    # --------------------------------------------------------------
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
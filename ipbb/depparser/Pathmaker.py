@@ -1,5 +1,16 @@
 from __future__ import print_function
 import os
+import glob
+import fnmatch
+import threading
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
 # --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
@@ -24,6 +35,8 @@ class Pathmaker(object):
     def __init__(self, rootdir, verbosity):
         self.rootdir = rootdir
         self.verbosity = verbosity
+        self._lock = threading.Lock()
+        self.resetIndex()
 
         if self.verbosity > 3:
             print("+++ Pathmaker init", rootdir)
@@ -71,13 +84,12 @@ class Pathmaker(object):
 
     # --------------------------------------------------------------
     def glob(self, package, component, command, fileexpr, cd=None):
-        import glob
 
         lPathExpr = self.getPath(package, component, command, fileexpr, cd=cd)
         lKindPath = self.getPath(package, component, command, cd=cd)
 
         # Expand the expression
-        lFilePaths = glob.glob(lPathExpr)
+        lFilePaths = list(self._iglob(lPathExpr))
 
         # Calculate the relative path and pair it up with the absolute path
         lFileList = [(os.path.relpath(lPath2, lKindPath), lPath2)
@@ -85,3 +97,144 @@ class Pathmaker(object):
 
         return lPathExpr, lFileList
     # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def globDirs(self, pathexpr):
+        '''Returns the directories whose content determines the expansion of pathexpr'''
+
+        lDir = os.path.dirname(pathexpr)
+        if not glob.has_magic(lDir):
+            return [lDir]
+
+        # Split the directory at the first wildcard and follow the expansion
+        # one level at the time, collecting all the directories it goes through
+        lParts = lDir.split(os.sep)
+        i = next(i for i, lPart in enumerate(lParts) if glob.has_magic(lPart))
+        lBase = os.sep.join(lParts[:i]) or (os.sep if os.path.isabs(lDir) else os.curdir)
+
+        lDirs = [lBase]
+        lLevel = [lBase]
+        for lPart in lParts[i:]:
+            if glob.has_magic(lPart):
+                lLevel = [p for d in lLevel for p in self._iglob(os.path.join(d, lPart)) if self._isdir(p)]
+            else:
+                lLevel = [p for p in (os.path.join(d, lPart) for d in lLevel) if self._isdir(p)]
+            lDirs += lLevel
+
+        return lDirs
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def resetIndex(self):
+        '''Forgets the directory listings collected so far
+
+        Directories are listed once and then matched in memory until the index is reset,
+        which is expected to happen at the beginning of every dependency tree parsing.
+        '''
+        self._listings = {}
+        self.syscalls = {'listdir': 0, 'stat': 0}
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def listDirs(self, pathexpr):
+        '''Adds the directories pathexpr is matched against to the index'''
+        for lDir in self.globDirs(pathexpr):
+            self._listdir(lDir)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def _listdir(self, aDir):
+        '''Returns the (names, name set, directory name set) listing of aDir, None if it cannot be listed
+
+        The set of directories is None when scandir is not available.
+        '''
+        try:
+            return self._listings[aDir]
+        except KeyError:
+            pass
+
+        with self._lock:
+            self.syscalls['listdir'] += 1
+        try:
+            if scandir is not None:
+                lEntries = list(scandir(aDir))
+                lNames = [e.name for e in lEntries]
+                lDirs = frozenset(e.name for e in lEntries if e.is_dir())
+            else:
+                lNames = os.listdir(aDir)
+                lDirs = None
+            lListing = (lNames, frozenset(lNames), lDirs)
+        except OSError:
+            lListing = None
+
+        self._listings[aDir] = lListing
+        return lListing
+
+    def _lexists(self, aPath):
+        lDir, lName = os.path.split(aPath)
+        lListing = self._listdir(lDir or os.curdir) if lName not in ('', os.curdir, os.pardir) else None
+        if lListing is not None:
+            return lName in lListing[1]
+
+        with self._lock:
+            self.syscalls['stat'] += 1
+        return os.path.lexists(aPath)
+
+    def _isdir(self, aPath):
+        lDir, lName = os.path.split(aPath)
+        lListing = self._listdir(lDir or os.curdir) if lName not in ('', os.curdir, os.pardir) else None
+        if lListing is not None and lListing[2] is not None:
+            return lName in lListing[2]
+
+        with self._lock:
+            self.syscalls['stat'] += 1
+        return os.path.isdir(aPath)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    # Same algorithm as glob.iglob, with directory listings taken from the index
+    def _iglob(self, aPathName):
+        lDir, lName = os.path.split(aPathName)
+        if not glob.has_magic(aPathName):
+            if lName:
+                if self._lexists(aPathName):
+                    yield aPathName
+            else:
+                # Patterns ending with a slash should match only directories
+                if self._isdir(lDir):
+                    yield aPathName
+            return
+
+        if not lDir:
+            for lMatch in self._glob1(os.curdir, lName):
+                yield lMatch
+            return
+
+        if lDir != aPathName and glob.has_magic(lDir):
+            lDirs = self._iglob(lDir)
+        else:
+            lDirs = [lDir]
+
+        lGlobInDir = self._glob1 if glob.has_magic(lName) else self._glob0
+        for lDir in lDirs:
+            for lMatch in lGlobInDir(lDir, lName):
+                yield os.path.join(lDir, lMatch)
+
+    def _glob1(self, aDir, aPattern):
+        lListing = self._listdir(aDir or os.curdir)
+        if lListing is None:
+            return []
+
+        lNames = lListing[0]
+        if aPattern[0] != '.':
+            lNames = [n for n in lNames if n[0] != '.']
+        return fnmatch.filter(lNames, aPattern)
+
+    def _glob0(self, aDir, aName):
+        if aName == '':
+            if self._isdir(aDir):
+                return [aName]
+        elif self._lexists(os.path.join(aDir, aName)):
+            return [aName]
+        return []
+    # --------------------------------------------------------------
@@ -0,0 +1,119 @@
+from __future__ import print_function
+from collections import OrderedDict
+
+
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+class RevDepIndex(object):
+    """Reverse dependencies of a parsed dependency tree: why is a file in the build
+
+    Attributes:
+        top          (str): path of the top dep file
+        depFiles    (dict): (package, component, dep file name) of every dep file, by path
+        includedBy  (dict): dep files including a dep file, by path
+        pulledBy    (dict): dep files listing a file, by path
+        components  (dict): (package, component) pairs a file belongs to, by path
+    """
+
+    # --------------------------------------------------------------
+    def __init__(self, aParser):
+        super(RevDepIndex, self).__init__()
+
+        self.top = None
+        self.depFiles = {}
+        self.includedBy = {}
+        self.pulledBy = {}
+        self.components = {}
+
+        lPathMaker = aParser.pathMaker
+        lRoot = aParser._includes
+        if lRoot is None:
+            return
+
+        def depPath(aNode):
+            return lPathMaker.getPath(aNode.pkg, aNode.cmp, 'include', aNode.dep)
+
+        self.top = depPath(lRoot)
+        self.depFiles[self.top] = (lRoot.pkg, lRoot.cmp, lRoot.dep)
+
+        # Nodes of dep files included several times with the same outcome are shared,
+        # their content is indexed once
+        lVisited = set()
+        lStack = [(lRoot, self.top)]
+        while lStack:
+            lNode, lPath = lStack.pop()
+            if id(lNode) in lVisited:
+                continue
+            lVisited.add(id(lNode))
+
+            for lItem in lNode.commands:
+                if isinstance(lItem, tuple):
+                    # Missing path expressions
+                    continue
+                if hasattr(lItem, 'commands'):
+                    lChildPath = depPath(lItem)
+                    self.depFiles.setdefault(lChildPath, (lItem.pkg, lItem.cmp, lItem.dep))
+                    self._add(self.includedBy, lChildPath, lPath)
+                    lStack.append((lItem, lChildPath))
+                else:
+                    self._add(self.pulledBy, lItem.FilePath, lPath)
+                    self._add(self.components, lItem.FilePath, (lItem.Package, lItem.Component))
+
+        # Freeze the insertion-ordered sets into lists
+        for lMap in (self.includedBy, self.pulledBy, self.components):
+            for lKey, lValues in lMap.iteritems():
+                lMap[lKey] = list(lValues)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    @staticmethod
+    def _add(aMap, aKey, aValue):
+        lValues = aMap.get(aKey)
+        if lValues is None:
+            lValues = aMap[aKey] = OrderedDict()
+        lValues[aValue] = None
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __contains__(self, aPath):
+        return aPath in self.pulledBy or aPath in self.depFiles
+
+    def chains(self, aPath, aMaxChains=100):
+        '''Include chains, as dep file paths, from the top dep file to aPath (at most aMaxChains)'''
+        if aPath in self.depFiles:
+            lStarts = [[aPath]]
+        else:
+            lStarts = [[lDepFile] for lDepFile in self.pulledBy.get(aPath, [])]
+
+        # Walk up the include graph, depth first so that complete chains come early
+        lChains = []
+        lStack = list(reversed(lStarts))
+        while lStack and len(lChains) < aMaxChains:
+            lChain = lStack.pop()
+            lParents = self.includedBy.get(lChain[0], [])
+            if not lParents:
+                lChains.append(lChain)
+                continue
+            for lParent in reversed(lParents):
+                # Cycles are rejected by the parser, this is for safety only
+                if lParent not in lChain:
+                    lStack.append([lParent] + lChain)
+        return lChains
+
+    def why(self, aPath, aMaxChains=100):
+        '''Summary of the reasons why aPath is part of the tree, None if it is not
+
+        Returns:
+            dict: path, dep files that pulled it in, components and include chains
+        '''
+        if aPath not in self:
+            return None
+
+        lDepFile = self.depFiles.get(aPath)
+        return OrderedDict([
+            ('path', aPath),
+            ('depfiles', self.includedBy.get(aPath, []) if lDepFile else self.pulledBy.get(aPath, [])),
+            ('components', [lDepFile[:2]] if lDepFile else self.components.get(aPath, [])),
+            ('chains', self.chains(aPath, aMaxChains)),
+        ])
+    # --------------------------------------------------------------
+# --------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
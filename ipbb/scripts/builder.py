@@ -32,11 +32,13 @@ CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
     cls=click_didyoumean.DYMGroup,
     context_settings=CONTEXT_SETTINGS,
 )
+@click.option('--parse-jobs', type=int, default=1, help="Number of threads reading dep files in parallel")
 @click.pass_context
 @click.version_option()
-def cli(ctx):
+def cli(ctx, parse_jobs):
     # Manually add the Environment to the top-level context.
     ctx.obj = Environment()
+    ctx.obj.parseJobs = parse_jobs
 
 # ------------------------------------------------------------------------------
 
@@ -0,0 +1,401 @@
+from __future__ import print_function
+# ------------------------------------------------------------------------------
+
+import os
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import binascii
+import functools
+import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    # Python 2 memory maps only expose the old buffer interface
+    _slice = buffer
+except NameError:
+    def _slice(aObject, aOffset, aSize):
+        return memoryview(aObject)[aOffset:aOffset + aSize]
+
+
+# ------------------------------------------------------------------------------
+class Checksum(object):
+    """hashlib-like interface to the zlib checksums, for change detection only"""
+    digest_size = 4
+
+    def __init__(self, aName, aFunction, aData=b''):
+        super(Checksum, self).__init__()
+        self.name = aName
+        self._function = aFunction
+        self._value = aFunction(aData)
+
+    def update(self, aData):
+        self._value = self._function(aData, self._value)
+
+    def digest(self):
+        return struct.pack('>I', self._value & 0xffffffff)
+
+    def hexdigest(self):
+        return '{0:08x}'.format(self._value & 0xffffffff)
+
+    def copy(self):
+        lCopy = Checksum(self.name, self._function)
+        lCopy._value = self._value
+        return lCopy
+
+
+# Hash constructors by name
+algorithms = collections.OrderedDict()
+
+
+def registerAlgorithm(aName, aConstructor):
+    '''Makes a hashing algorithm available by name
+
+    Args:
+        aName (str): name, as reported by the `name` attribute of the hash objects
+        aConstructor (callable): returns a new hash object, with the hashlib interface
+    '''
+    algorithms[aName] = aConstructor
+
+
+def algorithm(aAlgo):
+    '''Returns the constructor of an algorithm given by name, constructors are returned as they are'''
+    if callable(aAlgo):
+        return aAlgo
+    try:
+        return algorithms[aAlgo]
+    except KeyError:
+        raise ValueError('Hashing algorithm {0} is not available, expected one of {1}'.format(aAlgo, ', '.join(algorithms)))
+
+
+for lName in ('sha1', 'sha256', 'md5'):
+    registerAlgorithm(lName, getattr(hashlib, lName))
+
+# Part of hashlib from Python 3.6, available from pyblake2 before
+try:
+    registerAlgorithm('blake2b', hashlib.blake2b)
+except AttributeError:
+    try:
+        from pyblake2 import blake2b
+        registerAlgorithm('blake2b', blake2b)
+    except ImportError:
+        pass
+
+registerAlgorithm('crc32', functools.partial(Checksum, 'crc32', zlib.crc32))
+registerAlgorithm('adler32', functools.partial(Checksum, 'adler32', zlib.adler32))
+
+# Digest for signatures, the best available
+kDefaultAlgorithm = 'blake2b' if 'blake2b' in algorithms else 'sha1'
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def hashAndUpdate(aFilePath, aChunkSize=0x10000, aUpdateHashes=(), aAlgo=hashlib.sha1):
+
+    # New instance of the selected algorithm
+    lHash = algorithm(aAlgo)()
+
+    # Loop ovet the file content
+    with open(aFilePath, "rb") as f:
+        for lChunk in iter(lambda: f.read(aChunkSize), b''):
+            lHash.update(lChunk)
+
+            # Also update other hashes
+            for lUpHash in aUpdateHashes:
+                lUpHash.update(lChunk)
+
+    return lHash
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def hashFile(aFilePath, aAlgo=hashlib.sha1, aChunkSize=0x1000000):
+    '''Hashes the content of a file, through a memory map where possible
+
+    Returns:
+        hash object of the file content
+    '''
+    lHash = algorithm(aAlgo)()
+    with open(aFilePath, "rb") as f:
+        try:
+            lMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError, OverflowError):
+            for lChunk in iter(lambda: f.read(aChunkSize), b''):
+                lHash.update(lChunk)
+            return lHash
+
+        try:
+            # Chunks bound the address space touched at once by every thread
+            for lOffset in xrange(0, len(lMap), aChunkSize):
+                lHash.update(_slice(lMap, lOffset, aChunkSize))
+        finally:
+            lMap.close()
+    return lHash
+
+
+def hashFiles(aFilePaths, aAlgo=hashlib.sha1, aJobs=None, aCache=None):
+    '''Hashes files on a pool of threads
+
+    Args:
+        aFilePaths (list): paths of the files to hash
+        aAlgo: hashing algorithm, by name or constructor
+        aJobs (int): number of threads, one per CPU by default
+        aCache (DigestCache): digests of the files hashed earlier, updated with the new ones
+
+    Returns:
+        dict: digests by path. Files listed more than once are hashed once.
+    '''
+    aAlgo = algorithm(aAlgo)
+    lPaths = list(collections.OrderedDict.fromkeys(aFilePaths))
+    if aJobs is None:
+        aJobs = multiprocessing.cpu_count()
+
+    lAlgoName = aAlgo().name
+
+    def lHashOne(aPath):
+        if aCache is None:
+            return hashFile(aPath, aAlgo).digest()
+
+        lSignature = fileSignature(os.stat(aPath))
+        lDigest = aCache.get(aPath, lAlgoName, lSignature)
+        if lDigest is None:
+            lDigest = hashFile(aPath, aAlgo).digest()
+            aCache.put(aPath, lAlgoName, lSignature, lDigest)
+        return lDigest
+
+    if aJobs <= 1 or len(lPaths) <= 1:
+        return dict((p, lHashOne(p)) for p in lPaths)
+
+    lPool = ThreadPool(min(aJobs, len(lPaths)))
+    try:
+        # A timeout keeps the wait interruptible by Ctrl-C on Python 2
+        lDigests = lPool.map_async(lHashOne, lPaths, chunksize=1).get(1e9)
+    finally:
+        lPool.terminate()
+    return dict(zip(lPaths, lDigests))
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def fileSignature(aStat):
+    '''Returns the (inode, size, mtime in ns) signature of a file, from its stat result'''
+    lMTime = getattr(aStat, 'st_mtime_ns', None)
+    if lMTime is None:
+        lMTime = int(round(aStat.st_mtime * 1e9))
+    return (aStat.st_ino, aStat.st_size, lMTime)
+
+
+class DigestCache(object):
+    """On-disk cache of file digests, valid while the file keeps its inode, size and mtime
+
+    Files modified less than `racyWindow` seconds before being hashed are not saved.
+
+    Attributes:
+        path     (str): path of the cache file
+        refresh (bool): cached digests are not served, only replaced by fresh ones
+    """
+
+    # Bump when the layout of the stored data changes
+    _format = 1
+
+    racyWindow = 2.
+
+    # --------------------------------------------------------------
+    def __init__(self, aPath, aVerbosity=0, aRefresh=False):
+        super(DigestCache, self).__init__()
+        self.path = aPath
+        self.refresh = aRefresh
+        self._verbosity = aVerbosity
+        self._modified = False
+        self._now = time.time()
+        self._racy = set()
+        self.hits = self.misses = 0
+
+        self._entries = {}
+        try:
+            with open(self.path, 'rb') as lCacheFile:
+                lFormat, lEntries = pickle.load(lCacheFile)
+            if lFormat == self._format:
+                self._entries = lEntries
+        except Exception as e:
+            # Missing, unreadable or incompatible cache files are just ignored
+            if self._verbosity > 1:
+                print('+++ DigestCache: cache not loaded', self.path, '-', e)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def get(self, aPath, aAlgoName, aSignature):
+        '''Digest of a file, None if not cached or if the file changed since'''
+        lEntry = self._entries.get((aPath, aAlgoName))
+        if self.refresh or lEntry is None or lEntry[0] != aSignature:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return lEntry[1]
+
+    def put(self, aPath, aAlgoName, aSignature, aDigest):
+        lKey = (aPath, aAlgoName)
+        self._entries[lKey] = (aSignature, aDigest)
+        if aSignature[2] > (self._now - self.racyWindow) * 1e9:
+            self._racy.add(lKey)
+        else:
+            self._racy.discard(lKey)
+        self._modified = True
+
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def save(self):
+        '''Writes the cache file, if new digests were added'''
+        if not self._modified:
+            return
+
+        # Write to a temporary file first, then move it in place
+        lTmpPath = '{0}.{1}'.format(self.path, os.getpid())
+        try:
+            lEntries = self._entries
+            if self._racy:
+                lEntries = dict((k, v) for k, v in lEntries.iteritems() if k not in self._racy)
+            with open(lTmpPath, 'wb') as lCacheFile:
+                pickle.dump((self._format, lEntries), lCacheFile, pickle.HIGHEST_PROTOCOL)
+            os.rename(lTmpPath, self.path)
+            self._modified = False
+        except (IOError, OSError) as e:
+            # The cache is an optimisation, failing to write it is not an error
+            if self._verbosity > 1:
+                print('+++ DigestCache: failed to write', self.path, '-', e)
+            if os.path.exists(lTmpPath):
+                os.remove(lTmpPath)
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def hashCommands(aCommands, aAlgo=hashlib.sha1, aJobs=None, aCache=None, aDigests=None):
+    '''Hashes the files targeted by dep commands, as `ipbb dep hash` does
+
+    Args:
+        aCommands (dict): command lists by group, as in DepFileParser.commands
+        aAlgo: hashing algorithm, by name or constructor
+        aJobs (int): number of hashing threads, one per CPU by default
+        aCache (DigestCache): digests of the files hashed earlier, updated with the new ones
+        aDigests (dict): file digests by path, from hashFiles, to skip the hashing
+
+    Returns:
+        tuple: global hash, hashes by group and (hex digest, path) lists by group
+    '''
+    aAlgo = algorithm(aAlgo)
+    lDigests = aDigests
+    if lDigests is None:
+        lDigests = hashFiles([lCmd.FilePath for lCmds in aCommands.itervalues() for lCmd in lCmds], aAlgo, aJobs, aCache)
+
+    lProjHash = aAlgo()
+    lGrpHashes = collections.OrderedDict()
+    lCmdHashes = collections.OrderedDict()
+    for lGrp in sorted(aCommands):
+        lCmds = aCommands[lGrp]
+        lGrpHash = aAlgo()
+        lCmdHashes[lGrp] = []
+        for lCmd in lCmds:
+            lDigest = lDigests[lCmd.FilePath]
+            lGrpHash.update(lDigest)
+            lProjHash.update(lDigest)
+            lCmdHashes[lGrp].append((binascii.hexlify(lDigest), lCmd.FilePath))
+        lGrpHashes[lGrp] = lGrpHash
+
+    return lProjHash, lGrpHashes, lCmdHashes
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def merkleTree(aCommands, aRootDir, aAlgo=hashlib.sha1, aJobs=None, aCache=None, aDigests=None):
+    '''Hashes the files targeted by dep commands into component, package and project digests
+
+    Paths are hashed relative to aRootDir, so that work areas can be compared.
+
+    Args:
+        aCommands (dict): command lists by group, as in DepFileParser.commands
+        aRootDir (str): directory file paths are made relative to, the source area
+        aAlgo: hashing algorithm, by name or constructor
+        aJobs (int): number of hashing threads, one per CPU by default
+        aCache (DigestCache): digests of the files hashed earlier, updated with the new ones
+        aDigests (dict): file digests by path, from hashFiles, to skip the hashing
+
+    Returns:
+        OrderedDict: algorithm name, project digest and, by package, package digest and
+            component digests, ready to be stored as JSON
+    '''
+    aAlgo = algorithm(aAlgo)
+    lDigests = aDigests
+    if lDigests is None:
+        lDigests = hashFiles([lCmd.FilePath for lCmds in aCommands.itervalues() for lCmd in lCmds], aAlgo, aJobs, aCache)
+
+    lCmpHashes = {}
+    for lGrp in sorted(aCommands):
+        for lCmd in aCommands[lGrp]:
+            lKey = (lCmd.Package, lCmd.Component)
+            lHash = lCmpHashes.get(lKey)
+            if lHash is None:
+                lHash = lCmpHashes[lKey] = aAlgo()
+            lHash.update('\0'.join([lGrp, os.path.relpath(lCmd.FilePath, aRootDir), lCmd.Lib or '', binascii.hexlify(lDigests[lCmd.FilePath])]) + '\0')
+
+    lPackages = collections.OrderedDict()
+    for lPackage, lComponent in sorted(lCmpHashes):
+        lPackages.setdefault(lPackage, collections.OrderedDict([
+            ('digest', None),
+            ('components', collections.OrderedDict()),
+        ]))['components'][lComponent] = lCmpHashes[(lPackage, lComponent)].hexdigest()
+
+    lProjHash = aAlgo()
+    for lPackage, lNode in lPackages.iteritems():
+        lHash = aAlgo()
+        for lComponent, lDigest in lNode['components'].iteritems():
+            lHash.update(lComponent + '\0' + lDigest + '\0')
+        lNode['digest'] = lHash.hexdigest()
+        lProjHash.update(lPackage + '\0' + lNode['digest'] + '\0')
+
+    return collections.OrderedDict([
+        ('algorithm', lProjHash.name),
+        ('digest', lProjHash.hexdigest()),
+        ('packages', lPackages),
+    ])
+
+
+def diffMerkleTrees(aOld, aNew):
+    '''Components whose files changed between two trees produced by merkleTree
+
+    Returns:
+        tuple: sorted lists of the (package, component) pairs added, removed and changed
+    '''
+    if aOld['algorithm'] != aNew['algorithm']:
+        raise ValueError('Digests computed with different algorithms: {0}, {1}'.format(aOld['algorithm'], aNew['algorithm']))
+
+    lAdded, lRemoved, lChanged = [], [], []
+    if aOld['digest'] == aNew['digest']:
+        return lAdded, lRemoved, lChanged
+
+    lOldPackages, lNewPackages = aOld['packages'], aNew['packages']
+    for lPackage in sorted(set(lOldPackages) | set(lNewPackages)):
+        lOld = lOldPackages.get(lPackage, {'digest': None, 'components': {}})
+        lNew = lNewPackages.get(lPackage, {'digest': None, 'components': {}})
+        if lOld['digest'] == lNew['digest']:
+            continue
+        for lComponent in sorted(set(lOld['components']) | set(lNew['components'])):
+            lOldDigest = lOld['components'].get(lComponent)
+            lNewDigest = lNew['components'].get(lComponent)
+            if lOldDigest is None:
+                lAdded.append((lPackage, lComponent))
+            elif lNewDigest is None:
+                lRemoved.append((lPackage, lComponent))
+            elif lOldDigest != lNewDigest:
+                lChanged.append((lPackage, lComponent))
+    return lAdded, lRemoved, lChanged
+# ------------------------------------------------------------------------------
@@ -0,0 +1,179 @@
+from __future__ import print_function
+# ------------------------------------------------------------------------------
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+
+# ------------------------------------------------------------------------------
+# Constants from sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+kDirEvents = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+kEventHeader = struct.Struct('iIII')
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def _libc():
+    lName = ctypes.util.find_library('c')
+    if lName is None:
+        return None
+    try:
+        lLibC = ctypes.CDLL(lName, use_errno=True)
+        lLibC.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return lLibC
+
+_kLibC = _libc()
+
+
+def available():
+    '''True if the kernel notifications can be used on this system'''
+    return _kLibC is not None
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class DirWatcher(object):
+    '''Notifies changes to the content of a set of directories, by means of inotify
+
+    Only the occurrence of a change is reported: what changed is left to the caller
+    to find out.
+    '''
+
+    # --------------------------------------------------------------
+    def __init__(self):
+        super(DirWatcher, self).__init__()
+        self._fd = _kLibC.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            lErrNo = ctypes.get_errno()
+            raise OSError(lErrNo, os.strerror(lErrNo))
+        # Watch descriptor to directory, and the set of watched directories
+        self._watches = {}
+        self._dirs = set()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)
+        self._fd = None
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def watch(self, aDirs):
+        '''Adds directories to the watched set
+
+        Directories that cannot be watched (e.g. not existing anymore) are skipped.
+        '''
+        for lDir in aDirs:
+            if lDir in self._dirs:
+                continue
+            lWd = _kLibC.inotify_add_watch(self._fd, lDir.encode('utf-8') if isinstance(lDir, unicode) else lDir, kDirEvents | IN_ONLYDIR)
+            if lWd >= 0:
+                self._watches[lWd] = lDir
+                self._dirs.add(lDir)
+
+    @property
+    def dirs(self):
+        return list(self._dirs)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def wait(self, aTimeout=None, aSettle=0.2):
+        '''Waits for changes in the watched directories
+
+        Changes are accumulated until none occurs for aSettle seconds, so that a burst
+        of changes (e.g. a git checkout) is reported once.
+
+        Returns:
+            bool: True if changes occurred, False on timeout
+        '''
+        if not self._select(aTimeout):
+            return False
+        while True:
+            self._drain()
+            if not self._select(aSettle):
+                return True
+
+    def _select(self, aTimeout):
+        while True:
+            try:
+                return bool(select.select([self._fd], [], [], aTimeout)[0])
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+
+    def _drain(self):
+        while True:
+            try:
+                lBuffer = os.read(self._fd, 0x10000)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return
+                raise
+
+            lOffset = 0
+            while lOffset < len(lBuffer):
+                lWd, lMask, _, lLen = kEventHeader.unpack_from(lBuffer, lOffset)
+                lOffset += kEventHeader.size + lLen
+                # The kernel dropped the watch (directory removed)
+                if lMask & IN_IGNORED:
+                    self._dirs.discard(self._watches.pop(lWd, None))
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class PollingWatcher(object):
+    '''Fallback for systems without inotify: every poll interval is reported as a change'''
+
+    # --------------------------------------------------------------
+    def __init__(self, aInterval=1.):
+        super(PollingWatcher, self).__init__()
+        self._interval = aInterval
+        self._dirs = set()
+
+    def close(self):
+        pass
+
+    def watch(self, aDirs):
+        self._dirs.update(aDirs)
+
+    @property
+    def dirs(self):
+        return list(self._dirs)
+
+    def wait(self, aTimeout=None, aSettle=0.):
+        lSleep = self._interval if aTimeout is None else min(aTimeout, self._interval)
+        time.sleep(lSleep)
+        return lSleep == self._interval
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
@@ -0,0 +1,144 @@
+from __future__ import print_function
+# ------------------------------------------------------------------------------
+
+# Modules
+from multiprocessing.pool import ThreadPool
+
+# Elements
+from .xilinx import VivadoConsole, VivadoHWServer
+from .mentor import ModelSimConsole
+
+
+# ------------------------------------------------------------------------------
+class ConsoleSession(object):
+    """Console running on a thread of its own
+
+    The blocking pexpect calls of the console happen on the session thread, so that a
+    process can drive several sessions at once. Calls are queued to the thread in the
+    order they are made.
+
+    The blocking methods (execute, executeMany, ..., the context manager) make it a
+    drop-in replacement for VivadoOpen and ModelSimOpen. submit() queues a call without
+    waiting: it returns a multiprocessing AsyncResult, whose get() raises the errors of
+    the console (VivadoConsoleError, ModelSimConsoleError) as is.
+
+    Example:
+        with VivadoSession('a') as lA, VivadoSession('b') as lB:
+            lRunsA, lRunsB = lA.submit('query', 'get_runs'), lB.submit('query', 'get_runs')
+            lRunsA.get(), lRunsB.get()
+    """
+    _consoleClass = None
+
+    # --------------------------------------------------------------
+    def __init__(self, *args, **kwargs):
+        super(ConsoleSession, self).__init__()
+        self._args = args
+        self._kwargs = kwargs
+        self._console = None
+        self._pool = None
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    @property
+    def console(self):
+        return self._console
+
+    @property
+    def quiet(self):
+        return self._console.quiet
+
+    @quiet.setter
+    def quiet(self, value):
+        self._console.quiet = value
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def submit(self, aMethod, *aArgs):
+        '''Queues a call to a method of the console
+
+        Args:
+            aMethod (str): name of the console method, or 'start' to start the console
+
+        Returns:
+            multiprocessing.pool.AsyncResult: result of the call
+        '''
+        if self._pool is None:
+            self._pool = ThreadPool(1)
+        return self._pool.apply_async(self._call, (aMethod,) + aArgs)
+
+    def _call(self, aMethod, *aArgs):
+        if aMethod == 'start':
+            self._console = self._consoleClass(*self._args, **self._kwargs)
+            return self
+        return getattr(self._console, aMethod)(*aArgs)
+
+    def start(self):
+        # The blocking calls wait with a timeout, to stay interruptible by Ctrl-C on Python 2
+        return self.submit('start').get(1e9)
+
+    def quit(self):
+        '''Quits the console and stops the session thread'''
+        if self._pool is None:
+            return
+        try:
+            if self._console is not None:
+                self.submit('quit').get(1e9)
+        finally:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.quit()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __call__(self, aCmd=None, aMaxLen=1):
+        if aCmd is None:
+            return
+
+        if aCmd.count('\n') != 0:
+            aCmd = aCmd.split('\n')
+
+        if isinstance(aCmd, str):
+            return self.execute(aCmd, aMaxLen)
+        elif isinstance(aCmd, list):
+            return self.executeMany(aCmd, aMaxLen)
+        else:
+            raise TypeError('Unsupported command type '+type(aCmd).__name__)
+
+    def execute(self, aCmd, aMaxLen=1):
+        return self.submit('execute', aCmd, aMaxLen).get(1e9)
+
+    def executeMany(self, aCmds, aMaxLen=1):
+        return self.submit('executeMany', aCmds, aMaxLen).get(1e9)
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class VivadoSession(ConsoleSession):
+    """VivadoConsole on a thread of its own"""
+    _consoleClass = VivadoConsole
+
+    def evaluate(self, aCmds):
+        return self.submit('evaluate', aCmds).get(1e9)
+
+    def query(self, aCmd):
+        return self.submit('query', aCmd).get(1e9)
+
+
+class VivadoHWSession(VivadoSession):
+    """VivadoHWServer on a thread of its own"""
+    _consoleClass = VivadoHWServer
+
+
+class ModelSimSession(ConsoleSession):
+    """ModelSimConsole on a thread of its own"""
+    _consoleClass = ModelSimConsole
+# ------------------------------------------------------------------------------
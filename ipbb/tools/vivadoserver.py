@@ -0,0 +1,551 @@
+from __future__ import print_function
+# ------------------------------------------------------------------------------
+
+# Modules
+import os
+import re
+import sys
+import json
+import time
+import errno
+import socket
+import select
+import logging
+import argparse
+import threading
+import subprocess
+import pexpect
+
+# Elements
+from os.path import abspath, relpath, exists, splitext
+from click import style
+from .xilinx import VivadoConsole, VivadoConsoleError, VivadoOutputFormatter, VivadoResult
+
+
+# ------------------------------------------------------------------------------
+class VivadoServerError(RuntimeError):
+    pass
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def _shortPath(aPath):
+    '''Unix socket paths are limited to ~100 characters: use the shortest spelling'''
+    return min(abspath(aPath), relpath(aPath), key=len)
+
+
+def _send(aSocket, aMessage):
+    aSocket.sendall(json.dumps(aMessage) + '\n')
+
+
+def _receive(aFile):
+    lLine = aFile.readline()
+    if not lLine:
+        raise VivadoServerError('Connection to the Vivado server closed')
+    return json.loads(lLine)
+
+
+def _str(aValue):
+    return aValue.encode('utf-8') if isinstance(aValue, unicode) else aValue
+
+
+def _connect(aSocketPath):
+    '''Connects to the server socket, None if no server is listening on it'''
+    lSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        lSocket.connect(_shortPath(aSocketPath))
+    except socket.error as lExc:
+        lSocket.close()
+        if lExc.errno in (errno.ENOENT, errno.ECONNREFUSED):
+            return None
+        raise
+    return lSocket
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def serverRunning(aSocketPath):
+    lSocket = _connect(aSocketPath)
+    if lSocket is None:
+        return False
+    lSocket.close()
+    return True
+
+
+def serverStatus(aSocketPath):
+    '''Status of the server listening on aSocketPath, None if there is none'''
+    lSocket = _connect(aSocketPath)
+    if lSocket is None:
+        return None
+    try:
+        _send(lSocket, {'op': 'status'})
+        return _receive(lSocket.makefile('rb'))['status']
+    finally:
+        lSocket.close()
+
+
+def stopServer(aSocketPath):
+    '''Asks the server to quit once the current session is over'''
+    lSocket = _connect(aSocketPath)
+    if lSocket is None:
+        return False
+    try:
+        _send(lSocket, {'op': 'stop'})
+        _receive(lSocket.makefile('rb'))
+    finally:
+        lSocket.close()
+    return True
+
+
+def spawnServer(aSocketPath, aProjectPath, aIdleTimeout, aLogPath, aExecutable='vivado'):
+    '''Starts a server in the background, in the directory of the socket
+
+    Returns:
+        subprocess.Popen: the server process
+    '''
+    lCwd = os.path.dirname(abspath(aSocketPath))
+    with open(os.devnull) as lNull, open(aLogPath, 'a') as lLog:
+        return subprocess.Popen(
+            [
+                sys.executable, '-m', __name__,
+                '--socket', abspath(aSocketPath),
+                '--project', abspath(aProjectPath),
+                '--idle-timeout', str(aIdleTimeout),
+                '--executable', aExecutable,
+            ],
+            cwd=lCwd, stdin=lNull, stdout=lLog, stderr=subprocess.STDOUT,
+            close_fds=True, preexec_fn=os.setsid
+        )
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class _Forwarder(object):
+    """Vivado console log, sent to the client of the running session"""
+
+    def __init__(self):
+        self.connection = None
+        self.muted = False
+
+    def write(self, aText):
+        if self.connection is None or self.muted:
+            return
+        try:
+            _send(self.connection, {'out': aText.decode('utf-8', 'replace')})
+        except socket.error:
+            # Client gone: the command runs to completion regardless
+            self.connection = None
+
+    def flush(self):
+        pass
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class VivadoServer(object):
+    """Keeps a Vivado console, with the project open, for the ipbb commands of a project area
+
+    Clients exchange json lines over a unix socket, one session per connection at a
+    time. The server quits after `idleTimeout` seconds without sessions, 0 for never.
+    """
+
+    __reOpenProject = re.compile(r'^\s*open_project\s+(?:-\S+\s+)*\{?([^\s{}]+)\}?\s*$')
+    __reCreateProject = re.compile(r'^\s*create_project\s')
+    __reQuit = re.compile(r'^\s*(quit|exit)\s*$')
+    __reMsgConfig = re.compile(r'^\s*set_msg_config\s.*-id\s+["{]?([^"}]+)["}]?')
+    __reSpecial = (__reOpenProject, __reCreateProject, __reQuit, __reMsgConfig)
+
+    # --------------------------------------------------------------
+    def __init__(self, aSocketPath, aProjectPath, aIdleTimeout=3600, aExecutable='vivado'):
+        super(VivadoServer, self).__init__()
+
+        self._log = logging.getLogger('VivadoServer')
+        self.socketPath = aSocketPath
+        self.projectPath = self._normalize(aProjectPath)
+        self.idleTimeout = aIdleTimeout
+        self._executable = aExecutable
+
+        self._console = None
+        self._out = _Forwarder()
+        self._lock = threading.Lock()
+        self._running = True
+        self._session = None
+        self._sessions = 0
+        self._msgIds = set()
+        self._started = self._lastActive = time.time()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def serve(self):
+        lListener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if serverRunning(self.socketPath):
+            raise VivadoServerError('A server is already listening on ' + self.socketPath)
+        if exists(self.socketPath):
+            os.unlink(self.socketPath)
+
+        try:
+            # Vivado first: clients find the socket once the server is ready
+            self._ensureConsole()
+
+            lListener.bind(_shortPath(self.socketPath))
+            os.chmod(self.socketPath, 0o600)
+            lListener.listen(8)
+
+            while True:
+                lReady, _, _ = select.select([lListener], [], [], 1.)
+                if lReady:
+                    lConnection, _ = lListener.accept()
+                    lThread = threading.Thread(target=self._handle, args=(lConnection,))
+                    lThread.daemon = True
+                    lThread.start()
+
+                if not self._lock.acquire(False):
+                    continue
+                try:
+                    if not self._running:
+                        break
+                    if self.idleTimeout and time.time() - self._lastActive > self.idleTimeout:
+                        self._log.info('Idle for %ss, quitting', self.idleTimeout)
+                        break
+                finally:
+                    self._lock.release()
+        finally:
+            lListener.close()
+            if exists(self.socketPath):
+                os.unlink(self.socketPath)
+            if self._console is not None:
+                self._console.quit()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def status(self):
+        lNow = time.time()
+        return {
+            'pid': os.getpid(),
+            'project': self.projectPath,
+            'vivado': self._console is not None and self._console.isAlive(),
+            'session': self._session,
+            'sessions': self._sessions,
+            'uptime': lNow - self._started,
+            'idle': 0. if self._session else lNow - self._lastActive,
+            'idle timeout': self.idleTimeout,
+        }
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def _handle(self, aConnection):
+        lLocked = False
+        lInput = aConnection.makefile('rb')
+        try:
+            for lLine in lInput:
+                lRequest = json.loads(lLine)
+                lOp = lRequest.get('op')
+
+                if lOp == 'status':
+                    _send(aConnection, {'status': self.status()})
+                elif lOp == 'stop':
+                    self._running = False
+                    _send(aConnection, {'stopping': True})
+                elif lOp == 'open':
+                    if not self._lock.acquire(False):
+                        if self._session:
+                            _send(aConnection, {'busy': self._session})
+                        self._lock.acquire()
+                    lLocked = True
+                    self._open(aConnection, lRequest)
+                    _send(aConnection, {'ready': True, 'pid': os.getpid(), 'sentinel': self._console._sentinel})
+                elif lOp == 'execute' and lLocked:
+                    _send(aConnection, self._executeRequest(lRequest))
+                elif lOp == 'evaluate' and lLocked:
+                    _send(aConnection, self._evaluateRequest(lRequest))
+                else:
+                    _send(aConnection, {'failure': 'Unexpected request {}'.format(lOp)})
+        except (socket.error, ValueError) as lExc:
+            self._log.warning('Connection dropped: %s', lExc)
+        except Exception as lExc:
+            self._log.exception('Session failed')
+            try:
+                _send(aConnection, {'failure': str(lExc)})
+            except socket.error:
+                pass
+        finally:
+            lInput.close()
+            aConnection.close()
+            if lLocked:
+                try:
+                    self._close()
+                finally:
+                    self._lock.release()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def _open(self, aConnection, aRequest):
+        self._session = aRequest.get('session') or 'anonymous'
+        self._sessions += 1
+        self._log.info('Session %s started', self._session)
+        self._ensureConsole()
+        self._console._stopOnCWarnings = aRequest.get('stopOnCWarnings', False)
+        self._out.connection = aConnection
+
+    def _close(self):
+        self._out.connection = None
+        self._log.info('Session %s over', self._session)
+        try:
+            if self._console is not None and self._console.isAlive():
+                self._console._stopOnCWarnings = False
+                for lId in sorted(self._msgIds):
+                    self._internal('reset_msg_config -quiet -id {{{0}}} -default_severity'.format(lId))
+                if self._currentProject() is None and exists(self.projectPath):
+                    self._internal('open_project {0}'.format(self.projectPath))
+        except (VivadoConsoleError, pexpect.ExceptionPexpect) as lExc:
+            self._log.warning('Failed to restore the session: %s', lExc)
+        finally:
+            self._msgIds.clear()
+            self._session = None
+            self._lastActive = time.time()
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def _executeRequest(self, aRequest):
+        lCmds = [_str(c) for c in aRequest['commands']]
+        lMaxLen = aRequest.get('maxlen', 1)
+        lOutput = []
+        try:
+            if any(r.match(c) for c in lCmds for r in self.__reSpecial):
+                for lCmd in lCmds:
+                    lOutput.extend(self._execute(lCmd, lMaxLen))
+            else:
+                # Nothing to adapt: the batch is pipelined
+                lOutput = self._console.executeMany(lCmds, lMaxLen)
+        except VivadoConsoleError as lExc:
+            return self._error(lExc)
+        except pexpect.ExceptionPexpect as lExc:
+            return self._died(lExc)
+        return {'result': lOutput}
+
+    def _evaluateRequest(self, aRequest):
+        '''Structured channel: commands are not adapted'''
+        try:
+            lResults = self._console.evaluate([_str(c) for c in aRequest['commands']])
+        except VivadoConsoleError as lExc:
+            return self._error(lExc)
+        except pexpect.ExceptionPexpect as lExc:
+            return self._died(lExc)
+        return {'results': [r.asDict() for r in lResults]}
+
+    def _error(self, aExc):
+        return {'error': {'command': aExc.command, 'errors': aExc.errors, 'criticalWarns': aExc.criticalWarns}}
+
+    def _died(self, aExc):
+        self._log.error('Vivado died: %s', aExc)
+        self._console = None
+        return {'failure': 'Vivado terminated unexpectedly, it will be restarted on the next session'}
+
+    def _execute(self, aCmd, aMaxLen):
+        '''Executes a client command, adapting the ones that would break the session'''
+        if self.__reQuit.match(aCmd):
+            return [None]
+
+        lMatch = self.__reOpenProject.match(aCmd)
+        if lMatch:
+            lProject = self._currentProject()
+            if lProject == self._normalize(lMatch.group(1)):
+                self._log.debug('%s already open', lProject)
+                return [None]
+            if lProject is not None:
+                self._internal('close_project')
+        elif self.__reCreateProject.match(aCmd):
+            if self._currentProject() is not None:
+                self._internal('close_project')
+
+        lMatch = self.__reMsgConfig.match(aCmd)
+        if lMatch:
+            self._msgIds.add(lMatch.group(1))
+
+        return self._console.execute(aCmd, aMaxLen)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def _internal(self, aCmd):
+        '''Executes a command of the server's own, without showing it to the client'''
+        self._out.muted = True
+        try:
+            return self._console.execute(aCmd)
+        finally:
+            self._out.muted = False
+
+    def _currentProject(self):
+        lDir = self._internal('get_property -quiet DIRECTORY [current_project -quiet]')[0]
+        lName = self._internal('current_project -quiet')[0]
+        if not lDir or not lName:
+            return None
+        return self._normalize(os.path.join(lDir.strip(), lName.strip()))
+
+    @staticmethod
+    def _normalize(aPath):
+        lPath = abspath(aPath)
+        return lPath if splitext(lPath)[1] == '.xpr' else lPath + '.xpr'
+
+    def _ensureConsole(self):
+        if self._console is not None and self._console.isAlive():
+            return
+        if self._console is not None:
+            self._log.warning('Vivado is not running anymore, restarting')
+            self._console.quit()
+
+        self._console = VivadoConsole('server', executable=self._executable)
+        # Forward the console log to the clients
+        self._console._process.logfile = self._out
+        if exists(self.projectPath):
+            self._internal('open_project {0}'.format(self.projectPath))
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+class VivadoClient(object):
+    """Session on a VivadoServer, a drop-in replacement for VivadoOpen"""
+
+    # --------------------------------------------------------------
+    @property
+    def quiet(self):
+        return self._out.quiet
+
+    @quiet.setter
+    def quiet(self, value):
+        self._out.quiet = value
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __init__(self, aSocketPath, sessionid=None, echo=True, echoprefix=None, stopOnCWarnings=False):
+        super(VivadoClient, self).__init__()
+        self._socketPath = aSocketPath
+        self._sessionid = sessionid
+        self._stopOnCWarnings = stopOnCWarnings
+        self._out = VivadoOutputFormatter(
+            echoprefix if (echoprefix or (sessionid is None))
+                else (sessionid + ' | '),
+            quiet=(not echo)
+        )
+        self._socket = None
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __enter__(self):
+        self._socket = _connect(self._socketPath)
+        if self._socket is None:
+            raise VivadoServerError('No Vivado server listening on ' + self._socketPath)
+        self._input = self._socket.makefile('rb')
+
+        _send(self._socket, {'op': 'open', 'session': self._sessionid, 'stopOnCWarnings': self._stopOnCWarnings})
+        while True:
+            lReply = _receive(self._input)
+            if 'busy' in lReply:
+                print(style('Vivado server busy with session {}, waiting'.format(lReply['busy']), fg='yellow'))
+            elif 'ready' in lReply:
+                self._out.sentinel = _str(lReply.get('sentinel'))
+                break
+            else:
+                raise VivadoServerError(lReply.get('failure', 'Unexpected reply {}'.format(lReply)))
+        return self
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __exit__(self, type, value, traceback):
+        # The file object holds a reference to the socket too
+        self._input.close()
+        self._socket.close()
+        self._socket = self._input = None
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __call__(self, aCmd=None, aMaxLen=1):
+        if aCmd is None:
+            return
+
+        if aCmd.count('\n') != 0:
+            aCmd = aCmd.split('\n')
+
+        if isinstance(aCmd, str):
+            return self.execute(aCmd, aMaxLen)
+        elif isinstance(aCmd, list):
+            return self.executeMany(aCmd, aMaxLen)
+        else:
+            raise TypeError('Unsupported command type '+type(aCmd).__name__)
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def execute(self, aCmd, aMaxLen=1):
+        if not isinstance(aCmd, str):
+            raise TypeError('expected string')
+
+        if aCmd.count('\n') != 0:
+            raise ValueError('Format error. Newline not allowed in commands')
+
+        return self._request([aCmd], aMaxLen)
+
+    def executeMany(self, aCmds, aMaxLen=1):
+        if not isinstance(aCmds, list):
+            raise TypeError('expected list')
+
+        return self._request(aCmds, aMaxLen)
+
+    def evaluate(self, aCmds):
+        if isinstance(aCmds, str):
+            aCmds = [aCmds]
+
+        lResults = []
+        for lResult in self._request(aCmds, aOp='evaluate'):
+            lResults.append(VivadoResult(
+                _str(lResult['command']),
+                lResult['code'],
+                _str(lResult['value']),
+                [_str(l) for l in lResult['output']],
+                [tuple(_str(f) for f in m) for m in lResult['messages']],
+                [_str(l) for l in lResult['errors']],
+                [_str(l) for l in lResult['criticalWarns']],
+            ))
+        return lResults
+
+    def query(self, aCmd):
+        return self.evaluate([aCmd])[0].value
+
+    def _request(self, aCmds, aMaxLen=1, aOp='execute'):
+        _send(self._socket, {'op': aOp, 'commands': aCmds, 'maxlen': aMaxLen})
+        while True:
+            lReply = _receive(self._input)
+            if 'out' in lReply:
+                self._out.write(_str(lReply['out']))
+            elif 'result' in lReply:
+                return [_str(l) for l in lReply['result']]
+            elif 'results' in lReply:
+                return lReply['results']
+            elif 'error' in lReply:
+                lError = lReply['error']
+                raise VivadoConsoleError(
+                    _str(lError['command']),
+                    [_str(e) for e in lError['errors']],
+                    [_str(w) for w in lError['criticalWarns']]
+                )
+            else:
+                raise VivadoServerError(lReply.get('failure', 'Unexpected reply {}'.format(lReply)))
+    # --------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Vivado session server')
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--project', required=True)
+    parser.add_argument('--idle-timeout', type=float, default=3600)
+    parser.add_argument('--executable', default='vivado')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    VivadoServer(args.socket, args.project, args.idle_timeout, args.executable).serve()
+
+
+if __name__ == '__main__':
+    main()
+# ------------------------------------------------------------------------------
@@ -12,6 +12,7 @@ import subprocess
 import os.path
 import atexit
 import sh
+import random
 import tempfile
 
 # Elements
@@ -155,6 +156,8 @@ class VivadoOutputFormatter(OutputFormatter):
         super(VivadoOutputFormatter, self).__init__(prefix, quiet)
 
         self.pendingchars = ''
+        # Marker of the records of the structured channel
+        self.sentinel = None
 
 
 
@@ -176,22 +179,37 @@ class VivadoOutputFormatter(OutputFormatter):
         # print(self.prefix)
 
         for l in lines:
-            lColor = None
-            if l.startswith('INFO:'):
-                lColor = kANSIColorBlue
-            elif l.startswith('WARNING:'):
-                lColor = kANSIColorYellow
-            elif l.startswith('CRITICAL WARNING:'):
-                lColor = kANSIColorOrange
-            elif l.startswith('ERROR:'):
-                lColor = kANSIColorRed
-            elif self.quiet:
+            if self.sentinel is not None and self.sentinel in l:
+                # Records of the structured channel: commands and results are shown, not the frame
+                lRecord = l.split(' ', 4)
+                if lRecord[0] != self.sentinel or self.quiet:
+                    continue
+                if lRecord[1] == 'begin':
+                    self._writeLine(lRecord[3] if len(lRecord) > 3 else '')
+                elif lRecord[1] == 'end' and len(lRecord) > 4 and lRecord[4]:
+                    for lResult in tclUnescape(lRecord[4]).split('\n'):
+                        self._writeLine(lResult)
                 continue
 
-            if lColor is not None:
-                l = lColor+l+kANSIColorResetAll
+            self._writeLine(l)
+
+    def _writeLine(self, l):
+        lColor = None
+        if l.startswith('INFO:'):
+            lColor = kANSIColorBlue
+        elif l.startswith('WARNING:'):
+            lColor = kANSIColorYellow
+        elif l.startswith('CRITICAL WARNING:'):
+            lColor = kANSIColorOrange
+        elif l.startswith('ERROR:'):
+            lColor = kANSIColorRed
+        elif self.quiet:
+            return
+
+        if lColor is not None:
+            l = lColor+l+kANSIColorResetAll
 
-            self._write((self.prefix if self.prefix else '')+l+'\n')
+        self._write((self.prefix if self.prefix else '')+l+'\n')
 # -------------------------------------------------------------------------
 
 
@@ -215,16 +233,94 @@ class VivadoConsoleError(Exception):
 # -------------------------------------------------------------------------
 
 
+# -------------------------------------------------------------------------
+def tclQuote(aText):
+    '''Quotes a string as a Tcl list element
+
+    Braces keep the text as is, as long as they balance. Otherwise, the special
+    characters are escaped.
+    '''
+    lDepth = 0
+    for c in aText:
+        if c == '{':
+            lDepth += 1
+        elif c == '}':
+            lDepth -= 1
+            if lDepth < 0:
+                break
+
+    if lDepth == 0 and '\\' not in aText:
+        return '{' + aText + '}'
+    return re.sub(r'([\\{}\[\]$";\s])', r'\\\1', aText)
+
+
+_reTclEscaped = re.compile(r'\\([\\nr])')
+_kTclEscapes = {'\\': '\\', 'n': '\n', 'r': '\r'}
+
+
+def tclUnescape(aText):
+    '''Decodes the results of the structured channel, escaped to fit on one line'''
+    if '\\' not in aText:
+        return aText
+    return _reTclEscaped.sub(lambda m: _kTclEscapes[m.group(1)], aText)
+# -------------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------------
+class VivadoResult(object):
+    """Outcome of a command run through the structured channel of VivadoConsole
+
+    Attributes:
+        command       (str): the command
+        code          (int): Tcl return code, 1 for errors
+        value         (str): Tcl result of the command, its error message on errors
+        output       (list): lines printed while the command ran
+        messages     (list): (severity, id) of the Vivado messages in the output
+        errors       (list): ERROR messages
+        criticalWarns (list): CRITICAL WARNING messages
+    """
+    __slots__ = ('command', 'code', 'value', 'output', 'messages', 'errors', 'criticalWarns')
+
+    def __init__(self, command, code=0, value='', output=None, messages=None, errors=None, criticalWarns=None):
+        self.command = command
+        self.code = code
+        self.value = value
+        self.output = [] if output is None else output
+        self.messages = [] if messages is None else messages
+        self.errors = [] if errors is None else errors
+        self.criticalWarns = [] if criticalWarns is None else criticalWarns
+
+    def asDict(self):
+        return dict((s, getattr(self, s)) for s in self.__slots__)
+
+    def __repr__(self):
+        return '{0}({1!r}, code={2}, {3} output lines, {4} messages)'.format(
+            self.__class__.__name__, self.command, self.code, len(self.output), len(self.messages)
+        )
+# -------------------------------------------------------------------------
+
+
 # -------------------------------------------------------------------------
 class VivadoConsole(object):
     """Class to interface to Vivado TCL console
 
+    Besides the commands typed at the prompt (execute), the console has a structured
+    channel (evaluate, query). Batches of commands are sent to Vivado as a single line
+    and evaluated by a Tcl procedure that runs each of them in a 'catch', framed by
+    records carrying the command, its return code and its result. Output, messages,
+    errors and critical warnings are attributed to the command that produced them,
+    results are returned whole, and the batch costs one round trip. As in the
+    sequential execution, the batch stops at the first command that fails.
+    executeMany uses it to pipeline its batches.
     """
 
     __reCharBackspace = re.compile(".\b")
     __reError = re.compile('^ERROR:')
     __reCriticalWarning = re.compile('^CRITICAL WARNING:')
+    __reMessage = re.compile(r'^(INFO|WARNING|CRITICAL WARNING|ERROR): \[([^\]]+)\]')
     __instances = set()
+    # Terminals truncate input lines longer than 4k characters
+    _pipelineMaxLine = 4000
     __promptMap = {
         'vivado': 'Vivado%[ \t]',
         'vivado_lab': 'vivado_lab%[ \t]'
@@ -248,7 +344,7 @@ class VivadoConsole(object):
     # --------------------------------------------------------------
 
     # --------------------------------------------------------------
-    def __init__(self, sessionid=None, echo=True, echoprefix=None, executable='vivado', prompt=None, stopOnCWarnings=False):
+    def __init__(self, sessionid=None, echo=True, echoprefix=None, executable='vivado', prompt=None, stopOnCWarnings=False, pipeline=True):
         """
         Args:
             sessionid (str): Name of the Vivado session
@@ -257,9 +353,15 @@ class VivadoConsole(object):
             executable (str):
             prompt (str):
             stopOnCWarnings (str):
+            pipeline (bool): Run the batches passed to executeMany through the structured channel
         """
         super(VivadoConsole, self).__init__()
 
+        self.pipeline = pipeline
+        # Names the pipelining procedure and marks its frame lines
+        self._sentinel = '__ipbb_{0:08x}'.format(random.getrandbits(32))
+        self._channelReady = False
+
         # Set up logger first
         self._log = logging.getLogger('Vivado')
         self._log.debug('Starting Vivado')
@@ -283,6 +385,7 @@ class VivadoConsole(object):
                 else (sessionid + ' | '),
             quiet = (not echo)
         )
+        self._out.sentinel = self._sentinel
         
         self._out.write('\n'+'-'*40+'\n')
         self._process = pexpect.spawn('{0} -mode tcl -log {1}.log -journal {1}.jou'.format(
@@ -317,32 +420,14 @@ class VivadoConsole(object):
     # --------------------------------------------------------------
     def __send(self, aText):
         self._process.sendline(aText)
-        # --------------------------------------------------------------
-        # Hard check: First line of output must match the injected command
-        lIndex = self._process.expect(['\r\n'])
+        # Skip the echo of the command, first line of output
+        self._process.expect(['\r\n'])
 
         lCmdRcvd = self.__reCharBackspace.sub('', self._process.before)
         lCmdSent = aText.split('\n')[0]
         if lCmdRcvd != lCmdSent:
-            # --------------------------------------------------------------
-            print ('-' * 20)
-            # Find where the 2 strings don't match
-            print (' sent:', len(lCmdSent), 'rcvd', len(lCmdRcvd))
-            for i in xrange(min(len(lCmdRcvd), len(lCmdSent))):
-                r = lCmdRcvd[i]
-                s = lCmdSent[i]
-                # print i, '\t', r, ord(r), ord(r) > 128, '\t', s, ord(s),
-                # ord(s) > 128
-                print (i, '\t', r, s, r == s, ord(r))
-
-            print (''.join([str(i % 10) for i in xrange(len(lCmdRcvd))]))
-            print (lCmdRcvd)
-            print (''.join([str(i % 10) for i in xrange(len(lCmdSent))]))
-            print (lCmdSent)
-            # --------------------------------------------------------------
             raise RuntimeError(
                 "Command and first output lines don't match Sent='{0}', Rcvd='{1}".format(lCmdSent, lCmdRcvd))
-        # --------------------------------------------------------------
     # --------------------------------------------------------------
 
     # --------------------------------------------------------------
@@ -389,6 +474,51 @@ class VivadoConsole(object):
         return lBuffer, lErrors, lCriticalWarnings
     # --------------------------------------------------------------
 
+    # --------------------------------------------------------------
+    def __expectRecords(self, aCmds):
+        lDone = self._sentinel + ' done'
+
+        # Wait for the end of the batch, then scan its output once
+        lTimeoutCounts = 0
+        while self._process.expect_exact([lDone, pexpect.TIMEOUT]) == 1:
+            lTimeoutCounts += 1
+            print ("<Time elapsed since last command: {0}s>".format(
+                lTimeoutCounts * self._process.timeout))
+        lText = self._process.before
+        self._process.expect(self._prompt)
+
+        lResults = []
+        lCurrent = None
+        # The batch ends with the newline before the last record
+        for lLine in lText.split('\r\n')[:-1]:
+            if lLine.startswith(self._sentinel):
+                lRecord = lLine.split(' ', 4)
+                if lRecord[1] == 'begin':
+                    lCurrent = VivadoResult(aCmds[len(lResults)])
+                    lResults.append(lCurrent)
+                elif lRecord[1] == 'end':
+                    lCurrent.code = int(lRecord[3])
+                    lCurrent.value = tclUnescape(lRecord[4])
+                continue
+
+            # The echo of the batch comes first
+            if lCurrent is None:
+                continue
+
+            lCurrent.output.append(lLine)
+
+            lMatch = self.__reMessage.match(lLine)
+            if lMatch is None:
+                continue
+            lCurrent.messages.append(lMatch.groups())
+            if lMatch.group(1) == 'ERROR':
+                lCurrent.errors.append(lLine)
+            elif lMatch.group(1) == 'CRITICAL WARNING':
+                lCurrent.criticalWarns.append(lLine)
+
+        return lResults
+    # --------------------------------------------------------------
+
     # --------------------------------------------------------------
     def quit(self):
 
@@ -455,11 +585,97 @@ class VivadoConsole(object):
         if not isinstance(aCmds, list):
             raise TypeError('expected list')
 
+        if not self.pipeline or len(aCmds) < 2:
+            lOutput = []
+            for lCmd in aCmds:
+                lOutput.extend(self.execute(lCmd, aMaxLen))
+            return lOutput
+
+        # Results as printed at the prompt, after the output
         lOutput = []
-        for lCmd in aCmds:
-            lOutput.extend(self.execute(lCmd, aMaxLen))
+        for lResult in self.evaluate(aCmds):
+            lLines = lResult.output + (lResult.value.split('\n') if lResult.value else [])
+            lOutput.extend(lLines[-aMaxLen:] if lLines else [None])
         return lOutput
     # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def evaluate(self, aCmds):
+        '''Runs commands through the structured channel
+
+        Args:
+            aCmds (list): commands, or a single command
+
+        Returns:
+            list: VivadoResult of each command
+
+        Raises:
+            VivadoConsoleError: on the first command that fails, or raises critical
+                warnings if the console stops on them
+        '''
+        if isinstance(aCmds, str):
+            aCmds = [aCmds]
+
+        for lCmd in aCmds:
+            if not isinstance(lCmd, str):
+                raise TypeError('expected string')
+
+            if lCmd.count('\n') != 0:
+                raise ValueError('Format error. Newline not allowed in commands')
+
+        if not self._channelReady:
+            # Evaluates each command at global level, as typed at the prompt. The
+            # result is escaped to fit on the record line.
+            self.execute(
+                'proc {0} {{cmds}} {{set i 0; foreach c $cmds {{puts "{0} begin $i $c"; '
+                'set rc [catch {{uplevel #0 $c}} r]; '
+                'puts "{0} end $i $rc [string map {{\\\\ \\\\\\\\ \\n \\\\n \\r \\\\r}} $r]"; '
+                'if {{$rc == 1}} {{break}}; incr i}}; puts "{0} done"; return}}'.format(self._sentinel)
+            )
+            self._channelReady = True
+
+        # Critical warnings must stop the batch as soon as they appear: one command at a time
+        lBatches = ([tclQuote(c)] for c in aCmds) if self._stopOnCWarnings else self.__split(aCmds)
+
+        lResults = []
+        for lBatch in lBatches:
+            self._process.sendline('{0} {{{1}}}'.format(self._sentinel, ' '.join(lBatch)))
+            lBatchResults = self.__expectRecords(aCmds[len(lResults):])
+
+            for lResult in lBatchResults:
+                # Tcl errors without an ERROR message from Vivado are reported with their message
+                if lResult.errors or lResult.code == 1 or (self._stopOnCWarnings and lResult.criticalWarns):
+                    raise VivadoConsoleError(lResult.command, lResult.errors or [lResult.value], lResult.criticalWarns)
+            lResults.extend(lBatchResults)
+
+            if len(lBatchResults) != len(lBatch):
+                raise RuntimeError('Batch interrupted after {0} of {1} commands'.format(len(lResults), len(aCmds)))
+
+        return lResults
+
+    def query(self, aCmd):
+        '''Result of a command, whole
+
+        Returns:
+            str: Tcl result of the command
+        '''
+        return self.evaluate([aCmd])[0].value
+    # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def __split(self, aCmds):
+        '''Quoted commands, in batches that fit in a terminal line'''
+        lBatch, lLength = [], 0
+        for lCmd in aCmds:
+            lQuoted = tclQuote(lCmd)
+            if lBatch and lLength + len(lQuoted) > self._pipelineMaxLine:
+                yield lBatch
+                lBatch, lLength = [], 0
+            lBatch.append(lQuoted)
+            lLength += len(lQuoted) + 1
+        if lBatch:
+            yield lBatch
+    # --------------------------------------------------------------
 # -------------------------------------------------------------------------
 
 
@@ -488,7 +704,7 @@ class VivadoHWServer(VivadoConsole):
 
     # --------------------------------------------------------------
     def getHwTargets(self):
-        return self.execute('get_hw_targets')[0].split()
+        return self.query('get_hw_targets').split()
     # --------------------------------------------------------------
 
     # --------------------------------------------------------------
@@ -504,7 +720,7 @@ class VivadoHWServer(VivadoConsole):
     
     # --------------------------------------------------------------
     def getHwDevices(self):
-        return self.execute('get_hw_devices')[0].split()
+        return self.query('get_hw_devices').split()
     # --------------------------------------------------------------
 
     # --------------------------------------------------------------
@@ -577,6 +793,14 @@ class VivadoOpen(object):
         else:
             raise TypeError('Unsupported command type '+type(aCmd).__name__)
     # --------------------------------------------------------------
+
+    # --------------------------------------------------------------
+    def evaluate(self, aCmds):
+        return self._console.evaluate(aCmds)
+
+    def query(self, aCmd):
+        return self._console.query(aCmd)
+    # --------------------------------------------------------------
 # -------------------------------------------------------------------------
 
 
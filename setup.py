@@ -13,7 +13,9 @@ setup(
         'TextTable',
         'Sh',
         'Pexpect',
-        'PsUtil'
+        'PsUtil',
+        # blake2b, the default file digest, is part of hashlib from Python 3.6
+        'pyblake2; python_version<"3.6"'
     ],
     entry_points='''
         [console_scripts]
@@ -0,0 +1,35 @@
+from __future__ import print_function
+
+import os
+import sys
+
+import pytest
+
+kTestDir = os.path.dirname(os.path.abspath(__file__))
+sys.path[0:0] = [os.path.dirname(kTestDir), kTestDir]
+
+from ipbb_test import repogen
+
+
+# ------------------------------------------------------------------------------
+@pytest.fixture
+def workarea(tmpdir):
+    '''Writes a small synthetic work area
+
+    Returns:
+        tuple: source directory and (package, component, dep file) of the top dep file
+    '''
+    lTop = repogen.generate(str(tmpdir), 3, 4, 8, aGlobFiles=2, aFileSize=256)
+    return os.path.join(str(tmpdir), 'src'), lTop
+
+
+def writeDep(aSrcDir, aPackage, aComponent, aDepFileName, aLines):
+    '''Writes a dep file into a component of a source area'''
+    lCfgDir = os.path.join(aSrcDir, aPackage, aComponent, 'firmware', 'cfg')
+    if not os.path.exists(lCfgDir):
+        os.makedirs(lCfgDir)
+    lPath = os.path.join(lCfgDir, aDepFileName)
+    with open(lPath, 'w') as lDep:
+        lDep.write('\n'.join(aLines) + '\n')
+    return lPath
+# ------------------------------------------------------------------------------
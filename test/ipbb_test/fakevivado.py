@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Stand-in for the Vivado Tcl console, for tests and benchmarks of the console classes
+
+A Tcl interpreter behind a 'Vivado% ' prompt, with a handful of fake Vivado commands,
+and 'crash', to kill it.
+Like Vivado, it echoes the lines it reads itself. The command line arguments are
+ignored. FAKE_VIVADO_LATENCY sets a delay, in milliseconds, added to every line read
+at the prompt.
+"""
+from __future__ import print_function
+
+import os
+import stat
+import sys
+import termios
+
+try:
+    from Tkinter import Tcl
+except ImportError:
+    from tkinter import Tcl
+
+
+kScript = r'''
+proc get_runs {args} {
+    if {[llength $args] && [string index [lindex $args end] 0] ne "-"} {
+        return [lindex $args end]
+    }
+    return "impl_1 ip_a_synth_1 ip_b_synth_1 synth_1"
+}
+
+proc get_property {args} {
+    lassign [lrange $args end-1 end] name object
+    if {$name eq "DIRECTORY"} {
+        return [file dirname $::project]
+    }
+    return "$name:$object"
+}
+
+set project ""
+
+proc create_project {name dir args} {
+    if {$::project ne ""} {
+        fail "A project is already open"
+    }
+    set ::project [file normalize [file join $dir $name.xpr]]
+}
+
+proc open_project {path} {
+    if {$::project ne ""} {
+        fail "A project is already open"
+    }
+    if {[file extension $path] ne ".xpr"} {
+        append path .xpr
+    }
+    set ::project [file normalize $path]
+}
+
+proc close_project {args} {
+    set ::project ""
+}
+
+proc current_project {args} {
+    return [file rootname [file tail $::project]]
+}
+
+proc get_files {args} {
+    set n 10
+    if {[llength $args] && [string is integer [lindex $args end]]} {
+        set n [lindex $args end]
+    }
+    set files {}
+    for {set i 0} {$i < $n} {incr i} {
+        lappend files "/work/src/pkg/hdl/file_$i.vhd"
+    }
+    return $files
+}
+
+proc reorder_files {args} {
+    puts "INFO: \[Vivado 12-1\] Files reordered"
+}
+
+proc set_msg_config {args} {}
+proc reset_msg_config {args} {}
+
+proc critical {message} {
+    puts "CRITICAL WARNING: \[Fake 1-2\] $message"
+}
+
+proc fail {message} {
+    puts "ERROR: \[Fake 1-1\] $message"
+    error "'fail' failed due to earlier errors."
+}
+
+fconfigure stdout -translation lf
+puts "****** Vivado v2099.1 (fake)"
+while 1 {
+    puts -nonewline "Vivado% "
+    flush stdout
+    if {[gets stdin line] < 0 || $line in {quit exit}} {
+        break
+    }
+    puts $line
+    after $latency
+    if {[catch {uplevel #0 $line} result] || $result ne ""} {
+        puts $result
+    }
+}
+'''
+
+
+# ------------------------------------------------------------------------------
+def install(aDir, aName='vivado'):
+    '''Writes an executable named aName in aDir, running the fake console
+
+    Returns:
+        str: path of the executable
+    '''
+    lPath = os.path.join(aDir, aName)
+    with open(lPath, 'w') as lFile:
+        lFile.write('#!/bin/sh\nexec "{0}" "{1}" "$@"\n'.format(sys.executable, os.path.abspath(__file__.replace('.pyc', '.py'))))
+    os.chmod(lPath, os.stat(lPath).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return lPath
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def main():
+    if os.isatty(0):
+        lAttrs = termios.tcgetattr(0)
+        lAttrs[3] &= ~termios.ECHO
+        termios.tcsetattr(0, termios.TCSANOW, lAttrs)
+
+    lTcl = Tcl()
+    lTcl.setvar('latency', os.environ.get('FAKE_VIVADO_LATENCY', '0'))
+    # Vivado dying
+    lTcl.createcommand('crash', lambda: os._exit(1))
+    lTcl.eval(kScript)
+# ------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+from __future__ import print_function
+
+import argparse
+
+
+# ------------------------------------------------------------------------------
+class LegacyParserError(Exception):
+    pass
+
+
+class LegacyArgumentParser(argparse.ArgumentParser):
+    """ArgumentParser raising its errors, rather than printing them and exiting"""
+    def error(self, message):
+        raise LegacyParserError(message)
+
+
+class LegacyComponentAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        lTokenized = values.split(':')
+        if len(lTokenized) == 1:
+            lTokenized.insert(0, None)
+        setattr(namespace, self.dest, tuple(lTokenized))
+
+
+def legacyLineParser():
+    '''Rebuilds the argparse grammar ipbb used to parse dep lines
+
+    Returns:
+        function: parses a list of tokens into an argparse namespace, raises LegacyParserError
+    '''
+    parser = LegacyArgumentParser(usage=argparse.SUPPRESS)
+    parser_add_subparsers = parser.add_subparsers(dest='cmd')
+
+    for lCmd in ('include', 'setup', 'src', 'addrtab', 'iprepo'):
+        subp = parser_add_subparsers.add_parser(lCmd)
+        subp.add_argument('-c', '--component', action=LegacyComponentAction, default=(None, None))
+        subp.add_argument('--cd')
+        if lCmd == 'setup':
+            subp.add_argument('-z', '--coregen', action='store_true')
+        elif lCmd == 'src':
+            subp.add_argument('-l', '--lib')
+            subp.add_argument('-m', '--map')
+            subp.add_argument('-n', '--noinclude', action='store_true')
+            subp.add_argument('--vhdl2008', action='store_true')
+        elif lCmd == 'addrtab':
+            subp.add_argument('-t', '--toplevel', action='store_true')
+        subp.add_argument('file', nargs='+' if lCmd == 'src' else '*', default=[])
+
+    return parser.parse_args
+# ------------------------------------------------------------------------------
@@ -1,39 +1,204 @@
+from __future__ import print_function
+
+import os
+from collections import OrderedDict
+
+
+# ------------------------------------------------------------------------------
 class Package(object):
     """
     Attributes:
         name (str): Name of the package
-        components (list): list of components
+        components (OrderedDict): components, by path
     """
     def __init__(self, name):
         super(Package, self).__init__()
         self.name = name
-        self.components = {}
+        self.components = OrderedDict()
 
     def add(self, cmp):
         """Add component to this package
 
         Args:
-            cmp (:obj:`Component`): component obj 
+            cmp (:obj:`Component`): component obj
         """
-        print cmp.path, self.components
         if cmp.path in self.components:
             raise RuntimeError("Component {} already part of {}".format(cmp.path, self.name))
 
         self.components[cmp.path] = cmp
-        
+        return cmp
+
+    def write(self, aSrcDir):
+        """Writes the package and its components into a source directory
+
+        Args:
+            aSrcDir (str): source directory of the work area
+        """
+        for lCmp in self.components.itervalues():
+            lCmp.write(os.path.join(aSrcDir, self.name, lCmp.path))
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
 class Component(object):
     """Attributes
-
+        path (str): path of the component in its package
+        deps (OrderedDict): dep file lines, by dep file name
+        files (list): files to create, relative to the component
+        fileSize (int): size of the files to create, in bytes
     """
-    def __init__(self, path):
+    def __init__(self, path, fileSize=0):
         super(Component, self).__init__()
         self.path = path
-        
+        self.deps = OrderedDict()
+        self.files = []
+        self.fileSize = fileSize
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def dep(self, aLine, aDepFile=None):
+        """Appends a line to a dep file, by default the one named after the component"""
+        self.deps.setdefault(aDepFile or self.name + '.dep', []).append(aLine)
+
+    def src(self, aFileName, aOptions='', aSubDir='firmware/hdl', aCondition=None):
+        """Adds a source file and its dep file entry, optionally conditional"""
+        self.files.append(os.path.join(aSubDir, aFileName))
+        lCondition = '? {0} ?'.format(aCondition) if aCondition else None
+        self.dep(' '.join(p for p in (lCondition, 'src', aOptions, aFileName) if p))
+
+    def write(self, aCmpDir):
+        for lFile in self.files:
+            lPath = os.path.join(aCmpDir, lFile)
+            if not os.path.exists(os.path.dirname(lPath)):
+                os.makedirs(os.path.dirname(lPath))
+            with open(lPath, 'w') as lSrc:
+                lSrc.write(content(lFile, self.fileSize))
+
+        lCfgDir = os.path.join(aCmpDir, 'firmware', 'cfg')
+        if not os.path.exists(lCfgDir):
+            os.makedirs(lCfgDir)
+
+        for lDepFile, lLines in self.deps.iteritems():
+            with open(os.path.join(lCfgDir, lDepFile), 'w') as lDep:
+                lDep.write('\n'.join(lLines) + '\n')
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+# Variants of src lines, cycled through to exercise the whole dep syntax
+kSrcOptions = [
+    '',
+    '-l lib{0}',
+    '--vhdl2008',
+    '-c {1}',
+    '',
+    '-n',
+    '--cd ../sim',
+    '-l lib{0} -m gen',
+]
+
+
+# Conditions of the conditional src lines, all true
+kConditions = [
+    'toolset == "Vivado"',
+    'toolset in ("Vivado", "Modelsim") and {0}_cmp{1}_id >= 0',
+    'device_name != "" or toolset == "ISE"',
+]
+
+
+def content(aName, aSize):
+    """Dummy VHDL of about aSize bytes, different for every file name"""
+    if not aSize:
+        return ''
+    lLine = '-- {0}: synthetic source file\n'.format(aName)
+    return (lLine * (aSize // len(lLine) + 1))[:aSize]
+
+
+def synthetic(aPackages=10, aComponents=50, aFiles=100, aFanOut=1, aConditionEvery=4, aGlobFiles=0, aLibs=None, aFileSize=0):
+    """Builds a synthetic source tree
+
+    Every component holds aFiles source files, each of them listed on its own dep line,
+    plus aGlobFiles files listed by a single wildcard line. The components of a package
+    form an include tree with aFanOut children per component: component c includes
+    components aFanOut*c+1 to aFanOut*c+aFanOut. With the default fan-out of 1 each
+    component includes the next one, and the include depth equals aComponents. The top
+    component includes the first component of each package.
+
+    One source line out of aConditionEvery is conditional, on a condition that holds
+    (0 for none). Libraries are cycled through aLibs names, one per package by default.
+
+    Returns:
+        tuple: list of packages and the (package, component, dep file) of the top dep file
+    """
+    lPackages = []
+    for p in xrange(aPackages):
+        lPkg = Package('pkg{0}'.format(p))
+        for c in xrange(aComponents):
+            lCmp = lPkg.add(Component('components/cmp{0}'.format(c), aFileSize))
+            lCmp.dep('# Synthetic component {0}:{1}'.format(lPkg.name, lCmp.path))
+            lCmp.dep('@{0}_cmp{1}_id = {2}'.format(lPkg.name, c, p * aComponents + c))
+            for lChild in xrange(aFanOut * c + 1, min(aFanOut * (c + 1) + 1, aComponents)):
+                lCmp.dep('include -c components/cmp{0}'.format(lChild))
+
+            lLib = (p * aComponents + c) % aLibs if aLibs else p
+            for f in xrange(aFiles):
+                lOptions = kSrcOptions[f % len(kSrcOptions)].format(lLib, lCmp.path)
+                lSubDir = 'firmware/sim' if lOptions.startswith('--cd') else 'firmware/hdl'
+                lConditional = aConditionEvery and f % aConditionEvery == aConditionEvery - 1
+                lCondition = kConditions[f % len(kConditions)].format(lPkg.name, c) if lConditional else None
+                lCmp.src('{0}_{1}.vhd'.format(lCmp.name, f), lOptions, lSubDir, lCondition)
+
+            if aGlobFiles:
+                for f in xrange(aGlobFiles):
+                    lCmp.files.append('firmware/hdl/gen/{0}_gen{1}.vhd'.format(lCmp.name, f))
+                lCmp.dep('src gen/{0}_gen*.vhd'.format(lCmp.name))
+        lPackages.append(lPkg)
+
+    lTop = Package('top')
+    lTopCmp = lTop.add(Component('projects/example', aFileSize))
+    lTopCmp.dep('@device_name = "xc7k325t"')
+    for lPkg in lPackages:
+        lTopCmp.dep('include -c {0}:components/cmp0'.format(lPkg.name))
+    lTopCmp.src('top.vhd')
+    lPackages.append(lTop)
+
+    return lPackages, (lTop.name, lTopCmp.path, lTopCmp.name + '.dep')
+
+
+def generate(aWorkDir, *aArgs, **aKwargs):
+    """Writes a synthetic work area, see `synthetic` for the arguments
+
+    Returns:
+        tuple: (package, component, dep file) of the top dep file
+    """
+    lPackages, lTop = synthetic(*aArgs, **aKwargs)
+
+    lSrcDir = os.path.join(aWorkDir, 'src')
+    for lPkg in lPackages:
+        lPkg.write(lSrcDir)
+    open(os.path.join(aWorkDir, '.ipbbwork'), 'w').close()
+
+    return lTop
+# ------------------------------------------------------------------------------
 
-def test():
-    
-    p = Package('pippo')
-    p.add(Component('a/b/c'))
 
 if __name__ == '__main__':
-    test()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Generates a synthetic ipbb work area')
+    parser.add_argument('workdir')
+    parser.add_argument('-p', '--packages', type=int, default=10)
+    parser.add_argument('-c', '--components', type=int, default=50)
+    parser.add_argument('-f', '--files', type=int, default=100)
+    parser.add_argument('--fan-out', type=int, default=1, help='Components included by each component')
+    parser.add_argument('--condition-every', type=int, default=4, help='One src line in N is conditional, 0 for none')
+    parser.add_argument('--glob-files', type=int, default=0, help='Files per component listed by a wildcard')
+    parser.add_argument('--libs', type=int, default=None, help='Number of libraries, one per package by default')
+    parser.add_argument('--file-size', type=int, default=0, help='Size of the source files, in bytes')
+    args = parser.parse_args()
+
+    print('Top dep file:', generate(
+        args.workdir, args.packages, args.components, args.files, args.fan_out,
+        args.condition_every, args.glob_files, args.libs, args.file_size
+    ))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Dep tree memory benchmark
+
+Parses a synthetic work area (20k source files by default) and reports the memory
+held by the parser results, compared with the layout ipbb used originally: Command
+objects with a __dict__, created twice per file (command list and include tree), each
+of them with its own copy of the package, component and library strings (worst case,
+when they are given explicitly on the dep lines).
+
+The work area is generated by this process and parsed by a child process, so that the
+growth of the resident memory across the parse is not hidden by the generation.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+kRepoDir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path[0:0] = [kRepoDir, os.path.join(kRepoDir, 'test')]
+
+from ipbb.depparser.Pathmaker import Pathmaker
+from ipbb.depparser.DepFileParser import DepFileParser, DepFile
+from ipbb_test import repogen
+
+
+# ------------------------------------------------------------------------------
+class LegacyCommand(object):
+    def __init__(self, aFilePath, aPackage, aComponent, aLib, aMap, aInclude, aTopLevel, aVhdl2008):
+        self.FilePath = aFilePath
+        self.Package = aPackage
+        self.Component = aComponent
+        self.Lib = aLib
+        self.Map = aMap
+        self.Include = aInclude
+        self.TopLevel = aTopLevel
+        self.Vhdl2008 = aVhdl2008
+
+
+def copy(aString):
+    '''Returns a private copy of a string, as produced by the original parser'''
+    return None if aString is None else (aString + '.')[:-1]
+
+
+def legacyCommand(aCmd):
+    return LegacyCommand(aCmd.FilePath, copy(aCmd.Package), copy(aCmd.Component), copy(aCmd.Lib),
+                         aCmd.Map, aCmd.Include, aCmd.TopLevel, aCmd.Vhdl2008)
+
+
+def legacyTree(aNode):
+    '''Rebuilds an include tree with its own command instances'''
+    lNode = DepFile(aNode.pkg, aNode.cmp, aNode.dep)
+    for lItem in aNode.commands:
+        if isinstance(lItem, DepFile):
+            lNode.commands.append(legacyTree(lItem))
+        elif isinstance(lItem, tuple):
+            lNode.commands.append(lItem)
+        else:
+            lNode.commands.append(legacyCommand(lItem))
+    return lNode
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def deepsize(aObj, aSeen=None):
+    '''Size of an object and of everything it refers to, counting shared objects once'''
+    lSeen = set() if aSeen is None else aSeen
+    lSize = 0
+    lStack = [aObj]
+    while lStack:
+        lObj = lStack.pop()
+        if id(lObj) in lSeen:
+            continue
+        lSeen.add(id(lObj))
+        lSize += sys.getsizeof(lObj)
+
+        if isinstance(lObj, dict):
+            lStack.extend(lObj.keys())
+            lStack.extend(lObj.values())
+        elif isinstance(lObj, (list, tuple, set, frozenset)):
+            lStack.extend(lObj)
+        elif hasattr(lObj, '__dict__'):
+            lStack.append(lObj.__dict__)
+        if hasattr(type(lObj), '__slots__'):
+            lStack.extend(getattr(lObj, s) for s in type(lObj).__slots__ if hasattr(lObj, s))
+    return lSize
+
+
+def rss():
+    '''Current resident memory of the process, in MB, the peak where /proc is not available'''
+    try:
+        with open('/proc/self/statm') as lStatM:
+            return int(lStatM.read().split()[1]) * resource.getpagesize() / 1024. / 1024.
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def report(aWorkDir, aTop):
+    '''Parses a generated work area and reports the memory held by the results'''
+    lRSSBefore = rss()
+    lParser = DepFileParser('vivado', Pathmaker(os.path.join(aWorkDir, 'src'), 0))
+    lParser.parse(*aTop)
+    lRSSAfter = rss()
+
+    lNumFiles = sum(len(lCmds) for lCmds in lParser.commands.itervalues())
+    print('Synthetic tree:', lNumFiles, 'files')
+
+    # Paths and other strings shared with the legacy layout are counted once, up front
+    lShared = set()
+    deepsize(lParser._revDepMap, lShared)
+    deepsize(lParser.components, lShared)
+
+    lSize = deepsize([lParser.commands, lParser._includes], set(lShared))
+    lLegacySize = deepsize([
+        dict((k, [legacyCommand(c) for c in v]) for k, v in lParser.commands.iteritems()),
+        legacyTree(lParser._includes)
+    ], set(lShared))
+
+    print('{0:<28} {1:8.1f} MB {2:8.0f} bytes/file'.format('commands + include tree', lSize / 1e6, float(lSize) / lNumFiles))
+    print('{0:<28} {1:8.1f} MB {2:8.0f} bytes/file'.format('  legacy layout', lLegacySize / 1e6, float(lLegacySize) / lNumFiles))
+    print('{0:<28} {1:8.1f} MB'.format('parse RSS increase', lRSSAfter - lRSSBefore))
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-p', '--packages', type=int, default=4)
+    parser.add_argument('-c', '--components', type=int, default=50)
+    parser.add_argument('-f', '--files', type=int, default=100)
+    # Work area and top package, component and dep file
+    parser.add_argument('--run', default=None, nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: parse and report
+    if args.run:
+        report(args.run[0], args.run[1:])
+        return
+
+    lWorkDir = tempfile.mkdtemp(prefix='ipbb-bench-')
+    try:
+        lTop = repogen.generate(lWorkDir, args.packages, args.components, args.files)
+        subprocess.check_call([sys.executable, os.path.abspath(__file__), '--run', lWorkDir] + list(lTop))
+    finally:
+        shutil.rmtree(lWorkDir)
+# ------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    main()
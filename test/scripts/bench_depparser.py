@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Dep file parsing benchmark
+
+Generates a synthetic work area and measures how many dep lines per second are
+processed by
+ - the argparse-based line parser ipbb used originally,
+ - the current line parser,
+ - exec/eval and the compiled evaluator, on the `@` and `?cond?` directives,
+ - the complete DepFileParser (including path expansion), serial and parallel.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+kRepoDir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path[0:0] = [kRepoDir, os.path.join(kRepoDir, 'test')]
+
+from ipbb.depparser.Pathmaker import Pathmaker
+from ipbb.depparser.DepFileParser import DepFileParser
+from ipbb.depparser.DepExpression import compileDirective
+from ipbb_test import repogen
+from ipbb_test.legacy import legacyLineParser
+
+
+# ------------------------------------------------------------------------------
+def depLines(aSrcDir):
+    '''Collects the command lines and the directives of all dep files in the source tree
+
+    Returns:
+        tuple: list of tokenized command lines, list of (mode, text) directives
+    '''
+    lLines = []
+    lDirectives = []
+    for lDir, _, lFiles in os.walk(aSrcDir):
+        for lFile in lFiles:
+            if not lFile.endswith('.dep'):
+                continue
+            with open(os.path.join(lDir, lFile)) as lDepFile:
+                for lLine in lDepFile:
+                    lLine = lLine.strip()
+                    if not lLine or lLine[0] == '#':
+                        continue
+                    if lLine[0] == '@':
+                        lDirectives.append(('assign', lLine[1:]))
+                        continue
+                    if lLine[0] == '?':
+                        _, lCondition, lLine = lLine.split('?', 2)
+                        lDirectives.append(('eval', lCondition))
+                    lLines.append(lLine.split())
+    return lLines, lDirectives
+
+
+def legacyDirectives(aDirectives, aVars):
+    '''Evaluates the directives the way ipbb originally did'''
+    lVars = dict(aVars)
+    for lMode, lText in aDirectives:
+        if lMode == 'assign':
+            exec(lText, None, lVars)
+        else:
+            eval(lText.strip(), None, lVars)
+
+
+def compiledDirectives(aDirectives, aVars):
+    lVars = dict(aVars)
+    for lMode, lText in aDirectives:
+        lExpr = compileDirective(lText, lMode)
+        if lMode == 'assign':
+            lVars[lExpr.target] = lExpr(lVars)
+        else:
+            lExpr(lVars)
+
+
+def addLatency(aSeconds):
+    '''Delays directory listings and dep file reads, to mimic a network filesystem'''
+    def delayed(aFunc):
+        def lDelayed(*aArgs):
+            time.sleep(aSeconds)
+            return aFunc(*aArgs)
+        return lDelayed
+
+    lPathmakerModule = sys.modules[Pathmaker.__module__]
+    lParserModule = sys.modules[DepFileParser.__module__]
+    os.listdir = delayed(os.listdir)
+    if lPathmakerModule.scandir is not None:
+        lPathmakerModule.scandir = delayed(lPathmakerModule.scandir)
+    lParserModule.open = delayed(open)
+
+
+def timeit(aFunc, aRepeat):
+    '''Best wall-clock time out of aRepeat calls'''
+    lBest = None
+    for _ in xrange(aRepeat):
+        lStart = time.time()
+        aFunc()
+        lElapsed = time.time() - lStart
+        lBest = lElapsed if lBest is None else min(lBest, lElapsed)
+    return lBest
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-p', '--packages', type=int, default=10)
+    parser.add_argument('-c', '--components', type=int, default=50)
+    parser.add_argument('-f', '--files', type=int, default=100)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('-j', '--jobs', type=int, default=8, help='Threads for the parallel parsing')
+    parser.add_argument('-l', '--latency', type=float, default=0., help='Filesystem latency to simulate, in ms')
+    parser.add_argument('-w', '--workdir', default=None, help='Work area to use, a temporary one by default')
+    args = parser.parse_args()
+
+    lWorkDir = args.workdir or tempfile.mkdtemp(prefix='ipbb-bench-')
+    try:
+        lTop = repogen.generate(lWorkDir, args.packages, args.components, args.files)
+        lSrcDir = os.path.join(lWorkDir, 'src')
+        lLines, lDirectives = depLines(lSrcDir)
+        print('Synthetic tree:', len(lLines), 'dep lines,', len(lDirectives), 'directives in', lWorkDir)
+
+        if args.latency:
+            addLatency(args.latency / 1000.)
+
+        # Both line parsers must agree
+        lLegacy = legacyLineParser()
+        lCurrent = DepFileParser('vivado', Pathmaker(lSrcDir, 0)).parseLine
+        for lTokens in lLines:
+            if vars(lLegacy(lTokens)) != vars(lCurrent(lTokens)):
+                raise RuntimeError('Line parsers disagree on: ' + ' '.join(lTokens))
+
+        def lineBench(aParseLine):
+            return lambda: [aParseLine(lTokens) for lTokens in lLines]
+
+        # Directives are evaluated against the variables of a complete parse
+        lTopParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+        lTopParser.parse(*lTop)
+        lVars = lTopParser.vars
+
+        lDirectiveResults = [
+            ('exec/eval directives', timeit(lambda: legacyDirectives(lDirectives, lVars), args.repeat)),
+            ('compiled directives', timeit(lambda: compiledDirectives(lDirectives, lVars), args.repeat)),
+        ]
+        for lName, lTime in lDirectiveResults:
+            print('{0:<22} {1:8.3f} s {2:12.0f} directives/s'.format(lName, lTime, len(lDirectives) / lTime))
+        print('Directive speedup: {0:.1f}x'.format(lDirectiveResults[0][1] / lDirectiveResults[1][1]))
+
+        lResults = [
+            ('argparse line parser', timeit(lineBench(lLegacy), args.repeat)),
+            ('dep line parser', timeit(lineBench(lCurrent), args.repeat)),
+            ('DepFileParser.parse', timeit(
+                lambda: DepFileParser('vivado', Pathmaker(lSrcDir, 0)).parse(*lTop), args.repeat)),
+            ('parallel, {0} threads'.format(args.jobs), timeit(
+                lambda: DepFileParser('vivado', Pathmaker(lSrcDir, 0), aJobs=args.jobs).parse(*lTop), args.repeat)),
+        ]
+
+        for lName, lTime in lResults:
+            print('{0:<22} {1:8.3f} s {2:12.0f} lines/s'.format(lName, lTime, len(lLines) / lTime))
+        print('Line parser speedup: {0:.1f}x'.format(lResults[0][1] / lResults[1][1]))
+
+        lPathMaker = Pathmaker(lSrcDir, 0)
+        DepFileParser('vivado', lPathMaker).parse(*lTop)
+        print('Filesystem access: {listdir} directory listings, {stat} stat calls'.format(**lPathMaker.syscalls))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(lWorkDir)
+# ------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    main()
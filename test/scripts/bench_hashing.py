@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+File hashing benchmark
+
+Generates a synthetic work area and measures, for every hashing algorithm available
+to `ipbb dep hash`
+ - the raw throughput on a buffer in memory,
+ - the throughput of hashing the files of the project, on one thread and on several
+   (files are in the page cache after the first pass).
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+kRepoDir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path[0:0] = [kRepoDir, os.path.join(kRepoDir, 'test')]
+
+from ipbb.depparser.Pathmaker import Pathmaker
+from ipbb.depparser.DepFileParser import DepFileParser
+from ipbb.tools.hashing import algorithms, hashCommands
+from ipbb_test import repogen
+
+
+# ------------------------------------------------------------------------------
+def best(aFunction, aRepeat):
+    '''Best wall time of aRepeat calls'''
+    lBest = None
+    for _ in xrange(aRepeat):
+        lStart = time.time()
+        aFunction()
+        lTime = time.time() - lStart
+        lBest = lTime if lBest is None else min(lBest, lTime)
+    return lBest
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-p', '--packages', type=int, default=4)
+    parser.add_argument('-c', '--components', type=int, default=10)
+    parser.add_argument('-f', '--files', type=int, default=50)
+    parser.add_argument('-s', '--file-size', type=int, default=65536, help='Size of the source files, in bytes')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Threads of the parallel measurement')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Repetitions, the best time is kept')
+    args = parser.parse_args()
+
+    lWorkDir = tempfile.mkdtemp(prefix='ipbb-bench-')
+    try:
+        lTop = repogen.generate(
+            lWorkDir, args.packages, args.components, args.files, aFileSize=args.file_size
+        )
+        lParser = DepFileParser('vivado', Pathmaker(os.path.join(lWorkDir, 'src'), 0))
+        lParser.parse(*lTop)
+
+        lPaths = set(c.FilePath for lCmds in lParser.commands.itervalues() for c in lCmds)
+        lMB = sum(os.path.getsize(p) for p in lPaths) / 1e6
+        print('Synthetic project: {0} files, {1:.1f} MB'.format(len(lPaths), lMB))
+
+        lBuffer = os.urandom(1 << 20) * 64
+        lColumns = ['memory MB/s', 'files MB/s', '{0} jobs MB/s'.format(args.jobs)]
+        print(('{:<10}' + ' {:>16}' * len(lColumns)).format('algorithm', *lColumns))
+        for lName, lAlgo in algorithms.iteritems():
+            lMemory = best(lambda: lAlgo().update(lBuffer), args.repeat)
+            lSerial = best(lambda: hashCommands(lParser.commands, lAlgo, 1), args.repeat)
+            lParallel = best(lambda: hashCommands(lParser.commands, lAlgo, args.jobs), args.repeat)
+            print(('{:<10}' + ' {:>16.1f}' * len(lColumns)).format(
+                lName, len(lBuffer) / 1e6 / lMemory, lMB / lSerial, lMB / lParallel
+            ))
+    finally:
+        shutil.rmtree(lWorkDir)
+# ------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+"""
+Dependency tree benchmark suite
+
+Generates synthetic work areas of increasing size (1k, 10k and 100k source files) and
+measures, for each of them
+ - DepFileParser.parse wall time,
+ - memory of the parsing process: peak, and resident memory held by the parse results,
+ - directory listings and stat calls issued by the Pathmaker,
+ - `ipbb dep hash` throughput, and its time when all digests are cached.
+
+The work areas are generated by this process, and every scale is measured in a process
+of its own, so that peak memory figures are polluted neither by the generation nor by
+the previous scales. Results can be stored as JSON and compared with a previous run:
+the suite exits with an error if a measurement got worse than the tolerance allows.
+Everything runs offline, on the local filesystem.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+kRepoDir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path[0:0] = [kRepoDir, os.path.join(kRepoDir, 'test')]
+
+
+# ------------------------------------------------------------------------------
+# Work area shapes: packages x components x (files + glob files)
+kScales = OrderedDict([
+    ('1k', dict(aPackages=2, aComponents=10, aFiles=40, aGlobFiles=10)),
+    ('10k', dict(aPackages=5, aComponents=20, aFiles=90, aGlobFiles=10)),
+    ('100k', dict(aPackages=10, aComponents=50, aFiles=190, aGlobFiles=10)),
+])
+
+# Common to all scales
+kShape = dict(aFanOut=2, aConditionEvery=4, aLibs=8, aFileSize=2048)
+
+# Measurements compared with the baseline. Times are compared with the tolerance,
+# counts must not grow at all.
+kTimes = ['parse_s', 'hash_s', 'hash_cached_s']
+kCounts = ['listdir', 'stat']
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def maxrss():
+    '''Peak resident memory of the process, in MB'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def rss():
+    '''Current resident memory of the process, in MB, the peak where /proc is not available'''
+    try:
+        with open('/proc/self/statm') as lStatM:
+            return int(lStatM.read().split()[1]) * resource.getpagesize() / 1024. / 1024.
+    except IOError:
+        return maxrss()
+
+
+def runScale(aWorkDir, aTop, aRepeat):
+    '''Measures one generated work area, in the current process
+
+    Nothing but the imports must have run in the process before, so that the peak memory
+    reflects the parse. The memory held by the parse is the growth of the resident
+    memory across it, the peak being reached during the imports on small areas.
+    '''
+    from ipbb.depparser.Pathmaker import Pathmaker
+    from ipbb.depparser.DepFileParser import DepFileParser
+    from ipbb.tools.hashing import hashCommands, DigestCache
+
+    lSrcDir = os.path.join(aWorkDir, 'src')
+
+    # First parse: peak memory and syscalls
+    lRSSBefore = rss()
+    lPathMaker = Pathmaker(lSrcDir, 0)
+    lParser = DepFileParser('vivado', lPathMaker)
+    lStart = time.time()
+    lParser.parse(*aTop)
+    lBest = time.time() - lStart
+    lRSSAfter = rss()
+    lPeakRSS = maxrss()
+
+    for _ in xrange(aRepeat - 1):
+        lStart = time.time()
+        DepFileParser('vivado', Pathmaker(lSrcDir, 0)).parse(*aTop)
+        lBest = min(lBest, time.time() - lStart)
+
+    lNumFiles = sum(len(lCmds) for lCmds in lParser.commands.itervalues())
+    lBytes = sum(os.path.getsize(c.FilePath) for lCmds in lParser.commands.itervalues() for c in lCmds)
+
+    # The files were just generated: let the cache take them all the same
+    lCache = DigestCache(os.path.join(aWorkDir, '.ipbbdigests'))
+    lCache.racyWindow = 0.
+    lStart = time.time()
+    hashCommands(lParser.commands, aCache=lCache)
+    lHashTime = time.time() - lStart
+    lCache.save()
+
+    lStart = time.time()
+    hashCommands(lParser.commands, aCache=DigestCache(lCache.path))
+    lCachedHashTime = time.time() - lStart
+
+    return OrderedDict([
+        ('files', lNumFiles),
+        ('missing', len(lParser.missing)),
+        ('parse_s', lBest),
+        ('files_per_s', lNumFiles / lBest),
+        ('peak_rss_mb', lPeakRSS),
+        ('parse_rss_mb', lRSSAfter - lRSSBefore),
+        ('listdir', lPathMaker.syscalls['listdir']),
+        ('stat', lPathMaker.syscalls['stat']),
+        ('hash_s', lHashTime),
+        ('hash_mb_per_s', lBytes / 1e6 / lHashTime),
+        ('hash_cached_s', lCachedHashTime),
+    ])
+
+
+def measureScale(aScale, aRepeat):
+    '''Generates the work area of a scale, and measures it in a child process'''
+    from ipbb_test import repogen
+
+    lWorkDir = tempfile.mkdtemp(prefix='ipbb-bench-')
+    try:
+        lTop = repogen.generate(lWorkDir, **dict(kShape, **kScales[aScale]))
+        lOutput = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), '--repeat', str(aRepeat), '--run-scale', lWorkDir
+        ] + list(lTop))
+        return json.loads(lOutput.splitlines()[-1], object_pairs_hook=OrderedDict)
+    finally:
+        shutil.rmtree(lWorkDir)
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def compare(aResults, aBaseline, aTolerance):
+    '''Returns the measurements that got worse than in the baseline'''
+    lRegressions = []
+    for lScale, lResult in aResults.iteritems():
+        lBase = aBaseline.get(lScale)
+        if lBase is None:
+            continue
+        for lKey in kTimes:
+            # Measurements added after the baseline was taken
+            if lKey not in lBase:
+                continue
+            if lResult[lKey] > lBase[lKey] * (1 + aTolerance):
+                lRegressions.append((lScale, lKey, lBase[lKey], lResult[lKey]))
+        for lKey in kCounts:
+            if lResult[lKey] > lBase[lKey]:
+                lRegressions.append((lScale, lKey, lBase[lKey], lResult[lKey]))
+    return lRegressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--scales', default=','.join(kScales), help='Comma-separated scales to run, among ' + ', '.join(kScales))
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Parse repetitions, the best time is kept')
+    parser.add_argument('-o', '--output', default=None, help='Store the results in this JSON file')
+    parser.add_argument('-b', '--baseline', default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2, help='Relative slow-down accepted against the baseline')
+    # Work area and top package, component and dep file
+    parser.add_argument('--run-scale', default=None, nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: measure one work area and report on stdout
+    if args.run_scale:
+        print(json.dumps(runScale(args.run_scale[0], args.run_scale[1:], args.repeat)))
+        return
+
+    lScales = args.scales.split(',')
+    for lScale in lScales:
+        if lScale not in kScales:
+            parser.error('Unknown scale ' + lScale)
+
+    lColumns = ['files', 'parse_s', 'files_per_s', 'parse_rss_mb', 'listdir', 'stat', 'hash_s', 'hash_mb_per_s', 'hash_cached_s']
+    print(('{:<6}' + ' {:>13}' * len(lColumns)).format('scale', *lColumns))
+
+    lResults = OrderedDict()
+    for lScale in lScales:
+        lResults[lScale] = measureScale(lScale, args.repeat)
+        print(('{:<6}' + ' {:>13.6g}' * len(lColumns)).format(lScale, *[lResults[lScale][c] for c in lColumns]))
+        sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w') as lFile:
+            json.dump(lResults, lFile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as lFile:
+            lBaseline = json.load(lFile)
+        lRegressions = compare(lResults, lBaseline, args.tolerance)
+        for lScale, lKey, lBase, lValue in lRegressions:
+            print('REGRESSION {0} {1}: {2:.6g} -> {3:.6g}'.format(lScale, lKey, lBase, lValue))
+        if lRegressions:
+            sys.exit(1)
+        print('No regression against', args.baseline)
+# ------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    main()
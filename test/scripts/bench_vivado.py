@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Vivado console throughput benchmark
+
+Runs batches of `get_property` queries through VivadoConsole.executeMany, one command
+at a time and pipelined, against a fake Vivado Tcl console (ipbb_test.fakevivado).
+Then fetches a long `get_files` result, scraped from the prompt output and through the
+structured channel.
+
+The fake answers instantly: the figures measure the cost of the round trips on the
+ipbb side. --latency adds a delay to every line read by the fake, to mimic the
+overhead of Vivado's own prompt.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+kRepoDir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path[0:0] = [kRepoDir, os.path.join(kRepoDir, 'test')]
+
+from ipbb.tools.xilinx import VivadoConsole
+from ipbb_test import fakevivado
+
+
+# ------------------------------------------------------------------------------
+def best(aFunction, aRepeat):
+    '''Best wall time of aRepeat calls, and the result of the last one'''
+    lBest = None
+    for _ in xrange(aRepeat):
+        lStart = time.time()
+        lResult = aFunction()
+        lTime = time.time() - lStart
+        lBest = lTime if lBest is None else min(lBest, lTime)
+    return lBest, lResult
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[1, 10, 100, 1000], help='Batch sizes')
+    parser.add_argument('-f', '--files', type=int, default=10000, help='Length of the get_files result')
+    parser.add_argument('-l', '--latency', type=int, default=0, help='Delay of the fake Vivado per line read, in ms')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Repetitions, the best time is kept')
+    args = parser.parse_args()
+
+    lWorkDir = tempfile.mkdtemp(prefix='ipbb-bench-')
+    lCwd = os.getcwd()
+    try:
+        fakevivado.install(lWorkDir)
+        os.environ['PATH'] = lWorkDir + os.pathsep + os.environ['PATH']
+        os.environ['FAKE_VIVADO_LATENCY'] = str(args.latency)
+        # Vivado writes its log and journal in the working directory
+        os.chdir(lWorkDir)
+
+        lConsole = VivadoConsole('bench', echo=False)
+        try:
+            lColumns = ['sequential cmd/s', 'pipelined cmd/s', 'speedup']
+            print(('{:>8}' + ' {:>18}' * len(lColumns)).format('batch', *lColumns))
+            for lSize in args.sizes:
+                lCmds = ['get_property STATUS [get_runs run_{0}]'.format(i) for i in xrange(lSize)]
+
+                lConsole.pipeline = False
+                lSequential, lExpected = best(lambda: lConsole.executeMany(lCmds), args.repeat)
+                lConsole.pipeline = True
+                lPipelined, lResult = best(lambda: lConsole.executeMany(lCmds), args.repeat)
+
+                if lResult != lExpected:
+                    raise RuntimeError('Pipelined and sequential results differ for a batch of {0}'.format(lSize))
+
+                print(('{:>8}' + ' {:>18.1f}' * len(lColumns)).format(
+                    lSize, lSize / lSequential, lSize / lPipelined, lSequential / lPipelined
+                ))
+
+            lCmd = 'get_files {0}'.format(args.files)
+            lExecute, lExpected = best(lambda: lConsole.execute(lCmd)[0], args.repeat)
+            lQuery, lResult = best(lambda: lConsole.query(lCmd), args.repeat)
+            if lResult != lExpected:
+                raise RuntimeError('Query and prompt results differ')
+            print('\n{0} files: execute {1:.3f}s, query {2:.3f}s, {3:.1f} MB'.format(
+                args.files, lExecute, lQuery, len(lResult) / 1e6
+            ))
+        finally:
+            lConsole.quit()
+    finally:
+        os.chdir(lCwd)
+        shutil.rmtree(lWorkDir)
+# ------------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+from __future__ import print_function
+
+import sys
+
+import pytest
+
+from ipbb.depparser.DepExpression import compileDirective, DepExpressionError
+
+
+# ------------------------------------------------------------------------------
+kVars = {'toolset': 'Vivado', 'device_name': 'xc7k325t', 'n': 3, 'flag': True, 'libs': ['a', 'b']}
+
+kExpressions = [
+    'toolset == "Vivado"',
+    'toolset != "Vivado"',
+    'toolset in ("Vivado", "Modelsim")',
+    'toolset not in ["ISE"]',
+    'device_name != "" or toolset == "ISE"',
+    'flag and n > 2',
+    'not flag or n',
+    '0 < n <= 3',
+    '1 < n < 3',
+    'n * 2 + 1 - 4 // 3 % 2',
+    'n / 2',
+    '-n',
+    '+n',
+    '"a" in libs',
+    'flag is True',
+    'None is not flag',
+    '"xc7" + "k325t" == device_name',
+    'n if flag else 0',
+    '(n, "x")',
+    '[n, n]',
+    'False',
+]
+
+
+@pytest.mark.parametrize('aSource', kExpressions)
+def test_expressions_match_eval(aSource):
+    lVars = dict(kVars)
+    assert compileDirective(aSource, 'eval')(lVars) == eval(aSource, {}, lVars)
+
+
+def test_expression_names():
+    assert compileDirective('toolset == "Vivado" and n > 0', 'eval').names == frozenset(['toolset', 'n'])
+    assert compileDirective('x = n + 1', 'assign').names == frozenset(['x', 'n'])
+
+
+def test_assignment():
+    lExpr = compileDirective('  device_name = "xc7a35t" ', 'assign')
+    assert lExpr.target == 'device_name'
+    assert lExpr({}) == 'xc7a35t'
+
+    lExpr = compileDirective('n2 = n * 2', 'assign')
+    assert lExpr.target == 'n2'
+    assert lExpr(kVars) == 6
+
+
+def test_evaluation_errors():
+    with pytest.raises(DepExpressionError) as lError:
+        compileDirective('undefined == 1', 'eval')(kVars)
+    assert "'undefined' is not defined" in str(lError.value)
+
+    with pytest.raises(DepExpressionError) as lError:
+        compileDirective('n / 0', 'eval')(kVars)
+    assert 'ZeroDivisionError' in str(lError.value)
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+kRejected = [
+    ('eval', '__import__("os").system("true")'),
+    ('eval', 'open("/etc/passwd")'),
+    ('eval', 'toolset.upper()'),
+    ('eval', 'toolset.__class__'),
+    ('eval', 'libs[0]'),
+    ('eval', 'lambda: 1'),
+    ('eval', '[l for l in libs]'),
+    ('eval', '{"a": 1}'),
+    ('eval', 'n ** 100000'),
+    ('eval', 'n << 2'),
+    ('eval', '`n`'),
+    ('eval', 'toolset =='),
+    ('assign', 'x == 1'),
+    ('assign', 'x += 1'),
+    ('assign', 'x = y = 1'),
+    ('assign', 'x, y = 1, 2'),
+    ('assign', 'x.y = 1'),
+    ('assign', 'x = 1; y = 2'),
+    ('assign', 'import os'),
+    ('assign', 'x = open("f")'),
+]
+
+
+@pytest.mark.parametrize('aMode,aSource', kRejected)
+def test_rejected(aMode, aSource):
+    with pytest.raises(DepExpressionError):
+        compileDirective(aSource, aMode)
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def test_compiled_directives_are_shared():
+    lExpr = compileDirective('n > 1', 'eval')
+    assert compileDirective('n > 1', 'eval') is lExpr
+    assert compileDirective('m = 1', 'assign') is compileDirective('m = 1', 'assign')
+
+
+def test_cache_is_bounded(monkeypatch):
+    lModule = sys.modules[compileDirective.__module__]
+    monkeypatch.setattr(lModule, '_kCache', {})
+    monkeypatch.setattr(lModule, '_kCacheMaxSize', 8)
+
+    for i in range(100):
+        assert compileDirective('n > {0}'.format(i), 'eval')(kVars) == (3 > i)
+        assert len(lModule._kCache) <= 8
+# ------------------------------------------------------------------------------
@@ -0,0 +1,275 @@
+from __future__ import print_function
+
+import os
+import sys
+import glob
+
+import pytest
+
+from conftest import writeDep
+from ipbb.depparser.Pathmaker import Pathmaker
+from ipbb.depparser.DepFileParser import DepFileParser, DepLineParserError
+from ipbb_test.legacy import legacyLineParser, LegacyParserError
+
+
+# ------------------------------------------------------------------------------
+def results(aParser):
+    '''Parse results in comparable form'''
+    return {
+        'vars': aParser.vars,
+        'commands': dict(
+            (lGrp, [(c.FilePath, c.Package, c.Component, c.Lib, c.Map, c.Include, c.TopLevel, c.Vhdl2008) for c in lCmds])
+            for lGrp, lCmds in aParser.commands.iteritems()
+        ),
+        'libs': aParser.libs,
+        'components': dict(aParser.components),
+        'missing': aParser.missing,
+    }
+
+
+def depFileLines(aSrcDir):
+    '''Tokenized command lines of all the dep files of a source area'''
+    lLines = []
+    for lDepPath in glob.glob(os.path.join(aSrcDir, '*', 'components', '*', 'firmware', 'cfg', '*.dep')):
+        with open(lDepPath) as lDepFile:
+            for lLine in lDepFile:
+                lLine = lLine.strip()
+                if not lLine or lLine[0] in '#@':
+                    continue
+                if lLine[0] == '?':
+                    lLine = lLine.split('?', 2)[2]
+                lLines.append(lLine.split())
+    return lLines
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+kLines = [
+    'src a.vhd',
+    'src a.vhd b.vhd c.vhd',
+    'src -l mylib -m gen a.vhd',
+    'src --lib=mylib a.vhd',
+    'src -lmylib a.vhd',
+    'src --li mylib a.vhd',
+    'src --vhdl a.vhd',
+    'src -n a.vhd',
+    'src -nlmylib a.vhd',
+    'src -c pkg:cmp a.vhd',
+    'src -c cmp a.vhd',
+    'src --cd ../sim a.vhd',
+    'src a.vhd -l mylib',
+    'src -- -a.vhd',
+    'src -1 a.vhd',
+    'include',
+    'include -c pkg:cmp',
+    'include -c cmp other.dep',
+    'setup -z settings.tcl',
+    'setup --coregen',
+    'addrtab -t top.xml',
+    'addrtab -ct pkg:cmp top.xml',
+    'iprepo --cd ../cgn repo',
+]
+
+kBadLines = [
+    'unknown a.vhd',
+    'src',
+    'src -l',
+    'src -l mylib',
+    'src --c x a.vhd',
+    'src -x a.vhd',
+    'src a.vhd -l mylib b.vhd',
+    'src --vhdl2008=yes a.vhd',
+    'setup -zx',
+    'addrtab --toplevel=1 top.xml',
+    'include -c a:b:c',
+]
+
+
+@pytest.mark.parametrize('aLine', kLines)
+def test_line_parser_matches_argparse(aLine):
+    lParser = DepFileParser('vivado', Pathmaker('', 0))
+    assert vars(lParser.parseLine(aLine.split())) == vars(legacyLineParser()(aLine.split()))
+
+
+@pytest.mark.parametrize('aLine', kBadLines)
+def test_line_parser_errors_match_argparse(aLine):
+    lParser = DepFileParser('vivado', Pathmaker('', 0))
+    with pytest.raises(DepLineParserError) as lError:
+        lParser.parseLine(aLine.split())
+
+    # Malformed component names were reported by the component action
+    if ':' in aLine:
+        assert 'Malformed component name' in str(lError.value)
+        return
+
+    with pytest.raises(LegacyParserError) as lLegacyError:
+        legacyLineParser()(aLine.split())
+    assert str(lError.value) == str(lLegacyError.value)
+
+
+def test_line_parser_matches_argparse_on_generated_area(workarea):
+    lSrcDir, _ = workarea
+    lParseLine = DepFileParser('vivado', Pathmaker(lSrcDir, 0)).parseLine
+    lLegacy = legacyLineParser()
+    lLines = depFileLines(lSrcDir)
+    assert lLines
+    for lTokens in lLines:
+        assert vars(lParseLine(lTokens)) == vars(lLegacy(lTokens)), ' '.join(lTokens)
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def test_parallel_parse_matches_serial(workarea):
+    lSrcDir, lTop = workarea
+    lSerial = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lSerial.parse(*lTop)
+    lParallel = DepFileParser('vivado', Pathmaker(lSrcDir, 0), aJobs=4)
+    lParallel.parse(*lTop)
+    assert results(lParallel) == results(lSerial)
+    assert not lSerial.missing
+
+
+def test_shared_records_are_reused(workarea, monkeypatch):
+    lSrcDir, lTop = workarea
+    lMemo = {}
+    lFirst = DepFileParser('vivado', Pathmaker(lSrcDir, 0), aMemo=lMemo)
+    lFirst.parse(*lTop)
+
+    # A second parser sharing the records does not read any dep file
+    lModule = sys.modules[DepFileParser.__module__]
+    lReads = []
+    lReadDepFile = lModule.readDepFile
+    monkeypatch.setattr(lModule, 'readDepFile', lambda aPath: lReads.append(aPath) or lReadDepFile(aPath))
+
+    lSecond = DepFileParser('vivado', Pathmaker(lSrcDir, 0), aMemo=lMemo)
+    lSecond.parse(*lTop)
+    assert lReads == []
+    assert results(lSecond) == results(lFirst)
+
+    # Other variable values are not served from the records
+    lOther = DepFileParser('vivado', Pathmaker(lSrcDir, 0), aVariables=['device_name=xcku040'], aMemo=lMemo)
+    lOther.parse(*lTop)
+    assert lReads
+    assert lOther.vars['device_name'] == 'xcku040'
+
+
+def test_refresh_parses_changed_dep_files_only(workarea, monkeypatch):
+    lSrcDir, lTop = workarea
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lParser.parse(*lTop)
+    assert lParser.changedPaths() == []
+
+    lDepPath = writeDep(lSrcDir, 'pkg1', 'components/cmp3', 'cmp3.dep', ['src extra.vhd'])
+    # Make sure the stamp changes on filesystems with a coarse mtime resolution
+    os.utime(lDepPath, (0, 0))
+
+    lModule = sys.modules[DepFileParser.__module__]
+    lReads = []
+    lReadDepFile = lModule.readDepFile
+    monkeypatch.setattr(lModule, 'readDepFile', lambda aPath: lReads.append(aPath) or lReadDepFile(aPath))
+
+    assert lParser.refresh(*lTop) == [lDepPath]
+    assert lDepPath in lReads
+    assert len(lReads) < len(lParser.stamps)
+
+    lFresh = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lFresh.parse(*lTop)
+    assert results(lParser) == results(lFresh)
+    lMissing = os.path.join(lSrcDir, 'pkg1', 'components/cmp3', 'firmware', 'hdl', 'extra.vhd')
+    assert lMissing in lParser.missingFiles['pkg1']['components/cmp3']
+
+
+def test_include_cycle(tmpdir):
+    lSrcDir = str(tmpdir)
+    writeDep(lSrcDir, 'pkg', 'a', 'a.dep', ['include -c b'])
+    writeDep(lSrcDir, 'pkg', 'b', 'b.dep', ['include -c c'])
+    writeDep(lSrcDir, 'pkg', 'c', 'c.dep', ['include -c a'])
+
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    with pytest.raises(RuntimeError) as lError:
+        lParser.parse('pkg', 'a', 'a.dep')
+    assert 'Include cycle detected' in str(lError.value)
+    assert str(lError.value).count('a.dep') == 2
+
+
+def test_repeated_includes_are_not_cycles(tmpdir):
+    lSrcDir = str(tmpdir)
+    writeDep(lSrcDir, 'pkg', 'top', 'top.dep', ['include -c a', 'include -c b', 'include -c a'])
+    writeDep(lSrcDir, 'pkg', 'a', 'a.dep', ['include -c b'])
+    writeDep(lSrcDir, 'pkg', 'b', 'b.dep', ['@b_value = 1'])
+
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lParser.parse('pkg', 'top', 'top.dep')
+    assert lParser.vars['b_value'] == 1
+    assert lParser.components['pkg'] == ['a', 'b']
+
+
+@pytest.mark.parametrize('aLine', ['@x = open("f")', '? __import__("os") ? src a.vhd', '? 1 ? src a.vhd'])
+def test_rejected_directives(tmpdir, aLine):
+    lSrcDir = str(tmpdir)
+    lDepPath = writeDep(lSrcDir, 'pkg', 'a', 'a.dep', ['# comment', aLine])
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    with pytest.raises(SystemExit) as lError:
+        lParser.parse('pkg', 'a', 'a.dep')
+    assert '{0}:2'.format(lDepPath) in str(lError.value)
+
+
+@pytest.mark.parametrize('aMode', ['counts', 'structure', 'includes'])
+def test_parse_modes(workarea, aMode):
+    lSrcDir, lTop = workarea
+    lFull = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lFull.parse(*lTop)
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0), aMode=aMode)
+    lParser.parse(*lTop)
+
+    assert lParser.vars == lFull.vars
+    assert [lNode.key for lNode, _ in lParser._includes.walk()] == [lNode.key for lNode, _ in lFull._includes.walk()]
+    if aMode == 'counts':
+        assert lParser.libs == lFull.libs
+        assert results(lParser)['commands'] == results(lFull)['commands']
+    if aMode != 'includes':
+        assert lParser.components == lFull.components
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+@pytest.fixture
+def globarea(tmpdir):
+    for lPath in ['a.vhd', 'b.vhd', 'ab.vhd', '.hidden.vhd', 'c.txt',
+                  'sub1/a.vhd', 'sub1/.x.vhd', 'sub2/b.vhd', 'sub2/deep/c.vhd', 'subfile',
+                  '.hiddendir/a.vhd']:
+        tmpdir.join(lPath).ensure()
+    tmpdir.join('link.vhd').mksymlinkto(tmpdir.join('a.vhd'))
+    tmpdir.join('broken.vhd').mksymlinkto(tmpdir.join('nowhere.vhd'))
+    tmpdir.join('sublink').mksymlinkto(tmpdir.join('sub1'))
+    return str(tmpdir)
+
+
+kGlobPatterns = [
+    '*.vhd', '?.vhd', '[ab]*.vhd', '.*', '*', '*/', '*/*.vhd', 'sub*/*.vhd', 'sub*/*/*.vhd',
+    '*/deep/*', '.hiddendir/*', 'a.vhd', 'missing.vhd', 'broken.vhd', 'sub1/', 'subfile/',
+    'missing/*.vhd', 'sub1/missing/*', 'subfile/*', 'sublink/*.vhd',
+]
+
+
+@pytest.mark.parametrize('aScandir', [True, False])
+@pytest.mark.parametrize('aPattern', kGlobPatterns)
+def test_glob_matches_glob_module(globarea, monkeypatch, aPattern, aScandir):
+    if not aScandir:
+        monkeypatch.setattr(sys.modules[Pathmaker.__module__], 'scandir', None)
+
+    lPathExpr = os.path.join(globarea, aPattern)
+    lPathMaker = Pathmaker(globarea, 0)
+    assert sorted(lPathMaker._iglob(lPathExpr)) == sorted(glob.glob(lPathExpr))
+    # Listings are served from the index the second time
+    lListings = lPathMaker.syscalls['listdir']
+    assert sorted(lPathMaker._iglob(lPathExpr)) == sorted(glob.glob(lPathExpr))
+    assert lPathMaker.syscalls['listdir'] == lListings
+
+
+def test_glob_relative_paths(globarea):
+    lPathMaker = Pathmaker(os.path.dirname(globarea), 0)
+    lPathExpr, lFiles = lPathMaker.glob(os.path.basename(globarea), 'sub2', None, '*/*.vhd')
+    assert lPathExpr == os.path.join(globarea, 'sub2', '*/*.vhd')
+    assert lFiles == [(os.path.join('deep', 'c.vhd'), os.path.join(globarea, 'sub2', 'deep', 'c.vhd'))]
+# ------------------------------------------------------------------------------
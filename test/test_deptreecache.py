@@ -0,0 +1,112 @@
+from __future__ import print_function
+
+import os
+
+import pytest
+
+from conftest import writeDep
+from test_depparser import results
+from ipbb.depparser.Pathmaker import Pathmaker
+from ipbb.depparser.DepFileParser import DepFileParser
+from ipbb.depparser.DepTreeCache import DepTreeCache
+
+
+# ------------------------------------------------------------------------------
+@pytest.fixture
+def cached(workarea, tmpdir):
+    '''Parses the work area and saves the tree in a cache file
+
+    Returns:
+        tuple: source directory, top dep file, cache and parser
+    '''
+    lSrcDir, lTop = workarea
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lParser.parse(*lTop)
+    lCache = DepTreeCache(str(tmpdir.join('deptree.cache')))
+    lCache.save(lParser, *lTop)
+    assert os.path.exists(lCache.path)
+    return lSrcDir, lTop, lCache, lParser
+
+
+def load(aSrcDir, aTop, aCache, **aKwargs):
+    lParser = DepFileParser('vivado', Pathmaker(aSrcDir, 0), **aKwargs)
+    return lParser if aCache.load(lParser, *aTop) else None
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def test_load(cached):
+    lSrcDir, lTop, lCache, lParser = cached
+    lLoaded = load(lSrcDir, lTop, lCache)
+    assert lLoaded is not None
+    assert results(lLoaded) == results(lParser)
+    assert lLoaded.stamps == lParser.stamps
+    assert lLoaded.missingFiles == lParser.missingFiles
+    assert [n.key for n, _ in lLoaded.tree.root.walk()] == [n.key for n, _ in lParser.tree.root.walk()]
+
+
+def test_load_keeps_the_parse_mode(cached):
+    lSrcDir, lTop, lCache, lParser = cached
+    lLoaded = load(lSrcDir, lTop, lCache, aMode='counts')
+    assert lLoaded is not None
+    assert lLoaded.mode == 'counts'
+    assert lLoaded._level == DepFileParser.modes.index('counts')
+
+
+def test_partial_trees_are_not_saved(workarea, tmpdir):
+    lSrcDir, lTop = workarea
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0), aMode='counts')
+    lParser.parse(*lTop)
+    lCache = DepTreeCache(str(tmpdir.join('deptree.cache')))
+    lCache.save(lParser, *lTop)
+    assert not os.path.exists(lCache.path)
+
+
+def test_changed_dep_file(cached):
+    lSrcDir, lTop, lCache, _ = cached
+    lDepPath = writeDep(lSrcDir, 'pkg2', 'components/cmp1', 'cmp1.dep', ['src extra.vhd'])
+    os.utime(lDepPath, (0, 0))
+    assert load(lSrcDir, lTop, lCache) is None
+
+
+def test_new_globbed_file(cached):
+    lSrcDir, lTop, lCache, _ = cached
+    lGenDir = os.path.join(lSrcDir, 'pkg0', 'components', 'cmp2', 'firmware', 'hdl', 'gen')
+    open(os.path.join(lGenDir, 'cmp2_gen9.vhd'), 'w').close()
+    os.utime(lGenDir, (0, 0))
+    assert load(lSrcDir, lTop, lCache) is None
+
+
+def test_new_dep_file(workarea, tmpdir):
+    lSrcDir, lTop = workarea
+    writeDep(lSrcDir, 'pkg0', 'components/cmp0', 'cmp0.dep', ['include -c components/later'])
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lParser.parse(*lTop)
+    assert lParser.missingComponents
+    lCache = DepTreeCache(str(tmpdir.join('deptree.cache')))
+    lCache.save(lParser, *lTop)
+    assert load(lSrcDir, lTop, lCache) is not None
+
+    # Dep files showing up where they were missing invalidate the cache
+    writeDep(lSrcDir, 'pkg0', 'components/later', 'later.dep', ['src later.vhd'])
+    assert load(lSrcDir, lTop, lCache) is None
+
+
+def test_settings_change(cached):
+    lSrcDir, lTop, lCache, _ = cached
+    assert load(lSrcDir, lTop, lCache, aVariables=['device_name=xcku040']) is None
+
+    lParser = DepFileParser('sim', Pathmaker(lSrcDir, 0))
+    assert not lCache.load(lParser, *lTop)
+
+
+def test_bad_cache_files(cached):
+    lSrcDir, lTop, lCache, _ = cached
+    with open(lCache.path, 'wb') as lCacheFile:
+        lCacheFile.write('not a pickle')
+    assert load(lSrcDir, lTop, lCache) is None
+
+    lCache.clear()
+    assert not os.path.exists(lCache.path)
+    assert load(lSrcDir, lTop, lCache) is None
+# ------------------------------------------------------------------------------
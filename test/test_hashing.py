@@ -0,0 +1,196 @@
+from __future__ import print_function
+
+import os
+import time
+import hashlib
+
+import pytest
+
+from ipbb.depparser.Pathmaker import Pathmaker
+from ipbb.depparser.DepFileParser import DepFileParser
+from ipbb.tools.hashing import (
+    algorithm, hashFile, hashFiles, fileSignature, DigestCache, hashCommands, merkleTree, diffMerkleTrees
+)
+
+
+# ------------------------------------------------------------------------------
+@pytest.fixture
+def commands(workarea):
+    lSrcDir, lTop = workarea
+    lParser = DepFileParser('vivado', Pathmaker(lSrcDir, 0))
+    lParser.parse(*lTop)
+    return lSrcDir, lParser.commands
+
+
+def filePaths(aCommands):
+    return [lCmd.FilePath for lCmds in aCommands.itervalues() for lCmd in lCmds]
+
+
+def age(aPath, aSeconds=3600):
+    '''Moves the modification time of a file back, out of the racy window of the digest cache'''
+    lTime = int(time.time()) - aSeconds
+    os.utime(aPath, (lTime, lTime))
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('aAlgo', ['sha1', 'md5', 'blake2b'])
+def test_hash_file(tmpdir, aAlgo):
+    lData = os.urandom(3 * 0x1000 + 17)
+    lPath = tmpdir.join('data.bin')
+    lPath.write(lData, 'wb')
+    lExpected = hashlib.new(aAlgo, lData).digest() if aAlgo != 'blake2b' else algorithm(aAlgo)(lData).digest()
+
+    # Chunk sizes smaller than the file exercise the incremental hashing
+    assert hashFile(str(lPath), aAlgo).digest() == lExpected
+    assert hashFile(str(lPath), aAlgo, aChunkSize=0x1000).digest() == lExpected
+
+    lEmpty = tmpdir.join('empty.bin')
+    lEmpty.write('', 'wb')
+    assert hashFile(str(lEmpty), aAlgo).digest() == algorithm(aAlgo)().digest()
+
+
+def test_hash_files_is_deterministic(commands):
+    _, lCommands = commands
+    lPaths = filePaths(lCommands)
+    lSerial = hashFiles(lPaths, aJobs=1)
+    assert sorted(lSerial) == sorted(set(lPaths))
+    for lJobs in (2, 8):
+        assert hashFiles(lPaths, aJobs=lJobs) == lSerial
+    for lPath, lDigest in lSerial.iteritems():
+        with open(lPath, 'rb') as lFile:
+            assert lDigest == hashlib.sha1(lFile.read()).digest()
+
+
+def test_hash_commands_is_deterministic(commands):
+    _, lCommands = commands
+    lProjHash, lGrpHashes, lCmdHashes = hashCommands(lCommands, aJobs=1)
+    for lJobs in (2, 8):
+        lOther = hashCommands(lCommands, aJobs=lJobs)
+        assert lOther[0].hexdigest() == lProjHash.hexdigest()
+        assert [(k, h.hexdigest()) for k, h in lOther[1].iteritems()] == [(k, h.hexdigest()) for k, h in lGrpHashes.iteritems()]
+        assert lOther[2] == lCmdHashes
+
+    # Digests computed beforehand give the same result
+    lDigests = hashFiles(filePaths(lCommands))
+    assert hashCommands(lCommands, aDigests=lDigests)[0].hexdigest() == lProjHash.hexdigest()
+
+
+def test_merkle_tree(commands):
+    lSrcDir, lCommands = commands
+    lTree = merkleTree(lCommands, lSrcDir, aJobs=1)
+    assert lTree == merkleTree(lCommands, lSrcDir, aJobs=8)
+    assert lTree == merkleTree(lCommands, lSrcDir, aDigests=hashFiles(filePaths(lCommands)))
+    assert diffMerkleTrees(lTree, lTree) == ([], [], [])
+
+    lCmd = lCommands['src'][0]
+    with open(lCmd.FilePath, 'a') as lFile:
+        lFile.write('-- changed\n')
+    lNewTree = merkleTree(lCommands, lSrcDir)
+    assert lNewTree['digest'] != lTree['digest']
+    assert diffMerkleTrees(lTree, lNewTree) == ([], [], [(lCmd.Package, lCmd.Component)])
+
+    with pytest.raises(ValueError):
+        diffMerkleTrees(lTree, merkleTree(lCommands, lSrcDir, aAlgo='md5'))
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+def test_digest_cache(commands, tmpdir):
+    _, lCommands = commands
+    lPaths = filePaths(lCommands)
+    for lPath in lPaths:
+        age(lPath)
+    lCachePath = str(tmpdir.join('digests.cache'))
+
+    lCache = DigestCache(lCachePath)
+    lDigests = hashFiles(lPaths, aCache=lCache)
+    assert lCache.hits == 0
+    lCache.save()
+
+    # All the digests are served by the cache the second time
+    lCache = DigestCache(lCachePath)
+    assert hashFiles(lPaths, aCache=lCache) == lDigests
+    assert lCache.misses == 0
+    assert lCache.hits == len(set(lPaths))
+
+    # Other algorithms have digests of their own
+    lCache = DigestCache(lCachePath)
+    hashFiles(lPaths, 'md5', aCache=lCache)
+    assert lCache.hits == 0
+
+
+def test_digest_cache_invalidation(tmpdir):
+    lPath = tmpdir.join('a.vhd')
+    lPath.write('-- first version\n')
+    age(str(lPath))
+    lCachePath = str(tmpdir.join('digests.cache'))
+
+    lCache = DigestCache(lCachePath)
+    lFirst = hashFiles([str(lPath)], aCache=lCache)
+    lCache.save()
+
+    # Same size, different mtime
+    lPath.write('-- other version\n')
+    age(str(lPath), 1800)
+    lCache = DigestCache(lCachePath)
+    lSecond = hashFiles([str(lPath)], aCache=lCache)
+    assert lCache.misses == 1
+    assert lSecond != lFirst
+    assert lSecond == {str(lPath): hashlib.sha1('-- other version\n').digest()}
+
+    # Different size, same mtime
+    lStat = os.stat(str(lPath))
+    lPath.write('-- third version\n\n')
+    os.utime(str(lPath), (lStat.st_atime, lStat.st_mtime))
+    assert fileSignature(os.stat(str(lPath)))[2] == fileSignature(lStat)[2]
+    lCache = DigestCache(lCachePath)
+    assert hashFiles([str(lPath)], aCache=lCache) == {str(lPath): hashlib.sha1('-- third version\n\n').digest()}
+    assert lCache.misses == 1
+
+
+def test_digest_cache_refresh(tmpdir):
+    lPath = tmpdir.join('a.vhd')
+    lPath.write('-- some vhdl\n')
+    age(str(lPath))
+    lCachePath = str(tmpdir.join('digests.cache'))
+
+    lCache = DigestCache(lCachePath)
+    hashFiles([str(lPath)], aCache=lCache)
+    lCache.save()
+
+    lCache = DigestCache(lCachePath, aRefresh=True)
+    hashFiles([str(lPath)], aCache=lCache)
+    assert lCache.hits == 0
+    assert lCache.misses == 1
+
+
+def test_digest_cache_skips_racy_files(tmpdir):
+    lOld = tmpdir.join('old.vhd')
+    lOld.write('-- old\n')
+    age(str(lOld))
+    lNew = tmpdir.join('new.vhd')
+    lNew.write('-- new\n')
+    lCachePath = str(tmpdir.join('digests.cache'))
+
+    lCache = DigestCache(lCachePath)
+    hashFiles([str(lOld), str(lNew)], aCache=lCache)
+    lCache.save()
+
+    # Files modified just before being hashed could change again within the mtime resolution
+    lCache = DigestCache(lCachePath)
+    hashFiles([str(lOld), str(lNew)], aCache=lCache)
+    assert lCache.hits == 1
+    assert lCache.misses == 1
+
+
+def test_digest_cache_ignores_bad_files(tmpdir):
+    lCachePath = tmpdir.join('digests.cache')
+    lCachePath.write('not a pickle')
+    lPath = tmpdir.join('a.vhd')
+    lPath.write('-- some vhdl\n')
+
+    lCache = DigestCache(str(lCachePath))
+    assert hashFiles([str(lPath)], aCache=lCache) == hashFiles([str(lPath)])
+    assert lCache.misses == 1
+# ------------------------------------------------------------------------------